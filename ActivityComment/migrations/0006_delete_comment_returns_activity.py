@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# 0004 definition, restored on reverse
+PREVIOUS_SP = """
+            DROP PROCEDURE IF EXISTS sp_delete_activity_comment_safe;
+            CREATE PROCEDURE sp_delete_activity_comment_safe(
+                IN p_comment_id INT,
+                IN p_user_id INT
+            )
+            BEGIN
+                DECLARE v_owner_id INT;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                END;
+
+                START TRANSACTION;
+                SELECT user_id INTO v_owner_id FROM ActivityComment_activitycomment WHERE id = p_comment_id FOR UPDATE;
+                
+                IF v_owner_id IS NULL THEN
+                    SET v_status = 1; -- Not found
+                ELSEIF v_owner_id != p_user_id THEN
+                    SET v_status = 2; -- Unauthorized
+                ELSE
+                    DELETE FROM ActivityComment_activitycomment WHERE id = p_comment_id;
+                    SET v_status = 0;
+                END IF;
+
+                IF v_status = 0 THEN COMMIT; ELSE ROLLBACK; END IF;
+                SELECT v_status AS status_code;
+            END;
+            """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ActivityComment", "0005_activitycomment_activitycom_activit_5a895d_idx"),
+    ]
+
+    operations = [
+        # sp_delete_activity_comment_safe also returns the activity the comment belonged to,
+        # so the caller can invalidate that activity's comment list.
+        # Result set: status_code, activity_type, activity_id (NULL unless status_code = 0)
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_delete_activity_comment_safe;
+            CREATE PROCEDURE sp_delete_activity_comment_safe(
+                IN p_comment_id INT,
+                IN p_user_id INT
+            )
+            BEGIN
+                DECLARE v_owner_id INT;
+                DECLARE v_activity_type VARCHAR(20);
+                DECLARE v_activity_id INT;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                END;
+
+                START TRANSACTION;
+                SELECT user_id, activity_type, activity_id
+                INTO v_owner_id, v_activity_type, v_activity_id
+                FROM ActivityComment_activitycomment WHERE id = p_comment_id FOR UPDATE;
+                
+                IF v_owner_id IS NULL THEN
+                    SET v_status = 1; -- Not found
+                ELSEIF v_owner_id != p_user_id THEN
+                    SET v_status = 2; -- Unauthorized
+                ELSE
+                    DELETE FROM ActivityComment_activitycomment WHERE id = p_comment_id;
+                    SET v_status = 0;
+                END IF;
+
+                IF v_status = 0 THEN COMMIT; ELSE ROLLBACK; END IF;
+                SELECT v_status AS status_code,
+                       IF(v_status = 0, v_activity_type, NULL) AS activity_type,
+                       IF(v_status = 0, v_activity_id, NULL) AS activity_id;
+            END;
+            """,
+            reverse_sql=PREVIOUS_SP,
+        ),
+    ]
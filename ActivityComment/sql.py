@@ -29,7 +29,87 @@ def create_comment(user_id, activity_type, activity_id, content):
         return rows[0] if rows else None
 
 def delete_comment_safe(comment_id, user_id):
+    """
+    :return: (status_code, activity_type, activity_id) of the deleted comment;
+             the activity fields are None unless status_code is 0
+    """
     with connection.cursor() as cursor:
         cursor.callproc('sp_delete_activity_comment_safe', [comment_id, user_id])
         status_row = cursor.fetchone()
-        return status_row[0] if status_row else 1
+        if not status_row:
+            return 1, None, None
+        return status_row[0], status_row[1], status_row[2]
+
+
+ACTIVITY_TABLES = {
+    'sport': 'sportmanage_sportrecord',
+    'sleep': 'sleepmanage_sleeprecord',
+    'meal': 'dietmanage_mealrecord',
+}
+
+def get_activity_owner(activity_type, activity_id):
+    """Owner user_id of the commented record, or None if the type or record does not exist"""
+    table = ACTIVITY_TABLES.get(activity_type)
+    if table is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT user_id FROM `{table}` WHERE id = %s", [activity_id])
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+def get_activity_owners(pairs):
+    """
+    :param pairs: iterable of (activity_type, activity_id)
+    :return: {(activity_type, activity_id): owner user_id} for the records that exist
+    """
+    by_type = {}
+    for activity_type, activity_id in pairs:
+        if activity_type in ACTIVITY_TABLES:
+            by_type.setdefault(activity_type, set()).add(int(activity_id))
+
+    owners = {}
+    with connection.cursor() as cursor:
+        for activity_type, ids in by_type.items():
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(
+                f"SELECT id, user_id FROM `{ACTIVITY_TABLES[activity_type]}` WHERE id IN ({placeholders})",
+                list(ids)
+            )
+            for record_id, user_id in cursor.fetchall():
+                owners[(activity_type, record_id)] = user_id
+    return owners
+
+def get_comment_summaries(pairs, latest):
+    """
+    Comment count and the latest comments (newest first) of many activities in one query.
+    The row-constructor IN list is range-scanned on (activity_type, activity_id).
+    :return: {(activity_type, activity_id): {'count': n, 'latest': [comment, ...]}}, one entry per pair
+    """
+    pairs = list(pairs)
+    summaries = {pair: {'count': 0, 'latest': []} for pair in pairs}
+    if not pairs:
+        return summaries
+
+    placeholders = ', '.join(['(%s, %s)'] * len(pairs))
+    sql = f"""
+        SELECT * FROM (
+            SELECT v.*,
+                   ROW_NUMBER() OVER w AS comment_rank,
+                   COUNT(*) OVER (PARTITION BY v.activity_type, v.activity_id) AS comment_count
+            FROM view_activity_comment_full v
+            WHERE (v.activity_type, v.activity_id) IN ({placeholders})
+            WINDOW w AS (PARTITION BY v.activity_type, v.activity_id ORDER BY v.created_at DESC, v.id DESC)
+        ) ranked
+        WHERE comment_rank <= %s
+        ORDER BY activity_type, activity_id, comment_rank
+    """
+    params = [value for pair in pairs for value in pair] + [latest]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for row in dictfetchall(cursor):
+            summary = summaries[(row['activity_type'], row['activity_id'])]
+            summary['count'] = row.pop('comment_count')
+            row.pop('comment_rank')
+            summary['latest'].append(row)
+    return summaries
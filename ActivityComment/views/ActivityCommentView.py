@@ -1,8 +1,75 @@
 from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.core.cache import cache
 from ActivityComment import sql
+from UserManage import friend_index
 from utils.api_utils import success_api_response, failed_api_response, ErrorCode, parse_data
+from utils.cache_utils import (
+    get_or_compute, versioned_key, get_cache_versions, bump_cache_version, COMMENT_SCOPE
+)
+
+# Keys embed the activity's comment version and every write bumps it, so a list
+# computed before a write and stored after it lands under the retired version.
+# The TTL only bounds memory use.
+COMMENTS_CACHE_TIMEOUT = 24 * 3600
+
+# A record never changes owner, so the lookup is cached; a deleted record keeps
+# resolving to its former owner until the entry expires
+OWNER_CACHE_TIMEOUT = 3600
+
+# Batch summaries keep the newest SUMMARY_MAX_LATEST comments; requests slice them
+BATCH_MAX_ACTIVITIES = 100
+SUMMARY_MAX_LATEST = 10
+SUMMARY_DEFAULT_LATEST = 3
+
+def _activity_owner(activity_type, activity_id):
+    return f'{activity_type}_{activity_id}'
+
+def comments_cache_key(activity_type, activity_id):
+    owner = _activity_owner(activity_type, activity_id)
+    return versioned_key(COMMENT_SCOPE, owner, f'comments_{owner}')
+
+def summary_cache_keys(pairs):
+    """{(type, id): versioned summary key}, reading all versions at once"""
+    versions = get_cache_versions(COMMENT_SCOPE, [_activity_owner(*pair) for pair in pairs])
+    return {
+        pair: f'comment_summary_{_activity_owner(*pair)}_v{versions[_activity_owner(*pair)]}'
+        for pair in pairs
+    }
+
+def invalidate_comments_cache(activity_type, activity_id):
+    bump_cache_version(COMMENT_SCOPE, _activity_owner(activity_type, activity_id))
+
+def parse_activity_pairs(items):
+    """[{'activity_type', 'activity_id'}, ...] -> de-duplicated [(type, int id), ...] in request order"""
+    pairs = {}
+    for item in items:
+        pairs.setdefault((str(item['activity_type']), int(item['activity_id'])), None)
+    return list(pairs)
+
+def get_activity_owner(activity_type, activity_id):
+    """Cached sql.get_activity_owner; unknown types are not cached"""
+    if activity_type not in sql.ACTIVITY_TABLES:
+        return None
+    owner_id, _ = get_or_compute(
+        f'activity_owner_{activity_type}_{activity_id}',
+        lambda: sql.get_activity_owner(activity_type, activity_id),
+        timeout=OWNER_CACHE_TIMEOUT
+    )
+    return owner_id
+
+def check_activity_access(user_id, activity_type, activity_id):
+    """
+    Comments are visible to and writable by the activity owner and the owner's friends
+    :return: failed response data, or None when access is allowed
+    """
+    owner_id = get_activity_owner(activity_type, activity_id)
+    if owner_id is None:
+        return failed_api_response(ErrorCode.NOT_FOUND_ERROR, "动态不存在")
+    if owner_id != user_id and not friend_index.is_friend(user_id, owner_id):
+        return failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权访问该动态的评论")
+    return None
 
 class ActivityCommentViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -13,18 +80,22 @@ class ActivityCommentViewSet(viewsets.ViewSet):
         
         if not activity_type or not activity_id:
             return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "缺少 activity_type 或 activity_id"))
+        try:
+            activity_id = int(activity_id)
+        except ValueError:
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的 activity_id"))
 
-        cache_key = f'comments_{activity_type}_{activity_id}'
-        
-        # Try to get from cache
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(success_api_response(cached_data, message='获取评论列表成功 (from cache)'))
-            
-        comments = sql.get_comments(activity_type, activity_id)
+        denied = check_activity_access(request.user.id, activity_type, activity_id)
+        if denied:
+            return Response(denied)
+
+        cache_key = comments_cache_key(activity_type, activity_id)
         
-        # Set to cache
-        cache.set(cache_key, comments, timeout=300) # Cache for 5 minutes
+        comments, from_cache = get_or_compute(
+            cache_key, lambda: sql.get_comments(activity_type, activity_id), timeout=COMMENTS_CACHE_TIMEOUT
+        )
+        if from_cache:
+            return Response(success_api_response(comments, message='获取评论列表成功 (from cache)'))
         
         return Response(success_api_response(comments, message='获取评论列表成功'))
 
@@ -40,34 +111,82 @@ class ActivityCommentViewSet(viewsets.ViewSet):
         
         if not all([activity_type, activity_id, content]):
             return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "参数不完整"))
+        try:
+            activity_id = int(activity_id)
+        except (TypeError, ValueError):
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的 activity_id"))
+
+        denied = check_activity_access(user_id, activity_type, activity_id)
+        if denied:
+            return Response(denied)
             
         new_comment = sql.create_comment(user_id, activity_type, activity_id, content)
         if not new_comment:
             return Response(failed_api_response(ErrorCode.SYSTEM_ERROR, "评论发布失败"))
             
         # Invalidate cache
-        cache.delete(f'comments_{activity_type}_{activity_id}')
+        invalidate_comments_cache(activity_type, activity_id)
             
         return Response(success_api_response(new_comment, message='评论发布成功'), status=status.HTTP_201_CREATED)
 
     def destroy(self, request, pk=None):
-        # We need to know activity_type and activity_id to invalidate cache
-        # For simplicity, we can either fetch the comment first or use a more generic invalidation
-        # Let's fetch the comment info if possible, but our sql.py doesn't have get_comment_by_id
-        # Alternatively, we can just let it expire or implement get_comment_by_id
-        
-        # For now, let's just delete and rely on timeout, or implement a quick lookup
-        # Actually, let's just delete the comment and accept that cache might be stale for 5 mins
-        # OR, we can implement a better invalidation if we had the info.
-        
-        status_code = sql.delete_comment_safe(pk, request.user.id)
+        status_code, activity_type, activity_id = sql.delete_comment_safe(pk, request.user.id)
         
         if status_code == 1:
             return Response(failed_api_response(ErrorCode.NOT_FOUND_ERROR, "评论不存在"))
         elif status_code == 2:
             return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权删除"))
             
-        # Note: Cache invalidation here is tricky without activity_id. 
-        # In a real app, we'd fetch the comment metadata before deleting.
+        # Invalidate cache
+        invalidate_comments_cache(activity_type, activity_id)
             
-        return Response(success_api_response(None, message='删除评论成功'))
\ No newline at end of file
+        return Response(success_api_response(None, message='删除评论成功'))
+
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Comment counts and latest comments of many activities
+        body: {"activities": [{"activity_type": "sport", "activity_id": 1}, ...], "latest": 3}
+        """
+        data = parse_data(request)
+        if not data:
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的请求数据"))
+
+        items = data.get('activities') or []
+        # Rejected before parsing, so an oversized body costs nothing
+        if not isinstance(items, list) or len(items) > BATCH_MAX_ACTIVITIES:
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "参数超出范围"))
+
+        try:
+            pairs = parse_activity_pairs(items)
+            latest = int(data.get('latest', SUMMARY_DEFAULT_LATEST))
+        except (KeyError, TypeError, ValueError):
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "参数格式错误"))
+        if not pairs or not 0 <= latest <= SUMMARY_MAX_LATEST:
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "参数超出范围"))
+
+        # Same rule as list(): own activities and friends' activities only
+        user_id = request.user.id
+        owners = sql.get_activity_owners(pairs)
+        friend_ids = friend_index.get_friend_ids(user_id)
+        pairs = [p for p in pairs if p in owners and (owners[p] == user_id or owners[p] in friend_ids)]
+
+        keys = summary_cache_keys(pairs)
+        cached = cache.get_many(list(keys.values()))
+        missing = [pair for pair in pairs if keys[pair] not in cached]
+        if missing:
+            fetched = sql.get_comment_summaries(missing, SUMMARY_MAX_LATEST)
+            cache.set_many({keys[pair]: summary for pair, summary in fetched.items()}, timeout=COMMENTS_CACHE_TIMEOUT)
+            cached.update({keys[pair]: summary for pair, summary in fetched.items()})
+
+        results = []
+        for activity_type, activity_id in pairs:
+            summary = cached[keys[(activity_type, activity_id)]]
+            results.append({
+                'activity_type': activity_type,
+                'activity_id': activity_id,
+                'count': summary['count'],
+                'latest': summary['latest'][:latest]
+            })
+
+        return Response(success_api_response(results, message='获取评论摘要成功'))
@@ -0,0 +1,108 @@
+import random
+import timeit
+from datetime import date, time, timedelta
+import pandas as pd
+from django.core.management.base import BaseCommand
+from DataAnalysis import sql
+from DataAnalysis.services.HealthDataAnalyzer import HealthDataAnalyzer
+
+SLEEP_COLUMNS = ('date', 'duration', 'quality_score', 'sleep_hour', 'wake_hour', 'sleep_time', 'wake_time')
+SPORT_COLUMNS = ('date', 'total_duration', 'total_calories', 'sport_count')
+DIET_COLUMNS = ('date', 'total_calories', 'meal_count', 'food_variety')
+
+
+class _FakeCursor:
+    """Replays pre-built row tuples the way a DB-API cursor returns them"""
+
+    def __init__(self, columns, rows):
+        self.description = [(c,) for c in columns]
+        self._rows = rows
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+def _make_rows(days):
+    rng = random.Random(days)
+    start = date.today() - timedelta(days=days)
+    sleep, sport, diet = [], [], []
+    for i in range(days):
+        d = start + timedelta(days=i)
+        sleep.append((d, rng.uniform(5, 9), rng.uniform(40, 100), rng.uniform(-2, 2), rng.uniform(6, 9),
+                      time(23, rng.randrange(60)), time(7, rng.randrange(60))))
+        sport.append((d, rng.uniform(0.2, 2), rng.uniform(50, 600), rng.randrange(1, 4)))
+        diet.append((d, rng.uniform(1200, 2800), rng.randrange(1, 5), rng.randrange(3, 15)))
+    return sleep, sport, diet
+
+
+def _fmt(d):
+    return d.strftime('%Y-%m-%d')
+
+
+# Row-at-a-time loaders as they were before the columnar rewrite, kept for comparison
+def _legacy_sleep(cursor):
+    data = sql.dictfetchall(cursor)
+    for d in data:
+        d['date'] = _fmt(d['date'])
+        if d['sleep_time'] and hasattr(d['sleep_time'], 'isoformat'):
+            d['sleep_time'] = d['sleep_time'].isoformat()
+        if d['wake_time'] and hasattr(d['wake_time'], 'isoformat'):
+            d['wake_time'] = d['wake_time'].isoformat()
+        d['sleep_hour'] = float(d['sleep_hour'] or 0)
+        d['wake_hour'] = float(d['wake_hour'] or 0)
+        d['duration'] = float(d['duration'] or 0)
+        d['quality_score'] = float(d['quality_score'] or 0)
+    return pd.DataFrame(data)
+
+
+def _legacy_sport(cursor):
+    formatted_data = []
+    for d in sql.dictfetchall(cursor):
+        duration = float(d['total_duration'] or 0)
+        calories = float(d['total_calories'] or 0)
+        formatted_data.append({
+            'date': _fmt(d['date']),
+            'total_duration': duration,
+            'total_calories': calories,
+            'sport_count': float(d['sport_count'] or 0),
+            'avg_intensity': calories / duration if duration > 0 else 0
+        })
+    return pd.DataFrame(formatted_data).set_index('date')
+
+
+def _legacy_diet(cursor):
+    formatted_data = []
+    for d in sql.dictfetchall(cursor):
+        formatted_data.append({
+            'date': _fmt(d['date']),
+            'total_calories': float(d['total_calories'] or 0),
+            'meal_count': float(d['meal_count'] or 0),
+            'food_variety': float(d['food_variety'] or 0)
+        })
+    return pd.DataFrame(formatted_data).set_index('date')
+
+
+class Command(BaseCommand):
+    help = "对比逐行与列式加载分析数据的耗时 (不访问数据库)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, nargs='+', default=[90, 365], help="模拟的天数, 默认 90 365")
+        parser.add_argument('--repeat', type=int, default=200, help="每种加载方式重复次数")
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        for days in options['days']:
+            sleep_rows, sport_rows, diet_rows = _make_rows(days)
+            cases = [
+                ('sleep', SLEEP_COLUMNS, sleep_rows, _legacy_sleep, HealthDataAnalyzer.sleep_frame),
+                ('sport', SPORT_COLUMNS, sport_rows, _legacy_sport, HealthDataAnalyzer.sport_frame),
+                ('diet', DIET_COLUMNS, diet_rows, _legacy_diet, HealthDataAnalyzer.diet_frame),
+            ]
+            for name, columns, rows, legacy, frame in cases:
+                cursor = _FakeCursor(columns, rows)
+                legacy_time = timeit.timeit(lambda: legacy(cursor), number=repeat) / repeat
+                columnar_time = timeit.timeit(lambda: frame(sql.columnfetchall(cursor)), number=repeat) / repeat
+                self.stdout.write(
+                    f"{days:>4} 天 {name:<5} 逐行 {legacy_time * 1000:8.3f} ms  "
+                    f"列式 {columnar_time * 1000:8.3f} ms  加速 {legacy_time / columnar_time:5.2f}x"
+                )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from DataAnalysis import sql
+from utils.cache_utils import invalidate_health_cache
+
+
+class Command(BaseCommand):
+    help = "重建每日健康数据汇总表 (dataanalysis_healthdailyrollup)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            dest='user_id',
+            default=None,
+            help="只重建指定用户 ID 的汇总数据, 默认重建全部用户",
+        )
+
+    def handle(self, *args, **options):
+        user_id = options['user_id']
+        row_count = sql.rebuild_health_rollup(user_id)
+
+        if user_id is not None:
+            invalidate_health_cache(user_id)
+            self.stdout.write(self.style.SUCCESS(f"用户 {user_id} 汇总重建完成, 共 {row_count} 天"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"全部用户汇总重建完成, 共 {row_count} 行"))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from DataAnalysis.services import AnalysisJobQueue
+
+
+class Command(BaseCommand):
+    help = "将超过 ANALYSIS_JOB_TIMEOUT 仍在排队/运行的分析任务标记为失败 (进程重启后遗留的任务)"
+
+    def handle(self, *args, **options):
+        count = AnalysisJobQueue.expire_stale_jobs()
+        self.stdout.write(self.style.SUCCESS(f"已标记 {count} 个超时任务为失败"))
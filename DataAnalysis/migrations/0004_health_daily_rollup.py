@@ -0,0 +1,605 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# 0003 definition, restored on reverse
+PREVIOUS_VIEW = """
+            DROP VIEW IF EXISTS view_health_data_comprehensive;
+            CREATE VIEW view_health_data_comprehensive AS
+            WITH daily_sleep AS (
+                SELECT 
+                    user_id, 
+                    date, 
+                    SUM(duration) as total_duration,
+                    AVG(
+                        CASE 
+                            WHEN duration BETWEEN 7 AND 9 THEN 40
+                            WHEN duration BETWEEN 6 AND 10 THEN 30
+                            WHEN duration BETWEEN 5 AND 11 THEN 20
+                            ELSE 10
+                        END +
+                        CASE 
+                            WHEN HOUR(sleep_time) BETWEEN 22 AND 23 THEN 30
+                            WHEN HOUR(sleep_time) = 21 OR HOUR(sleep_time) = 0 THEN 20
+                            WHEN HOUR(sleep_time) = 20 OR HOUR(sleep_time) = 1 THEN 15
+                            ELSE 10
+                        END +
+                        CASE 
+                            WHEN HOUR(wake_time) BETWEEN 6 AND 8 THEN 30
+                            WHEN HOUR(wake_time) = 5 OR HOUR(wake_time) = 9 THEN 20
+                            WHEN HOUR(wake_time) = 4 OR HOUR(wake_time) = 10 THEN 15
+                            ELSE 10
+                        END
+                    ) as avg_quality_score,
+                    AVG(HOUR(sleep_time)) as avg_sleep_hour,
+                    AVG(HOUR(wake_time)) as avg_wake_hour,
+                    MIN(sleep_time) as earliest_sleep_time,
+                    MAX(wake_time) as latest_wake_time
+                FROM view_sleep_record_full
+                GROUP BY user_id, date
+            ),
+            daily_sport AS (
+                SELECT 
+                    user_id, 
+                    date, 
+                    SUM(duration) as total_duration,
+                    SUM(calories) as total_calories,
+                    COUNT(*) as sport_count
+                FROM view_sport_record_full
+                GROUP BY user_id, date
+            ),
+            daily_diet AS (
+                SELECT 
+                    user_id, 
+                    date, 
+                    SUM(total_calories) as total_calories,
+                    COUNT(*) as meal_count,
+                    COUNT(DISTINCT food_id) as food_variety
+                FROM view_meal_record_full vmr
+                LEFT JOIN dietmanage_mealitem mi ON vmr.id = mi.meal_record_id
+                GROUP BY user_id, date
+            ),
+            all_dates AS (
+                SELECT DISTINCT user_id, date FROM (
+                    SELECT user_id, date FROM sleepmanage_sleeprecord
+                    UNION SELECT user_id, date FROM sportmanage_sportrecord
+                    UNION SELECT user_id, date FROM dietmanage_mealrecord
+                ) t
+            )
+            SELECT 
+                ad.user_id,
+                ad.date,
+                CAST(COALESCE(ds.total_duration, 0) AS DOUBLE) as sleep_duration,
+                CAST(COALESCE(ds.avg_quality_score, 0) AS DOUBLE) as sleep_quality_score,
+                CAST(COALESCE(ds.avg_sleep_hour, 0) AS DOUBLE) as avg_sleep_hour,
+                CAST(COALESCE(ds.avg_wake_hour, 0) AS DOUBLE) as avg_wake_hour,
+                ds.earliest_sleep_time,
+                ds.latest_wake_time,
+                CAST(COALESCE(dsp.total_duration, 0) AS DOUBLE) as sport_duration,
+                CAST(COALESCE(dsp.total_calories, 0) AS DOUBLE) as sport_calories,
+                CAST(COALESCE(dsp.sport_count, 0) AS DOUBLE) as sport_count,
+                CAST(COALESCE(dd.total_calories, 0) AS DOUBLE) as diet_calories,
+                CAST(COALESCE(dd.meal_count, 0) AS DOUBLE) as meal_count,
+                CAST(COALESCE(dd.food_variety, 0) AS DOUBLE) as food_variety
+            FROM all_dates ad
+            LEFT JOIN daily_sleep ds ON ad.user_id = ds.user_id AND ad.date = ds.date
+            LEFT JOIN daily_sport dsp ON ad.user_id = dsp.user_id AND ad.date = dsp.date
+            LEFT JOIN daily_diet dd ON ad.user_id = dd.user_id AND ad.date = dd.date;
+            """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DataAnalysis", "0003_update_health_view_types"),
+        ("SleepManage", "0017_sleeprecord_sleepmanage_user_id_3c0f7f_idx"),
+        ("SportManage", "0009_sportrecord_sportmanage_user_id_5ef1ae_idx"),
+        ("DietManage", "0019_meal_record_cascade_triggers"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # 1. Rollup table, clustered on (user_id, date)
+        migrations.CreateModel(
+            name="HealthDailyRollup",
+            fields=[
+                (
+                    "pk",
+                    models.CompositePrimaryKey(
+                        "user_id",
+                        "date",
+                        blank=True,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "sleep_duration",
+                    models.FloatField(default=0, help_text="当日睡眠总时长（小时）"),
+                ),
+                (
+                    "sleep_quality_score",
+                    models.FloatField(default=0, help_text="当日平均睡眠质量评分"),
+                ),
+                ("avg_sleep_hour", models.FloatField(default=0)),
+                ("avg_wake_hour", models.FloatField(default=0)),
+                ("earliest_sleep_time", models.TimeField(blank=True, null=True)),
+                ("latest_wake_time", models.TimeField(blank=True, null=True)),
+                (
+                    "sport_duration",
+                    models.FloatField(default=0, help_text="当日运动总时长（小时）"),
+                ),
+                ("sport_calories", models.FloatField(default=0)),
+                ("sport_count", models.IntegerField(default=0)),
+                ("diet_calories", models.FloatField(default=0)),
+                ("meal_count", models.IntegerField(default=0)),
+                ("food_variety", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="health_daily_rollups",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+
+        # 2. Recompute a single (user_id, date) row from the base tables
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_refresh_health_rollup;
+            CREATE PROCEDURE sp_refresh_health_rollup(
+                IN p_user_id INT,
+                IN p_date DATE
+            )
+            BEGIN
+                DECLARE v_sleep_count INT DEFAULT 0;
+                DECLARE v_sleep_duration DOUBLE DEFAULT 0;
+                DECLARE v_sleep_quality DOUBLE DEFAULT 0;
+                DECLARE v_sleep_hour DOUBLE DEFAULT 0;
+                DECLARE v_wake_hour DOUBLE DEFAULT 0;
+                DECLARE v_earliest_sleep TIME;
+                DECLARE v_latest_wake TIME;
+                DECLARE v_sport_count INT DEFAULT 0;
+                DECLARE v_sport_duration DOUBLE DEFAULT 0;
+                DECLARE v_sport_calories DOUBLE DEFAULT 0;
+                DECLARE v_meal_count INT DEFAULT 0;
+                DECLARE v_diet_calories DOUBLE DEFAULT 0;
+                DECLARE v_food_variety INT DEFAULT 0;
+
+                -- Sleep: (user_id, date) index lookup
+                SELECT
+                    COUNT(*),
+                    COALESCE(SUM(duration), 0),
+                    COALESCE(AVG(
+                        CASE
+                            WHEN duration BETWEEN 7 AND 9 THEN 40
+                            WHEN duration BETWEEN 6 AND 10 THEN 30
+                            WHEN duration BETWEEN 5 AND 11 THEN 20
+                            ELSE 10
+                        END +
+                        CASE
+                            WHEN HOUR(sleep_time) BETWEEN 22 AND 23 THEN 30
+                            WHEN HOUR(sleep_time) = 21 OR HOUR(sleep_time) = 0 THEN 20
+                            WHEN HOUR(sleep_time) = 20 OR HOUR(sleep_time) = 1 THEN 15
+                            ELSE 10
+                        END +
+                        CASE
+                            WHEN HOUR(wake_time) BETWEEN 6 AND 8 THEN 30
+                            WHEN HOUR(wake_time) = 5 OR HOUR(wake_time) = 9 THEN 20
+                            WHEN HOUR(wake_time) = 4 OR HOUR(wake_time) = 10 THEN 15
+                            ELSE 10
+                        END
+                    ), 0),
+                    COALESCE(AVG(HOUR(sleep_time)), 0),
+                    COALESCE(AVG(HOUR(wake_time)), 0),
+                    MIN(sleep_time),
+                    MAX(wake_time)
+                INTO v_sleep_count, v_sleep_duration, v_sleep_quality, v_sleep_hour,
+                     v_wake_hour, v_earliest_sleep, v_latest_wake
+                FROM view_sleep_record_full
+                WHERE user_id = p_user_id AND date = p_date;
+
+                -- Sport
+                SELECT COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(calories), 0)
+                INTO v_sport_count, v_sport_duration, v_sport_calories
+                FROM view_sport_record_full
+                WHERE user_id = p_user_id AND date = p_date;
+
+                -- Diet: read base tables directly, view_meal_record_full is not mergeable
+                SELECT
+                    COUNT(DISTINCT mr.id),
+                    COALESCE(SUM(nf.energy_kj * 0.239 * mi.quantity_in_grams / 100.0), 0),
+                    COUNT(DISTINCT mi.food_id)
+                INTO v_meal_count, v_diet_calories, v_food_variety
+                FROM dietmanage_mealrecord mr
+                LEFT JOIN dietmanage_mealitem mi ON mi.meal_record_id = mr.id
+                LEFT JOIN dietmanage_nutritionfood nf ON nf.id = mi.food_id
+                WHERE mr.user_id = p_user_id AND mr.date = p_date;
+
+                IF v_sleep_count = 0 AND v_sport_count = 0 AND v_meal_count = 0 THEN
+                    DELETE FROM dataanalysis_healthdailyrollup
+                    WHERE user_id = p_user_id AND date = p_date;
+                ELSE
+                    INSERT INTO dataanalysis_healthdailyrollup (
+                        user_id, date,
+                        sleep_duration, sleep_quality_score, avg_sleep_hour, avg_wake_hour,
+                        earliest_sleep_time, latest_wake_time,
+                        sport_duration, sport_calories, sport_count,
+                        diet_calories, meal_count, food_variety
+                    ) VALUES (
+                        p_user_id, p_date,
+                        v_sleep_duration, v_sleep_quality, v_sleep_hour, v_wake_hour,
+                        v_earliest_sleep, v_latest_wake,
+                        v_sport_duration, v_sport_calories, v_sport_count,
+                        v_diet_calories, v_meal_count, v_food_variety
+                    )
+                    ON DUPLICATE KEY UPDATE
+                        sleep_duration = VALUES(sleep_duration),
+                        sleep_quality_score = VALUES(sleep_quality_score),
+                        avg_sleep_hour = VALUES(avg_sleep_hour),
+                        avg_wake_hour = VALUES(avg_wake_hour),
+                        earliest_sleep_time = VALUES(earliest_sleep_time),
+                        latest_wake_time = VALUES(latest_wake_time),
+                        sport_duration = VALUES(sport_duration),
+                        sport_calories = VALUES(sport_calories),
+                        sport_count = VALUES(sport_count),
+                        diet_calories = VALUES(diet_calories),
+                        meal_count = VALUES(meal_count),
+                        food_variety = VALUES(food_variety);
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP PROCEDURE IF EXISTS sp_refresh_health_rollup;"
+        ),
+
+        # 3. Full rebuild (p_user_id = NULL rebuilds every user)
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_rebuild_health_rollup;
+            CREATE PROCEDURE sp_rebuild_health_rollup(
+                IN p_user_id INT
+            )
+            BEGIN
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    RESIGNAL;
+                END;
+
+                START TRANSACTION;
+                DELETE FROM dataanalysis_healthdailyrollup
+                WHERE p_user_id IS NULL OR user_id = p_user_id;
+
+                INSERT INTO dataanalysis_healthdailyrollup (
+                    user_id, date,
+                    sleep_duration, sleep_quality_score, avg_sleep_hour, avg_wake_hour,
+                    earliest_sleep_time, latest_wake_time,
+                    sport_duration, sport_calories, sport_count,
+                    diet_calories, meal_count, food_variety
+                )
+                WITH daily_sleep AS (
+                    SELECT
+                        user_id,
+                        date,
+                        SUM(duration) as total_duration,
+                        AVG(
+                            CASE
+                                WHEN duration BETWEEN 7 AND 9 THEN 40
+                                WHEN duration BETWEEN 6 AND 10 THEN 30
+                                WHEN duration BETWEEN 5 AND 11 THEN 20
+                                ELSE 10
+                            END +
+                            CASE
+                                WHEN HOUR(sleep_time) BETWEEN 22 AND 23 THEN 30
+                                WHEN HOUR(sleep_time) = 21 OR HOUR(sleep_time) = 0 THEN 20
+                                WHEN HOUR(sleep_time) = 20 OR HOUR(sleep_time) = 1 THEN 15
+                                ELSE 10
+                            END +
+                            CASE
+                                WHEN HOUR(wake_time) BETWEEN 6 AND 8 THEN 30
+                                WHEN HOUR(wake_time) = 5 OR HOUR(wake_time) = 9 THEN 20
+                                WHEN HOUR(wake_time) = 4 OR HOUR(wake_time) = 10 THEN 15
+                                ELSE 10
+                            END
+                        ) as avg_quality_score,
+                        AVG(HOUR(sleep_time)) as avg_sleep_hour,
+                        AVG(HOUR(wake_time)) as avg_wake_hour,
+                        MIN(sleep_time) as earliest_sleep_time,
+                        MAX(wake_time) as latest_wake_time
+                    FROM view_sleep_record_full
+                    WHERE p_user_id IS NULL OR user_id = p_user_id
+                    GROUP BY user_id, date
+                ),
+                daily_sport AS (
+                    SELECT
+                        user_id,
+                        date,
+                        SUM(duration) as total_duration,
+                        SUM(calories) as total_calories,
+                        COUNT(*) as sport_count
+                    FROM view_sport_record_full
+                    WHERE p_user_id IS NULL OR user_id = p_user_id
+                    GROUP BY user_id, date
+                ),
+                daily_diet AS (
+                    SELECT
+                        mr.user_id,
+                        mr.date,
+                        SUM(nf.energy_kj * 0.239 * mi.quantity_in_grams / 100.0) as total_calories,
+                        COUNT(DISTINCT mr.id) as meal_count,
+                        COUNT(DISTINCT mi.food_id) as food_variety
+                    FROM dietmanage_mealrecord mr
+                    LEFT JOIN dietmanage_mealitem mi ON mi.meal_record_id = mr.id
+                    LEFT JOIN dietmanage_nutritionfood nf ON nf.id = mi.food_id
+                    WHERE p_user_id IS NULL OR mr.user_id = p_user_id
+                    GROUP BY mr.user_id, mr.date
+                ),
+                all_dates AS (
+                    SELECT user_id, date FROM daily_sleep
+                    UNION SELECT user_id, date FROM daily_sport
+                    UNION SELECT user_id, date FROM daily_diet
+                )
+                SELECT
+                    ad.user_id,
+                    ad.date,
+                    COALESCE(ds.total_duration, 0),
+                    COALESCE(ds.avg_quality_score, 0),
+                    COALESCE(ds.avg_sleep_hour, 0),
+                    COALESCE(ds.avg_wake_hour, 0),
+                    ds.earliest_sleep_time,
+                    ds.latest_wake_time,
+                    COALESCE(dsp.total_duration, 0),
+                    COALESCE(dsp.total_calories, 0),
+                    COALESCE(dsp.sport_count, 0),
+                    COALESCE(dd.total_calories, 0),
+                    COALESCE(dd.meal_count, 0),
+                    COALESCE(dd.food_variety, 0)
+                FROM all_dates ad
+                LEFT JOIN daily_sleep ds ON ad.user_id = ds.user_id AND ad.date = ds.date
+                LEFT JOIN daily_sport dsp ON ad.user_id = dsp.user_id AND ad.date = dsp.date
+                LEFT JOIN daily_diet dd ON ad.user_id = dd.user_id AND ad.date = dd.date;
+                COMMIT;
+
+                SELECT COUNT(*) AS row_count FROM dataanalysis_healthdailyrollup
+                WHERE p_user_id IS NULL OR user_id = p_user_id;
+            END;
+            """,
+            reverse_sql="DROP PROCEDURE IF EXISTS sp_rebuild_health_rollup;"
+        ),
+
+        # 4. Sleep record triggers
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_sleep_record_rollup_insert;
+            CREATE TRIGGER tr_sleep_record_rollup_insert
+            AFTER INSERT ON sleepmanage_sleeprecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(NEW.user_id, NEW.date);
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_sleep_record_rollup_insert;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_sleep_record_rollup_update;
+            CREATE TRIGGER tr_sleep_record_rollup_update
+            AFTER UPDATE ON sleepmanage_sleeprecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(OLD.user_id, OLD.date);
+                IF NEW.user_id != OLD.user_id OR NEW.date != OLD.date THEN
+                    CALL sp_refresh_health_rollup(NEW.user_id, NEW.date);
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_sleep_record_rollup_update;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_sleep_record_rollup_delete;
+            CREATE TRIGGER tr_sleep_record_rollup_delete
+            AFTER DELETE ON sleepmanage_sleeprecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(OLD.user_id, OLD.date);
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_sleep_record_rollup_delete;"
+        ),
+
+        # 5. Sport record triggers
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_sport_record_rollup_insert;
+            CREATE TRIGGER tr_sport_record_rollup_insert
+            AFTER INSERT ON sportmanage_sportrecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(NEW.user_id, NEW.date);
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_sport_record_rollup_insert;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_sport_record_rollup_update;
+            CREATE TRIGGER tr_sport_record_rollup_update
+            AFTER UPDATE ON sportmanage_sportrecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(OLD.user_id, OLD.date);
+                IF NEW.user_id != OLD.user_id OR NEW.date != OLD.date THEN
+                    CALL sp_refresh_health_rollup(NEW.user_id, NEW.date);
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_sport_record_rollup_update;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_sport_record_rollup_delete;
+            CREATE TRIGGER tr_sport_record_rollup_delete
+            AFTER DELETE ON sportmanage_sportrecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(OLD.user_id, OLD.date);
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_sport_record_rollup_delete;"
+        ),
+
+        # 6. Meal record triggers
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_record_rollup_insert;
+            CREATE TRIGGER tr_meal_record_rollup_insert
+            AFTER INSERT ON dietmanage_mealrecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(NEW.user_id, NEW.date);
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_meal_record_rollup_insert;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_record_rollup_update;
+            CREATE TRIGGER tr_meal_record_rollup_update
+            AFTER UPDATE ON dietmanage_mealrecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(OLD.user_id, OLD.date);
+                IF NEW.user_id != OLD.user_id OR NEW.date != OLD.date THEN
+                    CALL sp_refresh_health_rollup(NEW.user_id, NEW.date);
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_meal_record_rollup_update;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_record_rollup_delete;
+            CREATE TRIGGER tr_meal_record_rollup_delete
+            AFTER DELETE ON dietmanage_mealrecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(OLD.user_id, OLD.date);
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_meal_record_rollup_delete;"
+        ),
+
+        # 7. Meal item triggers (items change the day's calories and food variety)
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_item_rollup_insert;
+            CREATE TRIGGER tr_meal_item_rollup_insert
+            AFTER INSERT ON dietmanage_mealitem
+            FOR EACH ROW
+            BEGIN
+                DECLARE v_user_id INT;
+                DECLARE v_date DATE;
+                SELECT user_id, date INTO v_user_id, v_date
+                FROM dietmanage_mealrecord WHERE id = NEW.meal_record_id;
+                IF v_user_id IS NOT NULL THEN
+                    CALL sp_refresh_health_rollup(v_user_id, v_date);
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_meal_item_rollup_insert;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_item_rollup_update;
+            CREATE TRIGGER tr_meal_item_rollup_update
+            AFTER UPDATE ON dietmanage_mealitem
+            FOR EACH ROW
+            BEGIN
+                DECLARE v_user_id INT;
+                DECLARE v_date DATE;
+                SELECT user_id, date INTO v_user_id, v_date
+                FROM dietmanage_mealrecord WHERE id = OLD.meal_record_id;
+                IF v_user_id IS NOT NULL THEN
+                    CALL sp_refresh_health_rollup(v_user_id, v_date);
+                END IF;
+                IF NEW.meal_record_id != OLD.meal_record_id THEN
+                    SET v_user_id = NULL;
+                    SELECT user_id, date INTO v_user_id, v_date
+                    FROM dietmanage_mealrecord WHERE id = NEW.meal_record_id;
+                    IF v_user_id IS NOT NULL THEN
+                        CALL sp_refresh_health_rollup(v_user_id, v_date);
+                    END IF;
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_meal_item_rollup_update;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_item_rollup_delete;
+            CREATE TRIGGER tr_meal_item_rollup_delete
+            AFTER DELETE ON dietmanage_mealitem
+            FOR EACH ROW
+            BEGIN
+                DECLARE v_user_id INT;
+                DECLARE v_date DATE;
+                SELECT user_id, date INTO v_user_id, v_date
+                FROM dietmanage_mealrecord WHERE id = OLD.meal_record_id;
+                IF v_user_id IS NOT NULL THEN
+                    CALL sp_refresh_health_rollup(v_user_id, v_date);
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_meal_item_rollup_delete;"
+        ),
+
+        # 8. Trigger: User Cascade Delete
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_health_rollup_cascade_delete;
+            CREATE TRIGGER tr_health_rollup_cascade_delete
+            BEFORE DELETE ON auth_user
+            FOR EACH ROW
+            BEGIN
+                DELETE FROM dataanalysis_healthdailyrollup WHERE user_id = OLD.id;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_health_rollup_cascade_delete;"
+        ),
+
+        # 9. Keep view_health_data_comprehensive for existing readers, now a mergeable view over the rollup
+        migrations.RunSQL(
+            sql="""
+            DROP VIEW IF EXISTS view_health_data_comprehensive;
+            CREATE VIEW view_health_data_comprehensive AS
+            SELECT
+                user_id,
+                date,
+                CAST(sleep_duration AS DOUBLE) as sleep_duration,
+                CAST(sleep_quality_score AS DOUBLE) as sleep_quality_score,
+                CAST(avg_sleep_hour AS DOUBLE) as avg_sleep_hour,
+                CAST(avg_wake_hour AS DOUBLE) as avg_wake_hour,
+                earliest_sleep_time,
+                latest_wake_time,
+                CAST(sport_duration AS DOUBLE) as sport_duration,
+                CAST(sport_calories AS DOUBLE) as sport_calories,
+                CAST(sport_count AS DOUBLE) as sport_count,
+                CAST(diet_calories AS DOUBLE) as diet_calories,
+                CAST(meal_count AS DOUBLE) as meal_count,
+                CAST(food_variety AS DOUBLE) as food_variety
+            FROM dataanalysis_healthdailyrollup;
+            """,
+            reverse_sql=PREVIOUS_VIEW,
+        ),
+
+        # 10. Backfill
+        migrations.RunSQL(
+            sql="CALL sp_rebuild_health_rollup(NULL);",
+            reverse_sql=""
+        ),
+    ]
@@ -0,0 +1,90 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DataAnalysis", "0004_health_daily_rollup"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalysisJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "analysis_type",
+                    models.CharField(
+                        choices=[
+                            ("sleep_prediction", "睡眠质量预测"),
+                            ("sleep_sport_correlation", "睡眠运动关联性"),
+                            ("health_trend", "健康趋势分析"),
+                            ("calorie_analysis", "卡路里分析"),
+                            ("sleep_quality_score", "睡眠质量评分"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("time_range", models.CharField(default="30d", max_length=10)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "排队中"),
+                            ("running", "运行中"),
+                            ("success", "已完成"),
+                            ("failed", "失败"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "dedup_key",
+                    models.CharField(blank=True, max_length=100, null=True, unique=True),
+                ),
+                ("error_message", models.TextField(blank=True, default="")),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "result",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="jobs",
+                        to="DataAnalysis.analysisresult",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analysis_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "created_at"],
+                        name="DataAnalysi_status_b007cb_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DataAnalysis", "0005_analysisjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analysisresult",
+            name="time_range",
+            field=models.CharField(
+                blank=True, help_text="生成该结果的时间范围", max_length=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="analysisresult",
+            name="data_version",
+            field=models.BigIntegerField(
+                blank=True, help_text="生成该结果时用户健康数据的版本号", null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,414 @@
+from django.db import migrations
+
+# Definitions from 0004, restored on reverse
+PREVIOUS_SP_REFRESH_HEALTH_ROLLUP = """
+            DROP PROCEDURE IF EXISTS sp_refresh_health_rollup;
+            CREATE PROCEDURE sp_refresh_health_rollup(
+                IN p_user_id INT,
+                IN p_date DATE
+            )
+            BEGIN
+                DECLARE v_sleep_count INT DEFAULT 0;
+                DECLARE v_sleep_duration DOUBLE DEFAULT 0;
+                DECLARE v_sleep_quality DOUBLE DEFAULT 0;
+                DECLARE v_sleep_hour DOUBLE DEFAULT 0;
+                DECLARE v_wake_hour DOUBLE DEFAULT 0;
+                DECLARE v_earliest_sleep TIME;
+                DECLARE v_latest_wake TIME;
+                DECLARE v_sport_count INT DEFAULT 0;
+                DECLARE v_sport_duration DOUBLE DEFAULT 0;
+                DECLARE v_sport_calories DOUBLE DEFAULT 0;
+                DECLARE v_meal_count INT DEFAULT 0;
+                DECLARE v_diet_calories DOUBLE DEFAULT 0;
+                DECLARE v_food_variety INT DEFAULT 0;
+
+                -- Sleep: (user_id, date) index lookup
+                SELECT
+                    COUNT(*),
+                    COALESCE(SUM(duration), 0),
+                    COALESCE(AVG(
+                        CASE
+                            WHEN duration BETWEEN 7 AND 9 THEN 40
+                            WHEN duration BETWEEN 6 AND 10 THEN 30
+                            WHEN duration BETWEEN 5 AND 11 THEN 20
+                            ELSE 10
+                        END +
+                        CASE
+                            WHEN HOUR(sleep_time) BETWEEN 22 AND 23 THEN 30
+                            WHEN HOUR(sleep_time) = 21 OR HOUR(sleep_time) = 0 THEN 20
+                            WHEN HOUR(sleep_time) = 20 OR HOUR(sleep_time) = 1 THEN 15
+                            ELSE 10
+                        END +
+                        CASE
+                            WHEN HOUR(wake_time) BETWEEN 6 AND 8 THEN 30
+                            WHEN HOUR(wake_time) = 5 OR HOUR(wake_time) = 9 THEN 20
+                            WHEN HOUR(wake_time) = 4 OR HOUR(wake_time) = 10 THEN 15
+                            ELSE 10
+                        END
+                    ), 0),
+                    COALESCE(AVG(HOUR(sleep_time)), 0),
+                    COALESCE(AVG(HOUR(wake_time)), 0),
+                    MIN(sleep_time),
+                    MAX(wake_time)
+                INTO v_sleep_count, v_sleep_duration, v_sleep_quality, v_sleep_hour,
+                     v_wake_hour, v_earliest_sleep, v_latest_wake
+                FROM view_sleep_record_full
+                WHERE user_id = p_user_id AND date = p_date;
+
+                -- Sport
+                SELECT COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(calories), 0)
+                INTO v_sport_count, v_sport_duration, v_sport_calories
+                FROM view_sport_record_full
+                WHERE user_id = p_user_id AND date = p_date;
+
+                -- Diet: read base tables directly, view_meal_record_full is not mergeable
+                SELECT
+                    COUNT(DISTINCT mr.id),
+                    COALESCE(SUM(nf.energy_kj * 0.239 * mi.quantity_in_grams / 100.0), 0),
+                    COUNT(DISTINCT mi.food_id)
+                INTO v_meal_count, v_diet_calories, v_food_variety
+                FROM dietmanage_mealrecord mr
+                LEFT JOIN dietmanage_mealitem mi ON mi.meal_record_id = mr.id
+                LEFT JOIN dietmanage_nutritionfood nf ON nf.id = mi.food_id
+                WHERE mr.user_id = p_user_id AND mr.date = p_date;
+
+                IF v_sleep_count = 0 AND v_sport_count = 0 AND v_meal_count = 0 THEN
+                    DELETE FROM dataanalysis_healthdailyrollup
+                    WHERE user_id = p_user_id AND date = p_date;
+                ELSE
+                    INSERT INTO dataanalysis_healthdailyrollup (
+                        user_id, date,
+                        sleep_duration, sleep_quality_score, avg_sleep_hour, avg_wake_hour,
+                        earliest_sleep_time, latest_wake_time,
+                        sport_duration, sport_calories, sport_count,
+                        diet_calories, meal_count, food_variety
+                    ) VALUES (
+                        p_user_id, p_date,
+                        v_sleep_duration, v_sleep_quality, v_sleep_hour, v_wake_hour,
+                        v_earliest_sleep, v_latest_wake,
+                        v_sport_duration, v_sport_calories, v_sport_count,
+                        v_diet_calories, v_meal_count, v_food_variety
+                    )
+                    ON DUPLICATE KEY UPDATE
+                        sleep_duration = VALUES(sleep_duration),
+                        sleep_quality_score = VALUES(sleep_quality_score),
+                        avg_sleep_hour = VALUES(avg_sleep_hour),
+                        avg_wake_hour = VALUES(avg_wake_hour),
+                        earliest_sleep_time = VALUES(earliest_sleep_time),
+                        latest_wake_time = VALUES(latest_wake_time),
+                        sport_duration = VALUES(sport_duration),
+                        sport_calories = VALUES(sport_calories),
+                        sport_count = VALUES(sport_count),
+                        diet_calories = VALUES(diet_calories),
+                        meal_count = VALUES(meal_count),
+                        food_variety = VALUES(food_variety);
+                END IF;
+            END;
+"""
+
+PREVIOUS_SP_REBUILD_HEALTH_ROLLUP = """
+            DROP PROCEDURE IF EXISTS sp_rebuild_health_rollup;
+            CREATE PROCEDURE sp_rebuild_health_rollup(
+                IN p_user_id INT
+            )
+            BEGIN
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    RESIGNAL;
+                END;
+
+                START TRANSACTION;
+                DELETE FROM dataanalysis_healthdailyrollup
+                WHERE p_user_id IS NULL OR user_id = p_user_id;
+
+                INSERT INTO dataanalysis_healthdailyrollup (
+                    user_id, date,
+                    sleep_duration, sleep_quality_score, avg_sleep_hour, avg_wake_hour,
+                    earliest_sleep_time, latest_wake_time,
+                    sport_duration, sport_calories, sport_count,
+                    diet_calories, meal_count, food_variety
+                )
+                WITH daily_sleep AS (
+                    SELECT
+                        user_id,
+                        date,
+                        SUM(duration) as total_duration,
+                        AVG(
+                            CASE
+                                WHEN duration BETWEEN 7 AND 9 THEN 40
+                                WHEN duration BETWEEN 6 AND 10 THEN 30
+                                WHEN duration BETWEEN 5 AND 11 THEN 20
+                                ELSE 10
+                            END +
+                            CASE
+                                WHEN HOUR(sleep_time) BETWEEN 22 AND 23 THEN 30
+                                WHEN HOUR(sleep_time) = 21 OR HOUR(sleep_time) = 0 THEN 20
+                                WHEN HOUR(sleep_time) = 20 OR HOUR(sleep_time) = 1 THEN 15
+                                ELSE 10
+                            END +
+                            CASE
+                                WHEN HOUR(wake_time) BETWEEN 6 AND 8 THEN 30
+                                WHEN HOUR(wake_time) = 5 OR HOUR(wake_time) = 9 THEN 20
+                                WHEN HOUR(wake_time) = 4 OR HOUR(wake_time) = 10 THEN 15
+                                ELSE 10
+                            END
+                        ) as avg_quality_score,
+                        AVG(HOUR(sleep_time)) as avg_sleep_hour,
+                        AVG(HOUR(wake_time)) as avg_wake_hour,
+                        MIN(sleep_time) as earliest_sleep_time,
+                        MAX(wake_time) as latest_wake_time
+                    FROM view_sleep_record_full
+                    WHERE p_user_id IS NULL OR user_id = p_user_id
+                    GROUP BY user_id, date
+                ),
+                daily_sport AS (
+                    SELECT
+                        user_id,
+                        date,
+                        SUM(duration) as total_duration,
+                        SUM(calories) as total_calories,
+                        COUNT(*) as sport_count
+                    FROM view_sport_record_full
+                    WHERE p_user_id IS NULL OR user_id = p_user_id
+                    GROUP BY user_id, date
+                ),
+                daily_diet AS (
+                    SELECT
+                        mr.user_id,
+                        mr.date,
+                        SUM(nf.energy_kj * 0.239 * mi.quantity_in_grams / 100.0) as total_calories,
+                        COUNT(DISTINCT mr.id) as meal_count,
+                        COUNT(DISTINCT mi.food_id) as food_variety
+                    FROM dietmanage_mealrecord mr
+                    LEFT JOIN dietmanage_mealitem mi ON mi.meal_record_id = mr.id
+                    LEFT JOIN dietmanage_nutritionfood nf ON nf.id = mi.food_id
+                    WHERE p_user_id IS NULL OR mr.user_id = p_user_id
+                    GROUP BY mr.user_id, mr.date
+                ),
+                all_dates AS (
+                    SELECT user_id, date FROM daily_sleep
+                    UNION SELECT user_id, date FROM daily_sport
+                    UNION SELECT user_id, date FROM daily_diet
+                )
+                SELECT
+                    ad.user_id,
+                    ad.date,
+                    COALESCE(ds.total_duration, 0),
+                    COALESCE(ds.avg_quality_score, 0),
+                    COALESCE(ds.avg_sleep_hour, 0),
+                    COALESCE(ds.avg_wake_hour, 0),
+                    ds.earliest_sleep_time,
+                    ds.latest_wake_time,
+                    COALESCE(dsp.total_duration, 0),
+                    COALESCE(dsp.total_calories, 0),
+                    COALESCE(dsp.sport_count, 0),
+                    COALESCE(dd.total_calories, 0),
+                    COALESCE(dd.meal_count, 0),
+                    COALESCE(dd.food_variety, 0)
+                FROM all_dates ad
+                LEFT JOIN daily_sleep ds ON ad.user_id = ds.user_id AND ad.date = ds.date
+                LEFT JOIN daily_sport dsp ON ad.user_id = dsp.user_id AND ad.date = dsp.date
+                LEFT JOIN daily_diet dd ON ad.user_id = dd.user_id AND ad.date = dd.date;
+                COMMIT;
+
+                SELECT COUNT(*) AS row_count FROM dataanalysis_healthdailyrollup
+                WHERE p_user_id IS NULL OR user_id = p_user_id;
+            END;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DataAnalysis", "0006_analysisresult_time_range_data_version"),
+        ("SleepManage", "0020_sleeprecord_stored_duration_quality"),
+    ]
+
+    operations = [
+        # 1. Per-day refresh reads the stored per-record sleep quality score
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_refresh_health_rollup;
+            CREATE PROCEDURE sp_refresh_health_rollup(
+                IN p_user_id INT,
+                IN p_date DATE
+            )
+            BEGIN
+                DECLARE v_sleep_count INT DEFAULT 0;
+                DECLARE v_sleep_duration DOUBLE DEFAULT 0;
+                DECLARE v_sleep_quality DOUBLE DEFAULT 0;
+                DECLARE v_sleep_hour DOUBLE DEFAULT 0;
+                DECLARE v_wake_hour DOUBLE DEFAULT 0;
+                DECLARE v_earliest_sleep TIME;
+                DECLARE v_latest_wake TIME;
+                DECLARE v_sport_count INT DEFAULT 0;
+                DECLARE v_sport_duration DOUBLE DEFAULT 0;
+                DECLARE v_sport_calories DOUBLE DEFAULT 0;
+                DECLARE v_meal_count INT DEFAULT 0;
+                DECLARE v_diet_calories DOUBLE DEFAULT 0;
+                DECLARE v_food_variety INT DEFAULT 0;
+
+                -- Sleep: (user_id, date) index lookup
+                SELECT
+                    COUNT(*),
+                    COALESCE(SUM(duration), 0),
+                    COALESCE(AVG(quality_score), 0),
+                    COALESCE(AVG(HOUR(sleep_time)), 0),
+                    COALESCE(AVG(HOUR(wake_time)), 0),
+                    MIN(sleep_time),
+                    MAX(wake_time)
+                INTO v_sleep_count, v_sleep_duration, v_sleep_quality, v_sleep_hour,
+                     v_wake_hour, v_earliest_sleep, v_latest_wake
+                FROM view_sleep_record_full
+                WHERE user_id = p_user_id AND date = p_date;
+
+                -- Sport
+                SELECT COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(calories), 0)
+                INTO v_sport_count, v_sport_duration, v_sport_calories
+                FROM view_sport_record_full
+                WHERE user_id = p_user_id AND date = p_date;
+
+                -- Diet: read base tables directly, food variety needs the items
+                SELECT
+                    COUNT(DISTINCT mr.id),
+                    COALESCE(SUM(nf.energy_kj * 0.239 * mi.quantity_in_grams / 100.0), 0),
+                    COUNT(DISTINCT mi.food_id)
+                INTO v_meal_count, v_diet_calories, v_food_variety
+                FROM dietmanage_mealrecord mr
+                LEFT JOIN dietmanage_mealitem mi ON mi.meal_record_id = mr.id
+                LEFT JOIN dietmanage_nutritionfood nf ON nf.id = mi.food_id
+                WHERE mr.user_id = p_user_id AND mr.date = p_date;
+
+                IF v_sleep_count = 0 AND v_sport_count = 0 AND v_meal_count = 0 THEN
+                    DELETE FROM dataanalysis_healthdailyrollup
+                    WHERE user_id = p_user_id AND date = p_date;
+                ELSE
+                    INSERT INTO dataanalysis_healthdailyrollup (
+                        user_id, date,
+                        sleep_duration, sleep_quality_score, avg_sleep_hour, avg_wake_hour,
+                        earliest_sleep_time, latest_wake_time,
+                        sport_duration, sport_calories, sport_count,
+                        diet_calories, meal_count, food_variety
+                    ) VALUES (
+                        p_user_id, p_date,
+                        v_sleep_duration, v_sleep_quality, v_sleep_hour, v_wake_hour,
+                        v_earliest_sleep, v_latest_wake,
+                        v_sport_duration, v_sport_calories, v_sport_count,
+                        v_diet_calories, v_meal_count, v_food_variety
+                    )
+                    ON DUPLICATE KEY UPDATE
+                        sleep_duration = VALUES(sleep_duration),
+                        sleep_quality_score = VALUES(sleep_quality_score),
+                        avg_sleep_hour = VALUES(avg_sleep_hour),
+                        avg_wake_hour = VALUES(avg_wake_hour),
+                        earliest_sleep_time = VALUES(earliest_sleep_time),
+                        latest_wake_time = VALUES(latest_wake_time),
+                        sport_duration = VALUES(sport_duration),
+                        sport_calories = VALUES(sport_calories),
+                        sport_count = VALUES(sport_count),
+                        diet_calories = VALUES(diet_calories),
+                        meal_count = VALUES(meal_count),
+                        food_variety = VALUES(food_variety);
+                END IF;
+            END;
+            """,
+            reverse_sql=PREVIOUS_SP_REFRESH_HEALTH_ROLLUP
+        ),
+
+        # 2. Same for the full rebuild
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_rebuild_health_rollup;
+            CREATE PROCEDURE sp_rebuild_health_rollup(
+                IN p_user_id INT
+            )
+            BEGIN
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    RESIGNAL;
+                END;
+
+                START TRANSACTION;
+                DELETE FROM dataanalysis_healthdailyrollup
+                WHERE p_user_id IS NULL OR user_id = p_user_id;
+
+                INSERT INTO dataanalysis_healthdailyrollup (
+                    user_id, date,
+                    sleep_duration, sleep_quality_score, avg_sleep_hour, avg_wake_hour,
+                    earliest_sleep_time, latest_wake_time,
+                    sport_duration, sport_calories, sport_count,
+                    diet_calories, meal_count, food_variety
+                )
+                WITH daily_sleep AS (
+                    SELECT
+                        user_id,
+                        date,
+                        SUM(duration) as total_duration,
+                        AVG(quality_score) as avg_quality_score,
+                        AVG(HOUR(sleep_time)) as avg_sleep_hour,
+                        AVG(HOUR(wake_time)) as avg_wake_hour,
+                        MIN(sleep_time) as earliest_sleep_time,
+                        MAX(wake_time) as latest_wake_time
+                    FROM view_sleep_record_full
+                    WHERE p_user_id IS NULL OR user_id = p_user_id
+                    GROUP BY user_id, date
+                ),
+                daily_sport AS (
+                    SELECT
+                        user_id,
+                        date,
+                        SUM(duration) as total_duration,
+                        SUM(calories) as total_calories,
+                        COUNT(*) as sport_count
+                    FROM view_sport_record_full
+                    WHERE p_user_id IS NULL OR user_id = p_user_id
+                    GROUP BY user_id, date
+                ),
+                daily_diet AS (
+                    SELECT
+                        mr.user_id,
+                        mr.date,
+                        SUM(nf.energy_kj * 0.239 * mi.quantity_in_grams / 100.0) as total_calories,
+                        COUNT(DISTINCT mr.id) as meal_count,
+                        COUNT(DISTINCT mi.food_id) as food_variety
+                    FROM dietmanage_mealrecord mr
+                    LEFT JOIN dietmanage_mealitem mi ON mi.meal_record_id = mr.id
+                    LEFT JOIN dietmanage_nutritionfood nf ON nf.id = mi.food_id
+                    WHERE p_user_id IS NULL OR mr.user_id = p_user_id
+                    GROUP BY mr.user_id, mr.date
+                ),
+                all_dates AS (
+                    SELECT user_id, date FROM daily_sleep
+                    UNION SELECT user_id, date FROM daily_sport
+                    UNION SELECT user_id, date FROM daily_diet
+                )
+                SELECT
+                    ad.user_id,
+                    ad.date,
+                    COALESCE(ds.total_duration, 0),
+                    COALESCE(ds.avg_quality_score, 0),
+                    COALESCE(ds.avg_sleep_hour, 0),
+                    COALESCE(ds.avg_wake_hour, 0),
+                    ds.earliest_sleep_time,
+                    ds.latest_wake_time,
+                    COALESCE(dsp.total_duration, 0),
+                    COALESCE(dsp.total_calories, 0),
+                    COALESCE(dsp.sport_count, 0),
+                    COALESCE(dd.total_calories, 0),
+                    COALESCE(dd.meal_count, 0),
+                    COALESCE(dd.food_variety, 0)
+                FROM all_dates ad
+                LEFT JOIN daily_sleep ds ON ad.user_id = ds.user_id AND ad.date = ds.date
+                LEFT JOIN daily_sport dsp ON ad.user_id = dsp.user_id AND ad.date = dsp.date
+                LEFT JOIN daily_diet dd ON ad.user_id = dd.user_id AND ad.date = dd.date;
+                COMMIT;
+
+                SELECT COUNT(*) AS row_count FROM dataanalysis_healthdailyrollup
+                WHERE p_user_id IS NULL OR user_id = p_user_id;
+            END;
+            """,
+            reverse_sql=PREVIOUS_SP_REBUILD_HEALTH_ROLLUP
+        ),
+    ]
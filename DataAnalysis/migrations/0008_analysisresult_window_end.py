@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DataAnalysis", "0007_rollup_stored_sleep_quality"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analysisresult",
+            name="window_end",
+            field=models.DateField(
+                blank=True, help_text="生成该结果时分析窗口的截止日期 (当天)", null=True
+            ),
+        ),
+    ]
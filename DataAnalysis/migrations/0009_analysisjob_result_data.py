@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DataAnalysis", "0008_analysisresult_window_end"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analysisjob",
+            name="result_data",
+            field=models.JSONField(blank=True, help_text="该任务计算出的分析结果", null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import models
+from django.contrib.auth.models import User
+from .AnalysisResult import AnalysisResult
+
+class AnalysisJob(models.Model):
+    """
+    异步分析任务 (数据库即任务队列)
+    dedup_key 仅在任务排队/运行期间有值, 其唯一约束保证同一 (用户, 分析类型, 时间范围) 只有一个在途任务
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCESS = 'success'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '排队中'),
+        (STATUS_RUNNING, '运行中'),
+        (STATUS_SUCCESS, '已完成'),
+        (STATUS_FAILED, '失败'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='analysis_jobs')
+    analysis_type = models.CharField(max_length=50, choices=AnalysisResult.ANALYSIS_TYPES)
+    time_range = models.CharField(max_length=10, default='30d')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    dedup_key = models.CharField(max_length=100, null=True, blank=True, unique=True)
+    result = models.ForeignKey(AnalysisResult, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    # result 指向的 AnalysisResult 每 (用户, 分析类型) 仅一行, 会被后续分析覆盖; 任务自身的结果单独保存
+    result_data = models.JSONField(null=True, blank=True, help_text="该任务计算出的分析结果")
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    @staticmethod
+    def make_dedup_key(user_id, analysis_type, time_range):
+        return f"{user_id}:{analysis_type}:{time_range}"
+
+    @property
+    def in_flight(self):
+        return self.status in (self.STATUS_PENDING, self.STATUS_RUNNING)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.analysis_type} - {self.status}"
@@ -13,6 +13,9 @@ class AnalysisResult(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='analysis_results')
     analysis_type = models.CharField(max_length=50, choices=ANALYSIS_TYPES)
     result_data = models.JSONField(help_text="分析结果数据")
+    time_range = models.CharField(max_length=10, null=True, blank=True, help_text="生成该结果的时间范围")
+    data_version = models.BigIntegerField(null=True, blank=True, help_text="生成该结果时用户健康数据的版本号")
+    window_end = models.DateField(null=True, blank=True, help_text="生成该结果时分析窗口的截止日期 (当天)")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
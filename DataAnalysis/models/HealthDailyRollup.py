@@ -0,0 +1,26 @@
+from django.db import models
+from django.contrib.auth.models import User
+
+class HealthDailyRollup(models.Model):
+    """
+    每用户每日健康数据汇总 (由触发器增量维护)
+    主键 (user_id, date) 即 InnoDB 聚簇索引, 按用户+日期范围读取只需一次索引范围扫描
+    """
+    pk = models.CompositePrimaryKey('user_id', 'date')
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, related_name='health_daily_rollups')
+    date = models.DateField()
+    sleep_duration = models.FloatField(default=0, help_text="当日睡眠总时长（小时）")
+    sleep_quality_score = models.FloatField(default=0, help_text="当日平均睡眠质量评分")
+    avg_sleep_hour = models.FloatField(default=0)
+    avg_wake_hour = models.FloatField(default=0)
+    earliest_sleep_time = models.TimeField(null=True, blank=True)
+    latest_wake_time = models.TimeField(null=True, blank=True)
+    sport_duration = models.FloatField(default=0, help_text="当日运动总时长（小时）")
+    sport_calories = models.FloatField(default=0)
+    sport_count = models.IntegerField(default=0)
+    diet_calories = models.FloatField(default=0)
+    meal_count = models.IntegerField(default=0)
+    food_variety = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.date}"
@@ -1,2 +1,3 @@
-# DataAnalysis models 
-from .AnalysisResult import AnalysisResult
\ No newline at end of file
+from .AnalysisResult import AnalysisResult
+from .HealthDailyRollup import HealthDailyRollup
+from .AnalysisJob import AnalysisJob
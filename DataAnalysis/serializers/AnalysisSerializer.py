@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from ..models.AnalysisResult import AnalysisResult
+from ..models.AnalysisJob import AnalysisJob
 
 class AnalysisResultSerializer(serializers.ModelSerializer):
     analysis_type_display = serializers.CharField(source='get_analysis_type_display', read_only=True)
@@ -15,4 +16,24 @@ class AnalysisResultSerializer(serializers.ModelSerializer):
 class AnalysisRequestSerializer(serializers.Serializer):
     analysis_type = serializers.ChoiceField(choices=AnalysisResult.ANALYSIS_TYPES)
     time_range = serializers.CharField(max_length=10, default='30d', help_text="时间范围: 7d, 30d, 90d")
-    include_predictions = serializers.BooleanField(default=True, help_text="是否包含预测数据") 
\ No newline at end of file
+    include_predictions = serializers.BooleanField(default=True, help_text="是否包含预测数据") 
+    run_async = serializers.BooleanField(default=False, help_text="是否异步执行, 立即返回任务 ID")
+
+class AnalysisJobSerializer(serializers.ModelSerializer):
+    job_id = serializers.IntegerField(source='id', read_only=True)
+    analysis_id = serializers.IntegerField(source='result_id', read_only=True)
+    data = serializers.SerializerMethodField()
+
+    def get_data(self, instance):
+        if instance.status != AnalysisJob.STATUS_SUCCESS:
+            return None
+        if instance.result_data is not None:
+            return instance.result_data
+        # 早于 result_data 字段完成的任务只能读取共享的 AnalysisResult
+        return instance.result.result_data if instance.result is not None else None
+
+    class Meta:
+        model = AnalysisJob
+        fields = ['job_id', 'analysis_type', 'time_range', 'status', 'error_message',
+                  'analysis_id', 'data', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
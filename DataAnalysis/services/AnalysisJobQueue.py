@@ -0,0 +1,147 @@
+"""
+进程内异步分析任务队列
+
+AnalysisJob 表记录任务状态: 提交时写入任务行并交给本进程的有界线程池执行,
+worker 通过 status 条件更新认领任务, 同一任务不会被执行两次。
+同一 (用户, 分析类型, 时间范围) 的在途任务由 dedup_key 唯一约束去重。
+
+线程池只存在于进程内存中, 进程重启后其排队/运行中的任务不会再被执行。
+超过 JOB_TIMEOUT 仍未结束的任务由 expire_if_stale / expire_stale_jobs 标记为失败
+(查询任务状态、重复提交时检查, 另可由 sweep_analysis_jobs 命令定期清理), 客户端重新提交即可。
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+from django.utils import timezone
+from ..models.AnalysisJob import AnalysisJob
+from .HealthDataAnalyzer import HealthDataAnalyzer, days_for_range
+from . import AnalysisResultCache
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = getattr(settings, 'ANALYSIS_JOB_WORKERS', 2)
+JOB_TIMEOUT = getattr(settings, 'ANALYSIS_JOB_TIMEOUT', 600)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='analysis-job')
+    return _executor
+
+
+def _is_stale(job):
+    since = job.started_at or job.created_at
+    return since < timezone.now() - timedelta(seconds=JOB_TIMEOUT)
+
+
+def _finish(job_id, status, **fields):
+    # 清空 dedup_key, 相同参数的新任务才能再次提交
+    # 只结束仍在运行的任务: 已按超时标记失败的任务不会再被改写
+    return AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.STATUS_RUNNING).update(
+        status=status, dedup_key=None, finished_at=timezone.now(), **fields
+    )
+
+
+def _stale_jobs():
+    deadline = timezone.now() - timedelta(seconds=JOB_TIMEOUT)
+    return AnalysisJob.objects.filter(
+        models.Q(status=AnalysisJob.STATUS_PENDING, created_at__lt=deadline) |
+        models.Q(status=AnalysisJob.STATUS_RUNNING, started_at__lt=deadline)
+    )
+
+
+def _expire(queryset):
+    return queryset.update(
+        status=AnalysisJob.STATUS_FAILED,
+        dedup_key=None,
+        error_message='任务超时',
+        finished_at=timezone.now()
+    )
+
+
+def expire_if_stale(job):
+    """
+    超时的在途任务标记为失败
+    :return: 是否标记了失败 (job 对象已同步更新)
+    """
+    if not job.in_flight or not _is_stale(job):
+        return False
+    if not _expire(_stale_jobs().filter(id=job.id)):
+        return False
+    job.refresh_from_db()
+    return True
+
+
+def expire_stale_jobs():
+    """所有超时的在途任务标记为失败, 返回数量"""
+    return _expire(_stale_jobs())
+
+
+def enqueue(user, analysis_type, time_range):
+    """
+    提交异步分析任务
+    :return: (job, created), created=False 表示复用了相同参数的在途任务
+    """
+    dedup_key = AnalysisJob.make_dedup_key(user.id, analysis_type, time_range)
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                job = AnalysisJob.objects.create(
+                    user=user,
+                    analysis_type=analysis_type,
+                    time_range=time_range,
+                    dedup_key=dedup_key
+                )
+        except IntegrityError:
+            existing = AnalysisJob.objects.filter(dedup_key=dedup_key).first()
+            if existing is None:
+                # 在途任务刚好结束, 重试插入
+                continue
+            if not _is_stale(existing):
+                return existing, False
+            # 执行该任务的进程已退出, 标记失败后重试
+            _expire(_stale_jobs().filter(id=existing.id))
+            continue
+
+        job_id = job.id
+        transaction.on_commit(lambda: _get_executor().submit(_run_job, job_id))
+        return job, True
+
+    raise RuntimeError('提交分析任务失败')
+
+
+def _run_job(job_id):
+    try:
+        claimed = AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.STATUS_PENDING).update(
+            status=AnalysisJob.STATUS_RUNNING, started_at=timezone.now()
+        )
+        if not claimed:
+            return
+
+        job = AnalysisJob.objects.select_related('user').get(id=job_id)
+        version = AnalysisResultCache.current_version(job.user)
+        window_end = timezone.localdate()
+        analyzer = HealthDataAnalyzer(job.user)
+        result = analyzer.run(job.analysis_type, days_for_range(job.time_range))
+        if result['success']:
+            analysis_result = AnalysisResultCache.save_result(
+                job.user, job.analysis_type, result['data'], job.time_range, version, window_end
+            )
+            _finish(job_id, AnalysisJob.STATUS_SUCCESS, result=analysis_result, result_data=result['data'])
+        else:
+            _finish(job_id, AnalysisJob.STATUS_FAILED, error_message=result.get('message') or '')
+    except Exception as e:
+        logger.error(f"分析任务 {job_id} 执行失败: {str(e)}")
+        _finish(job_id, AnalysisJob.STATUS_FAILED, error_message=str(e))
+    finally:
+        # 线程池线程不经过请求周期, 需自行释放数据库连接
+        connection.close()
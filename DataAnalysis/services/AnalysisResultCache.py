@@ -0,0 +1,67 @@
+"""
+AnalysisResult 复用
+
+每条 AnalysisResult 记录生成时的用户健康数据版本号 (utils.cache_utils.get_health_data_version)、
+时间范围和窗口截止日期; 分析窗口从当天往前计算, 跨过零点后即使数据未变化也需重新计算。
+版本号、参数与截止日期都未变化时直接返回已存储的 result_data, 不再重新拟合。
+"""
+from django.core.cache import cache
+from django.utils import timezone
+from utils.cache_utils import get_health_data_version
+from ..models.AnalysisResult import AnalysisResult
+
+HITS_KEY = 'analysis_result_cache_hits'
+MISSES_KEY = 'analysis_result_cache_misses'
+
+
+def _count(key):
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def current_version(user):
+    """计算前读取版本号, 计算期间发生的写入会使结果在下次请求时失效"""
+    return get_health_data_version(user.id)
+
+
+def get_cached_result(user, analysis_type, time_range, version):
+    """:return: 版本号与参数均匹配的 AnalysisResult, 否则 None"""
+    analysis_result = AnalysisResult.objects.filter(
+        user=user,
+        analysis_type=analysis_type,
+        time_range=time_range,
+        data_version=version,
+        window_end=timezone.localdate()
+    ).first()
+    _count(HITS_KEY if analysis_result is not None else MISSES_KEY)
+    return analysis_result
+
+
+def save_result(user, analysis_type, result_data, time_range=None, version=None, window_end=None):
+    """
+    保存 (覆盖) 用户某类分析的最新结果
+    :param window_end: 计算时的当天日期, 默认保存时的当天
+    """
+    analysis_result, _ = AnalysisResult.objects.update_or_create(
+        user=user,
+        analysis_type=analysis_type,
+        defaults={
+            'result_data': result_data,
+            'time_range': time_range,
+            'data_version': version,
+            'window_end': window_end or timezone.localdate()
+        }
+    )
+    return analysis_result
+
+
+def stats():
+    counts = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counts.get(HITS_KEY, 0)
+    misses = counts.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0
+    }
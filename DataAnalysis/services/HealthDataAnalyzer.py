@@ -11,81 +11,163 @@ from DataAnalysis import sql
 
 logger = logging.getLogger(__name__)
 
+TIME_RANGE_DAYS = {'7d': 7, '30d': 30, '90d': 90}
+
+def days_for_range(time_range):
+    return TIME_RANGE_DAYS.get(time_range, 30)
+
+def _date_column(values):
+    """DATE column -> datetime64[D] array"""
+    return np.array(values, dtype='datetime64[D]')
+
+def _float_column(values):
+    """numeric column -> float64 array, NULL becomes 0"""
+    return np.nan_to_num(np.array(values, dtype=np.float64), nan=0.0)
+
+
+class AnalysisContext:
+    """
+    单次请求内共享的分析数据窗口。
+    get_comprehensive_health_data 只查询一次, 睡眠/运动/饮食数据列在内存中按各自条件筛选得到。
+    """
+    # 分析用列名 -> 汇总表列名
+    SLEEP_COLUMNS = {
+        'date': 'date',
+        'duration': 'sleep_duration',
+        'quality_score': 'sleep_quality_score',
+        'sleep_hour': 'avg_sleep_hour',
+        'wake_hour': 'avg_wake_hour',
+        'sleep_time': 'earliest_sleep_time',
+        'wake_time': 'latest_wake_time',
+    }
+    SPORT_COLUMNS = {
+        'date': 'date',
+        'total_duration': 'sport_duration',
+        'total_calories': 'sport_calories',
+        'sport_count': 'sport_count',
+    }
+    DIET_COLUMNS = {
+        'date': 'date',
+        'total_calories': 'diet_calories',
+        'meal_count': 'meal_count',
+        'food_variety': 'food_variety',
+    }
+
+    def __init__(self, user_id, days=30):
+        self.user_id = user_id
+        self.days = days
+        self._columns = None
+        self._frames = {}
+
+    @property
+    def columns(self):
+        if self._columns is None:
+            self._columns = sql.get_comprehensive_health_data(self.user_id, self.days)
+        return self._columns
+
+    def _subset(self, filter_column, mapping):
+        """取 filter_column > 0 的日期, 并按 mapping 重命名列"""
+        columns = self.columns
+        if not columns:
+            return {}
+        keep = _float_column(columns[filter_column]) > 0
+        if not keep.any():
+            return {}
+        return {name: np.array(columns[source], dtype=object)[keep] for name, source in mapping.items()}
+
+    def _frame(self, kind, build, filter_column, mapping):
+        # 各分析会在返回的 DataFrame 上追加列, 因此每次交出副本
+        if kind not in self._frames:
+            self._frames[kind] = build(self._subset(filter_column, mapping))
+        return self._frames[kind].copy()
+
+    def sleep(self):
+        return self._frame('sleep', HealthDataAnalyzer.sleep_frame, 'sleep_duration', self.SLEEP_COLUMNS)
+
+    def sport(self):
+        return self._frame('sport', HealthDataAnalyzer.sport_frame, 'sport_duration', self.SPORT_COLUMNS)
+
+    def diet(self):
+        return self._frame('diet', HealthDataAnalyzer.diet_frame, 'meal_count', self.DIET_COLUMNS)
+
+
 class HealthDataAnalyzer:
+    # 分析类型 -> 分析方法名
+    ANALYSES = {
+        'sleep_prediction': 'analyze_sleep_prediction',
+        'sleep_sport_correlation': 'analyze_sleep_sport_correlation',
+        'health_trend': 'analyze_health_trends',
+    }
+
     def __init__(self, user):
         self.user = user
+        self._contexts = {}
+
+    def get_context(self, days=30):
+        """同一分析器内相同时间窗口共享一个 AnalysisContext"""
+        if days not in self._contexts:
+            self._contexts[days] = AnalysisContext(self.user.id, days)
+        return self._contexts[days]
         
-    def _format_date(self, d):
-        if isinstance(d, (datetime, date, pd.Timestamp)):
-            return d.strftime('%Y-%m-%d')
-        return str(d)
+    @staticmethod
+    def sleep_frame(columns):
+        """睡眠数据列 -> DataFrame (date 为 datetime64 列)"""
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame({
+            'date': _date_column(columns['date']),
+            'duration': _float_column(columns['duration']),
+            'quality_score': _float_column(columns['quality_score']),
+            'sleep_hour': _float_column(columns['sleep_hour']),
+            'wake_hour': _float_column(columns['wake_hour']),
+            'sleep_time': columns['sleep_time'],
+            'wake_time': columns['wake_time'],
+        })
+
+    @staticmethod
+    def sport_frame(columns):
+        """运动数据列 -> DataFrame (以 DatetimeIndex 为索引)"""
+        if not columns:
+            return pd.DataFrame()
+        duration = _float_column(columns['total_duration'])
+        calories = _float_column(columns['total_calories'])
+        intensity = np.divide(calories, duration, out=np.zeros_like(calories), where=duration > 0)
+        return pd.DataFrame({
+            'total_duration': duration,
+            'total_calories': calories,
+            'sport_count': _float_column(columns['sport_count']),
+            'avg_intensity': intensity,
+        }, index=pd.DatetimeIndex(_date_column(columns['date']), name='date'))
+
+    @staticmethod
+    def diet_frame(columns):
+        """饮食数据列 -> DataFrame (以 DatetimeIndex 为索引)"""
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame({
+            'total_calories': _float_column(columns['total_calories']),
+            'meal_count': _float_column(columns['meal_count']),
+            'food_variety': _float_column(columns['food_variety']),
+        }, index=pd.DatetimeIndex(_date_column(columns['date']), name='date'))
+
+    def run(self, analysis_type, days=30):
+        """按分析类型执行分析, 不支持的类型抛出 ValueError"""
+        method = self.ANALYSES.get(analysis_type)
+        if method is None:
+            raise ValueError(f"不支持的分析类型: {analysis_type}")
+        return getattr(self, method)(days)
 
     def get_sleep_data(self, days=30):
         """获取睡眠数据"""
-        data = sql.get_sleep_data_for_analysis(self.user.id, days)
-        if not data:
-            return pd.DataFrame()
-            
-        # Format dates and times for pandas
-        for d in data:
-            d['date'] = self._format_date(d['date'])
-            if d['sleep_time'] and hasattr(d['sleep_time'], 'isoformat'):
-                d['sleep_time'] = d['sleep_time'].isoformat()
-            if d['wake_time'] and hasattr(d['wake_time'], 'isoformat'):
-                d['wake_time'] = d['wake_time'].isoformat()
-            d['sleep_hour'] = float(d['sleep_hour'] or 0)
-            d['wake_hour'] = float(d['wake_hour'] or 0)
-            d['duration'] = float(d['duration'] or 0)
-            d['quality_score'] = float(d['quality_score'] or 0)
-            
-        return pd.DataFrame(data)
+        return self.get_context(days).sleep()
     
     def get_sport_data(self, days=30):
         """获取运动数据"""
-        data = sql.get_sport_data_for_analysis(self.user.id, days)
-        if not data:
-            return pd.DataFrame()
-            
-        # Format dates for pandas index
-        formatted_data = []
-        for d in data:
-            date_str = self._format_date(d['date'])
-            duration = float(d['total_duration'] or 0)
-            calories = float(d['total_calories'] or 0)
-            formatted_data.append({
-                'date': date_str,
-                'total_duration': duration,
-                'total_calories': calories,
-                'sport_count': float(d['sport_count'] or 0),
-                'avg_intensity': calories / duration if duration > 0 else 0
-            })
-            
-        df = pd.DataFrame(formatted_data)
-        if not df.empty:
-            df.set_index('date', inplace=True)
-        return df
+        return self.get_context(days).sport()
     
     def get_diet_data(self, days=30):
         """获取饮食数据"""
-        data = sql.get_diet_data_for_analysis(self.user.id, days)
-        if not data:
-            return pd.DataFrame()
-            
-        # Format dates for pandas index
-        formatted_data = []
-        for d in data:
-            date_str = self._format_date(d['date'])
-            formatted_data.append({
-                'date': date_str,
-                'total_calories': float(d['total_calories'] or 0),
-                'meal_count': float(d['meal_count'] or 0),
-                'food_variety': float(d['food_variety'] or 0)
-            })
-            
-        df = pd.DataFrame(formatted_data)
-        if not df.empty:
-            df.set_index('date', inplace=True)
-        return df
+        return self.get_context(days).diet()
     
     def analyze_sleep_prediction(self, days=30):
         """基于线性回归预测睡眠质量变化"""
@@ -99,8 +181,8 @@ class HealthDataAnalyzer:
                 }
             
             # 准备特征数据
-            sleep_df['date_num'] = pd.to_datetime(sleep_df['date']).dt.dayofyear
-            sleep_df['day_of_week'] = pd.to_datetime(sleep_df['date']).dt.dayofweek
+            sleep_df['date_num'] = sleep_df['date'].dt.dayofyear
+            sleep_df['day_of_week'] = sleep_df['date'].dt.dayofweek
             
             # 创建特征矩阵
             X = sleep_df[['date_num', 'day_of_week', 'duration']].values
@@ -117,7 +199,7 @@ class HealthDataAnalyzer:
             # 预测未来7天
             future_dates = []
             future_features = []
-            last_date = pd.to_datetime(sleep_df['date'].iloc[-1])
+            last_date = sleep_df['date'].iloc[-1]
             
             for i in range(1, 8):
                 future_date = last_date + timedelta(days=i)
@@ -139,9 +221,9 @@ class HealthDataAnalyzer:
             
             # 历史趋势
             historical_trend = {
-                'dates': sleep_df['date'].tolist(),
-                'quality_scores': [float(v) for v in sleep_df['quality_score'].tolist()],
-                'durations': [float(v) for v in sleep_df['duration'].tolist()]
+                'dates': sleep_df['date'].dt.strftime('%Y-%m-%d').tolist(),
+                'quality_scores': sleep_df['quality_score'].tolist(),
+                'durations': sleep_df['duration'].tolist()
             }
             
             # 预测结果
@@ -197,10 +279,6 @@ class HealthDataAnalyzer:
                     'data': None
                 }
             
-            # 合并数据
-            sleep_df['date'] = pd.to_datetime(sleep_df['date'])
-            sport_df.index = pd.to_datetime(sport_df.index)
-            
             # 创建完整的时间序列
             all_dates = pd.date_range(
                 start=min(sleep_df['date'].min(), sport_df.index.min()),
@@ -212,19 +290,16 @@ class HealthDataAnalyzer:
             sleep_filled = sleep_df.set_index('date').reindex(all_dates).ffill()
             sport_filled = sport_df.reindex(all_dates).fillna(0)
             
-            # 计算相关性
-            correlation_data = []
-            for i in range(len(all_dates)):
-                if i > 0:  # 分析前一天运动对当天睡眠的影响
-                    prev_sport_duration = float(sport_filled.iloc[i-1]['total_duration'] if i > 0 else 0)
-                    current_sleep_quality = float(sleep_filled.iloc[i]['quality_score'])
-                    
-                    if not pd.isna(current_sleep_quality):
-                        correlation_data.append({
-                            'date': all_dates[i].strftime('%Y-%m-%d'),
-                            'prev_sport_duration': prev_sport_duration,
-                            'sleep_quality': current_sleep_quality
-                        })
+            # 分析前一天运动对当天睡眠的影响
+            prev_sport_duration = sport_filled['total_duration'].to_numpy()[:-1]
+            sleep_quality = sleep_filled['quality_score'].to_numpy()[1:]
+            valid = ~np.isnan(sleep_quality)
+            corr_df = pd.DataFrame({
+                'date': all_dates[1:][valid].strftime('%Y-%m-%d'),
+                'prev_sport_duration': prev_sport_duration[valid],
+                'sleep_quality': sleep_quality[valid]
+            })
+            correlation_data = corr_df.to_dict('records')
             
             if len(correlation_data) < 3:
                 return {
@@ -233,8 +308,6 @@ class HealthDataAnalyzer:
                     'data': None
                 }
             
-            corr_df = pd.DataFrame(correlation_data)
-            
             # 计算相关系数
             correlation = corr_df['prev_sport_duration'].corr(corr_df['sleep_quality'])
             # 分组分析
@@ -8,64 +8,45 @@ def dictfetchall(cursor):
         for row in cursor.fetchall()
     ]
 
-def get_comprehensive_health_data(user_id, days=30):
-    sql = """
-        SELECT * FROM view_health_data_comprehensive 
-        WHERE user_id = %s 
-          AND date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-        ORDER BY date ASC
-    """
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [user_id, days])
-        return dictfetchall(cursor)
-
-def get_sleep_data_for_analysis(user_id, days=30):
-    sql = """
-        SELECT 
-            date,
-            sleep_duration as duration,
-            sleep_quality_score as quality_score,
-            avg_sleep_hour as sleep_hour,
-            avg_wake_hour as wake_hour,
-            earliest_sleep_time as sleep_time,
-            latest_wake_time as wake_time
-        FROM view_health_data_comprehensive
-        WHERE user_id = %s AND date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-        AND sleep_duration > 0
-        ORDER BY date ASC
-    """
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [user_id, days])
-        return dictfetchall(cursor)
+def columnfetchall(cursor):
+    "Return all rows from a cursor as a dict of column name -> tuple of values"
+    columns = [col[0] for col in cursor.description]
+    return dict(zip(columns, zip(*cursor.fetchall())))
 
-def get_sport_data_for_analysis(user_id, days=30):
-    sql = """
-        SELECT 
-            date,
-            sport_duration as total_duration,
-            sport_calories as total_calories,
-            sport_count
-        FROM view_health_data_comprehensive
-        WHERE user_id = %s AND date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-        AND sport_duration > 0
-        ORDER BY date ASC
-    """
-    with connection.cursor() as cursor:
-        cursor.execute(sql, [user_id, days])
-        return dictfetchall(cursor)
+# All analysis reads go to the per-(user_id, date) rollup table, whose primary key
+# (user_id, date) turns "one user, last N days" into a single clustered-index range scan.
+# The whole window is read once per request and split into sleep/sport/diet frames in memory.
 
-def get_diet_data_for_analysis(user_id, days=30):
+def get_comprehensive_health_data(user_id, days=30):
+    """:return: dict of column name -> tuple of values (see columnfetchall)"""
     sql = """
         SELECT 
+            user_id,
             date,
-            diet_calories as total_calories,
+            sleep_duration,
+            sleep_quality_score,
+            avg_sleep_hour,
+            avg_wake_hour,
+            earliest_sleep_time,
+            latest_wake_time,
+            sport_duration,
+            sport_calories,
+            sport_count,
+            diet_calories,
             meal_count,
             food_variety
-        FROM view_health_data_comprehensive
-        WHERE user_id = %s AND date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
-        AND meal_count > 0
+        FROM dataanalysis_healthdailyrollup
+        WHERE user_id = %s 
+          AND date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
         ORDER BY date ASC
     """
     with connection.cursor() as cursor:
         cursor.execute(sql, [user_id, days])
-        return dictfetchall(cursor)
+        return columnfetchall(cursor)
+
+def rebuild_health_rollup(user_id=None):
+    """Recompute the rollup from the record tables; user_id=None rebuilds every user."""
+    with connection.cursor() as cursor:
+        cursor.callproc('sp_rebuild_health_rollup', [user_id])
+        row = cursor.fetchone()
+        return row[0] if row else 0
@@ -3,14 +3,18 @@ from .views.AnalysisView import (
     analyze_health_data,
     get_analysis_results,
     get_analysis_detail,
+    get_analysis_job,
     get_health_summary,
+    get_analysis_cache_stats,
     delete_analysis_result
 )
 
 urlpatterns = [
     path('analyze/', analyze_health_data, name='analyze_health_data'),
     path('results/', get_analysis_results, name='get_analysis_results'),
+    path('jobs/<int:job_id>/', get_analysis_job, name='get_analysis_job'),
     path('summary/', get_health_summary, name='get_health_summary'),
+    path('cache-stats/', get_analysis_cache_stats, name='get_analysis_cache_stats'),
     path('results/<int:analysis_id>/', get_analysis_detail, name='get_analysis_detail'),
     path('results/<int:analysis_id>/delete/', delete_analysis_result, name='delete_analysis_result'),
 ] 
\ No newline at end of file
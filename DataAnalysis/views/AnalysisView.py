@@ -1,14 +1,20 @@
 from django import utils
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from django.contrib.auth.models import User
 from django.core.cache import cache
-from ..services.HealthDataAnalyzer import HealthDataAnalyzer
-from ..serializers.AnalysisSerializer import AnalysisRequestSerializer, AnalysisResultSerializer
+from django.utils import timezone
+from ..services.HealthDataAnalyzer import HealthDataAnalyzer, days_for_range
+from ..services import AnalysisJobQueue, AnalysisResultCache
+from ..serializers.AnalysisSerializer import (
+    AnalysisRequestSerializer, AnalysisResultSerializer, AnalysisJobSerializer
+)
 from ..models.AnalysisResult import AnalysisResult
+from ..models.AnalysisJob import AnalysisJob
 from utils.response import api_response
+from utils.cache_utils import versioned_key, get_or_compute, HEALTH_SCOPE
 import json
 import logging
 
@@ -32,21 +38,7 @@ def analyze_health_data(request):
         time_range = serializer.validated_data.get('time_range', '30d')
         include_predictions = serializer.validated_data.get('include_predictions', True)
         
-        # 转换时间范围
-        days_map = {'7d': 7, '30d': 30, '90d': 90}
-        days = days_map.get(time_range, 30)
-        
-        # 创建分析器
-        analyzer = HealthDataAnalyzer(request.user)
-        
-        # 根据分析类型执行相应的分析
-        if analysis_type == 'sleep_prediction':
-            result = analyzer.analyze_sleep_prediction(days)
-        elif analysis_type == 'sleep_sport_correlation':
-            result = analyzer.analyze_sleep_sport_correlation(days)
-        elif analysis_type == 'health_trend':
-            result = analyzer.analyze_health_trends(days)
-        else:
+        if analysis_type not in HealthDataAnalyzer.ANALYSES:
             return api_response(
                 code=400,
                 message='不支持的分析类型',
@@ -54,12 +46,44 @@ def analyze_health_data(request):
                 status_code=status.HTTP_400_BAD_REQUEST
             )
         
+        # 健康数据自上次分析后未变化: 直接返回已存储的结果
+        version = AnalysisResultCache.current_version(request.user)
+        window_end = timezone.localdate()
+        cached_result = AnalysisResultCache.get_cached_result(request.user, analysis_type, time_range, version)
+        if cached_result is not None:
+            return api_response(
+                message='分析成功 (from cache)',
+                data={
+                    'data': cached_result.result_data,
+                    'analysis_id': cached_result.id,
+                    'success': True
+                },
+                code=0
+            )
+        
+        # 异步模式: 入队后立即返回任务 ID, 通过 jobs/<job_id>/ 查询结果
+        if serializer.validated_data.get('run_async'):
+            job, created = AnalysisJobQueue.enqueue(request.user, analysis_type, time_range)
+            return api_response(
+                message='分析任务已提交' if created else '相同的分析任务正在进行',
+                data={
+                    'job_id': job.id,
+                    'status': job.status,
+                    'deduplicated': not created,
+                    'success': True
+                },
+                code=0,
+                status_code=status.HTTP_202_ACCEPTED
+            )
+        
+        # 创建分析器并执行分析
+        analyzer = HealthDataAnalyzer(request.user)
+        result = analyzer.run(analysis_type, days_for_range(time_range))
+        
         if result['success']:
             # 保存分析结果
-            analysis_result, created = AnalysisResult.objects.update_or_create(
-                user=request.user,
-                analysis_type=analysis_type,
-                defaults={'result_data': result['data']}
+            analysis_result = AnalysisResultCache.save_result(
+                request.user, analysis_type, result['data'], time_range, version, window_end
             )
             
             return api_response(
@@ -117,6 +141,43 @@ def get_analysis_results(request):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_analysis_job(request, job_id):
+    """获取异步分析任务状态及结果"""
+    try:
+        job = AnalysisJob.objects.select_related('result').get(
+            id=job_id,
+            user=request.user
+        )
+        # 执行该任务的进程可能已退出, 超时的任务直接返回失败
+        AnalysisJobQueue.expire_if_stale(job)
+        
+        return api_response(
+            message='获取成功',
+            data={
+                'data': AnalysisJobSerializer(job).data,
+                'success': True,
+            },
+            code=0
+        )
+        
+    except AnalysisJob.DoesNotExist:
+        return api_response(
+            code=404,
+            message='分析任务不存在',
+            data=None,
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        logger.error(f"获取分析任务失败: {str(e)}")
+        return api_response(
+            code=500,
+            message=f'获取失败: {str(e)}',
+            data=None,
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_analysis_detail(request, analysis_id):
@@ -154,6 +215,54 @@ def get_analysis_detail(request, analysis_id):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def _build_health_summary(user, days):
+    """健康数据摘要, get_health_summary 缓存未命中时计算"""
+    analyzer = HealthDataAnalyzer(user)
+    
+    # 获取各维度数据
+    sleep_df = analyzer.get_sleep_data(days)
+    sport_df = analyzer.get_sport_data(days)
+    diet_df = analyzer.get_diet_data(days)
+    
+    summary = {
+        'sleep': {
+            'total_records': int(len(sleep_df)),
+            'avg_quality': float(sleep_df['quality_score'].mean()) if len(sleep_df) > 0 else 0.0,
+            'avg_duration': float(sleep_df['duration'].mean()) if len(sleep_df) > 0 else 0.0,
+            'best_day': sleep_df.loc[sleep_df['quality_score'].idxmax(), 'date'].strftime('%Y-%m-%d') if len(sleep_df) > 0 else None
+        },
+        'sport': {
+            'total_records': int(len(sport_df)),
+            'avg_duration': float(sport_df['total_duration'].mean()) if len(sport_df) > 0 else 0.0,
+            'total_calories': float(sport_df['total_calories'].sum()) if len(sport_df) > 0 else 0.0,
+            'active_days': int(len(sport_df[sport_df['total_duration'] > 0]))
+        },
+        'diet': {
+            'total_records': int(len(diet_df)),
+            'avg_calories': float(diet_df['total_calories'].mean()) if len(diet_df) > 0 else 0.0,
+            'avg_meals': float(diet_df['meal_count'].mean()) if len(diet_df) > 0 else 0.0,
+            'avg_variety': float(diet_df['food_variety'].mean()) if len(diet_df) > 0 else 0.0
+        }
+    }
+    
+    # 计算综合健康评分
+    overall_score = 0.0
+    if summary['sleep']['avg_quality'] > 0:
+        overall_score += summary['sleep']['avg_quality'] * 0.4
+    if summary['sport']['avg_duration'] > 0:
+        sport_score = min(100.0, summary['sport']['avg_duration'] * 50.0)
+        overall_score += sport_score * 0.3
+    if summary['diet']['avg_calories'] > 0:
+        diet_score = 100.0 - abs(summary['diet']['avg_calories'] - 2000.0) / 20.0
+        overall_score += max(0.0, diet_score) * 0.3
+    
+    summary['overall_score'] = float(min(100.0, max(0.0, overall_score)))
+    
+    return summary
+
+def _summary_is_empty(summary):
+    return all(summary[part]['total_records'] == 0 for part in ('sleep', 'sport', 'diet'))
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_health_summary(request):
@@ -161,66 +270,22 @@ def get_health_summary(request):
     try:
         time_range = request.GET.get('time_range', '30d')
         user_id = request.user.id
-        cache_key = f'health_summary_{user_id}_{time_range}'
+        cache_key = versioned_key(HEALTH_SCOPE, user_id, f'health_summary_{user_id}_{time_range}')
         
-        # Try to get from cache
-        cached_data = cache.get(cache_key)
-        if cached_data:
+        days = days_for_range(time_range)
+        summary, from_cache = get_or_compute(
+            cache_key, lambda: _build_health_summary(request.user, days), timeout=3600,
+            is_negative=_summary_is_empty
+        )
+        if from_cache:
             return api_response(
                 message='获取成功 (from cache)',
                 data={
-                    'data': cached_data,
+                    'data': summary,
                     'success': True,
                 },
                 code=0
             )
-
-        days_map = {'7d': 7, '30d': 30, '90d': 90}
-        days = days_map.get(time_range, 30)
-        
-        analyzer = HealthDataAnalyzer(request.user)
-        
-        # 获取各维度数据
-        sleep_df = analyzer.get_sleep_data(days)
-        sport_df = analyzer.get_sport_data(days)
-        diet_df = analyzer.get_diet_data(days)
-        
-        summary = {
-            'sleep': {
-                'total_records': int(len(sleep_df)),
-                'avg_quality': float(sleep_df['quality_score'].mean()) if len(sleep_df) > 0 else 0.0,
-                'avg_duration': float(sleep_df['duration'].mean()) if len(sleep_df) > 0 else 0.0,
-                'best_day': str(sleep_df.loc[sleep_df['quality_score'].idxmax()]['date']) if len(sleep_df) > 0 else None
-            },
-            'sport': {
-                'total_records': int(len(sport_df)),
-                'avg_duration': float(sport_df['total_duration'].mean()) if len(sport_df) > 0 else 0.0,
-                'total_calories': float(sport_df['total_calories'].sum()) if len(sport_df) > 0 else 0.0,
-                'active_days': int(len(sport_df[sport_df['total_duration'] > 0]))
-            },
-            'diet': {
-                'total_records': int(len(diet_df)),
-                'avg_calories': float(diet_df['total_calories'].mean()) if len(diet_df) > 0 else 0.0,
-                'avg_meals': float(diet_df['meal_count'].mean()) if len(diet_df) > 0 else 0.0,
-                'avg_variety': float(diet_df['food_variety'].mean()) if len(diet_df) > 0 else 0.0
-            }
-        }
-        
-        # 计算综合健康评分
-        overall_score = 0.0
-        if summary['sleep']['avg_quality'] > 0:
-            overall_score += summary['sleep']['avg_quality'] * 0.4
-        if summary['sport']['avg_duration'] > 0:
-            sport_score = min(100.0, summary['sport']['avg_duration'] * 50.0)
-            overall_score += sport_score * 0.3
-        if summary['diet']['avg_calories'] > 0:
-            diet_score = 100.0 - abs(summary['diet']['avg_calories'] - 2000.0) / 20.0
-            overall_score += max(0.0, diet_score) * 0.3
-        
-        summary['overall_score'] = float(min(100.0, max(0.0, overall_score)))
-        
-        # Set to cache
-        cache.set(cache_key, summary, timeout=3600)
         
         return api_response(
             message='获取成功',
@@ -240,6 +305,23 @@ def get_health_summary(request):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_analysis_cache_stats(request):
+    """分析结果复用命中率, 以及进程内缓存层按 key 前缀的命中率"""
+    stats = AnalysisResultCache.stats()
+    local_stats = getattr(cache, 'local_stats', None)
+    if local_stats is not None:
+        stats['local_cache'] = local_stats()
+    return api_response(
+        message='获取成功',
+        data={
+            'data': stats,
+            'success': True,
+        },
+        code=0
+    )
+
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_analysis_result(request, analysis_id):
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
+
+
+def _nutrition_food_changed(sender, **kwargs):
+    from utils.cache_utils import invalidate_food_catalogue_cache
+    invalidate_food_catalogue_cache()
 
 
 class DietmanageConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "DietManage"
+
+    def ready(self):
+        # Keep the in-process food catalogue in step with ORM writes
+        NutritionFood = self.get_model('NutritionFood')
+        post_save.connect(_nutrition_food_changed, sender=NutritionFood, dispatch_uid='nutrition_food_saved')
+        post_delete.connect(_nutrition_food_changed, sender=NutritionFood, dispatch_uid='nutrition_food_deleted')
@@ -0,0 +1,163 @@
+"""
+Process-wide nutrition food catalogue with a search index.
+
+The whole view_nutrition_food_full table is loaded lazily into an immutable
+FoodCatalogue. Every process compares its copy against a shared version
+counter in the cache (bumped by invalidate_food_catalogue_cache) at most
+every VERSION_CHECK_INTERVAL seconds and reloads when it moved.
+
+Search supports, in ranking order:
+  exact name, name prefix, name substring, pinyin-initial prefix, pinyin-initial substring
+Prefix lookups bisect a sorted key list; substring lookups intersect bigram
+posting lists and then verify the candidates.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from django.core.cache import cache
+from DietManage import sql
+from utils.cache_utils import FOOD_CATALOGUE_VERSION_KEY
+
+VERSION_CHECK_INTERVAL = 5.0
+
+MATCH_MODES = ('prefix', 'substring', 'pinyin')
+
+# First GB2312 code point of each pinyin initial (level-1 hanzi are sorted by pinyin)
+_GB2312_INITIALS = (
+    (0xB0A1, 'a'), (0xB0C5, 'b'), (0xB2C1, 'c'), (0xB4EE, 'd'), (0xB6EA, 'e'),
+    (0xB7A2, 'f'), (0xB8C1, 'g'), (0xB9FE, 'h'), (0xBBF7, 'j'), (0xBFA6, 'k'),
+    (0xC0AC, 'l'), (0xC2E8, 'm'), (0xC4C3, 'n'), (0xC5B6, 'o'), (0xC5BE, 'p'),
+    (0xC6DA, 'q'), (0xC8BB, 'r'), (0xC8F6, 's'), (0xCBFA, 't'), (0xCDDA, 'w'),
+    (0xCEF4, 'x'), (0xD1B9, 'y'), (0xD4D1, 'z'),
+)
+_GB2312_BOUNDS = tuple(b for b, _ in _GB2312_INITIALS)
+_GB2312_LEVEL1_END = 0xD7F9
+
+
+def pinyin_initial(ch):
+    """Pinyin initial of a hanzi, the lowercased char for ascii alnum, otherwise ''."""
+    if ch.isascii():
+        return ch.lower() if ch.isalnum() else ''
+    try:
+        encoded = ch.encode('gb2312')
+    except UnicodeEncodeError:
+        return ''
+    if len(encoded) != 2:
+        return ''
+    code = (encoded[0] << 8) | encoded[1]
+    if code < _GB2312_BOUNDS[0] or code > _GB2312_LEVEL1_END:
+        return ''
+    return _GB2312_INITIALS[bisect_right(_GB2312_BOUNDS, code) - 1][1]
+
+
+def pinyin_initials(text):
+    return ''.join(pinyin_initial(ch) for ch in text)
+
+
+def normalize(text):
+    return ''.join(text.split()).lower()
+
+
+class _TextIndex:
+    """Sorted keys for prefix lookups plus a bigram inverted index for substring lookups."""
+    __slots__ = ('texts', 'sorted_keys', 'grams')
+
+    def __init__(self, texts):
+        self.texts = tuple(texts)
+        self.sorted_keys = sorted((t, i) for i, t in enumerate(self.texts))
+        grams = {}
+        for i, text in enumerate(self.texts):
+            for gram in self._grams(text):
+                grams.setdefault(gram, []).append(i)
+        # Posting lists are built in index order, so they are already sorted
+        self.grams = {g: tuple(dict.fromkeys(p)) for g, p in grams.items()}
+
+    @staticmethod
+    def _grams(text):
+        if len(text) < 2:
+            return [text] if text else []
+        return [text[i:i + 2] for i in range(len(text) - 1)] + list(text)
+
+    def prefix(self, query):
+        start = bisect_left(self.sorted_keys, (query,))
+        result = []
+        for key, i in self.sorted_keys[start:]:
+            if not key.startswith(query):
+                break
+            result.append(i)
+        return result
+
+    def substring(self, query):
+        grams = [query] if len(query) < 2 else [query[i:i + 2] for i in range(len(query) - 1)]
+        postings = [self.grams.get(g) for g in grams]
+        if not all(postings):
+            return []
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            candidates.intersection_update(p)
+            if not candidates:
+                return []
+        return [i for i in sorted(candidates) if query in self.texts[i]]
+
+
+class FoodCatalogue:
+    __slots__ = ('foods', 'version', '_names', '_initials')
+
+    def __init__(self, foods, version=None):
+        self.foods = tuple(foods)
+        self.version = version
+        self._names = _TextIndex(normalize(f['name']) for f in self.foods)
+        self._initials = _TextIndex(pinyin_initials(f['name']) for f in self.foods)
+
+    def search(self, query, modes=MATCH_MODES):
+        """
+        :return: foods matching query, best matches first, catalogue order within a tier
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        tiers = []
+        if 'prefix' in modes:
+            prefix_hits = self._names.prefix(query)
+            exact = [i for i in prefix_hits if self._names.texts[i] == query]
+            tiers += [exact, prefix_hits]
+        if 'substring' in modes:
+            tiers.append(self._names.substring(query))
+        if 'pinyin' in modes and query.isascii():
+            tiers += [self._initials.prefix(query), self._initials.substring(query)]
+
+        seen = set()
+        result = []
+        for tier in tiers:
+            for i in sorted(tier):
+                if i not in seen:
+                    seen.add(i)
+                    result.append(self.foods[i])
+        return result
+
+
+_catalogue = None
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def _current_version():
+    return cache.get_or_set(FOOD_CATALOGUE_VERSION_KEY, 1, timeout=None)
+
+
+def get_catalogue():
+    """Return the current catalogue, loading or reloading it when the shared version moved."""
+    global _catalogue, _last_check
+    now = time.monotonic()
+    if _catalogue is not None and now - _last_check < VERSION_CHECK_INTERVAL:
+        return _catalogue
+
+    with _lock:
+        if _catalogue is None or now - _last_check >= VERSION_CHECK_INTERVAL:
+            version = _current_version()
+            if _catalogue is None or _catalogue.version != version:
+                _catalogue = FoodCatalogue(sql.get_all_nutrition_foods(), version)
+            _last_check = now
+    return _catalogue
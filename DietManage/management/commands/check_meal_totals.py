@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from DietManage import sql
+from utils.cache_utils import invalidate_health_cache
+
+
+class Command(BaseCommand):
+    help = "检查餐食记录存储的 total_calories / total_water 是否与明细一致"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            dest='user_id',
+            default=None,
+            help="只检查指定用户 ID 的餐食记录, 默认检查全部用户",
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="按明细重新计算不一致的记录",
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.01,
+            help="允许的浮点误差, 默认 0.01",
+        )
+
+    def handle(self, *args, **options):
+        mismatches = sql.find_meal_total_mismatches(options['user_id'], options['tolerance'])
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("餐食汇总与明细一致"))
+            return
+
+        for row in mismatches:
+            self.stdout.write(
+                f"记录 {row['id']} (用户 {row['user_id']}): "
+                f"热量 {row['total_calories']:.2f} -> {row['expected_calories']:.2f}, "
+                f"水分 {row['total_water']:.2f} -> {row['expected_water']:.2f}"
+            )
+
+        if not options['fix']:
+            self.stdout.write(self.style.WARNING(f"共 {len(mismatches)} 条记录不一致, 使用 --fix 修复"))
+            return
+
+        for row in mismatches:
+            sql.refresh_meal_totals(row['id'])
+        for user_id in {row['user_id'] for row in mismatches}:
+            invalidate_health_cache(user_id)
+        self.stdout.write(self.style.SUCCESS(f"已修复 {len(mismatches)} 条记录"))
@@ -0,0 +1,112 @@
+from django.db import migrations
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("DietManage", "0019_meal_record_cascade_triggers"),
+    ]
+
+    operations = [
+        # 1. Create a meal record and all of its items in one transaction.
+        #    p_items is a JSON array: [{"food": 1, "quantity_in_grams": 100}, ...]
+        #    Result sets: status_code, record, items
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_create_meal_record_with_items;
+            CREATE PROCEDURE sp_create_meal_record_with_items(
+                IN p_user_id INT,
+                IN p_date DATE,
+                IN p_meal VARCHAR(10),
+                IN p_source VARCHAR(20),
+                IN p_items JSON
+            )
+            BEGIN
+                DECLARE v_record_id INT;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    SELECT 3 AS status_code;
+                END;
+
+                START TRANSACTION;
+                INSERT INTO dietmanage_mealrecord (user_id, date, meal, source, created_at)
+                VALUES (p_user_id, p_date, p_meal, p_source, NOW());
+                SET v_record_id = LAST_INSERT_ID();
+
+                IF p_items IS NOT NULL THEN
+                    INSERT INTO dietmanage_mealitem (meal_record_id, food_id, quantity_in_grams)
+                    SELECT v_record_id, jt.food_id, jt.quantity_in_grams
+                    FROM JSON_TABLE(p_items, '$[*]' COLUMNS (
+                        food_id INT PATH '$.food',
+                        quantity_in_grams DOUBLE PATH '$.quantity_in_grams'
+                    )) AS jt;
+                END IF;
+                COMMIT;
+
+                SELECT 0 AS status_code;
+                SELECT * FROM view_meal_record_full WHERE id = v_record_id;
+                SELECT * FROM view_meal_item_full WHERE meal_record_id = v_record_id ORDER BY id;
+            END;
+            """,
+            reverse_sql="DROP PROCEDURE IF EXISTS sp_create_meal_record_with_items;"
+        ),
+
+        # 2. Update a meal record and (optionally) replace its items in one transaction.
+        #    p_items = NULL leaves the existing items untouched.
+        #    Result sets: status_code, then record and items when status_code = 0
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_update_meal_record_with_items;
+            CREATE PROCEDURE sp_update_meal_record_with_items(
+                IN p_record_id INT,
+                IN p_user_id INT,
+                IN p_date DATE,
+                IN p_meal VARCHAR(10),
+                IN p_source VARCHAR(20),
+                IN p_items JSON
+            )
+            BEGIN
+                DECLARE v_owner_id INT;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    SELECT 3 AS status_code;
+                END;
+
+                START TRANSACTION;
+                SELECT user_id INTO v_owner_id FROM dietmanage_mealrecord WHERE id = p_record_id FOR UPDATE;
+
+                IF v_owner_id IS NULL THEN
+                    SET v_status = 1;
+                ELSEIF v_owner_id != p_user_id THEN
+                    SET v_status = 2;
+                ELSE
+                    UPDATE dietmanage_mealrecord
+                    SET date = COALESCE(p_date, date),
+                        meal = COALESCE(p_meal, meal),
+                        source = COALESCE(p_source, source)
+                    WHERE id = p_record_id;
+
+                    IF p_items IS NOT NULL THEN
+                        DELETE FROM dietmanage_mealitem WHERE meal_record_id = p_record_id;
+                        INSERT INTO dietmanage_mealitem (meal_record_id, food_id, quantity_in_grams)
+                        SELECT p_record_id, jt.food_id, jt.quantity_in_grams
+                        FROM JSON_TABLE(p_items, '$[*]' COLUMNS (
+                            food_id INT PATH '$.food',
+                            quantity_in_grams DOUBLE PATH '$.quantity_in_grams'
+                        )) AS jt;
+                    END IF;
+                    SET v_status = 0;
+                END IF;
+
+                IF v_status = 0 THEN COMMIT; ELSE ROLLBACK; END IF;
+                SELECT v_status AS status_code;
+                IF v_status = 0 THEN
+                    SELECT * FROM view_meal_record_full WHERE id = p_record_id;
+                    SELECT * FROM view_meal_item_full WHERE meal_record_id = p_record_id ORDER BY id;
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP PROCEDURE IF EXISTS sp_update_meal_record_with_items;"
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DietManage", "0020_bulk_meal_item_procedures"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mealrecord",
+            index=models.Index(
+                fields=["user", "date", "created_at"], name="DietManage__user_id_418b4a_idx"
+            ),
+        ),
+    ]
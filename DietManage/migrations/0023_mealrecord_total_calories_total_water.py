@@ -0,0 +1,372 @@
+from django.db import migrations, models
+
+# 0018 definition, restored on reverse
+PREVIOUS_CLEAR_ITEMS_SP = """
+            DROP PROCEDURE IF EXISTS sp_clear_meal_items_safe;
+            CREATE PROCEDURE sp_clear_meal_items_safe(
+                IN p_record_id INT,
+                IN p_user_id INT
+            )
+            BEGIN
+                DECLARE v_owner_id INT;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    SELECT 3 AS status_code;
+                END;
+
+                START TRANSACTION;
+                SELECT user_id INTO v_owner_id FROM dietmanage_mealrecord WHERE id = p_record_id FOR UPDATE;
+
+                IF v_owner_id IS NULL THEN
+                    SET v_status = 1;
+                ELSEIF v_owner_id != p_user_id THEN
+                    SET v_status = 2;
+                ELSE
+                    DELETE FROM dietmanage_mealitem WHERE meal_record_id = p_record_id;
+                    SET v_status = 0;
+                END IF;
+
+                IF v_status = 0 THEN COMMIT; ELSE ROLLBACK; END IF;
+                SELECT v_status AS status_code;
+            END;
+            """
+
+# 0020 definition, restored on reverse
+PREVIOUS_UPDATE_WITH_ITEMS_SP = """
+            DROP PROCEDURE IF EXISTS sp_update_meal_record_with_items;
+            CREATE PROCEDURE sp_update_meal_record_with_items(
+                IN p_record_id INT,
+                IN p_user_id INT,
+                IN p_date DATE,
+                IN p_meal VARCHAR(10),
+                IN p_source VARCHAR(20),
+                IN p_items JSON
+            )
+            BEGIN
+                DECLARE v_owner_id INT;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    SELECT 3 AS status_code;
+                END;
+
+                START TRANSACTION;
+                SELECT user_id INTO v_owner_id FROM dietmanage_mealrecord WHERE id = p_record_id FOR UPDATE;
+
+                IF v_owner_id IS NULL THEN
+                    SET v_status = 1;
+                ELSEIF v_owner_id != p_user_id THEN
+                    SET v_status = 2;
+                ELSE
+                    UPDATE dietmanage_mealrecord
+                    SET date = COALESCE(p_date, date),
+                        meal = COALESCE(p_meal, meal),
+                        source = COALESCE(p_source, source)
+                    WHERE id = p_record_id;
+
+                    IF p_items IS NOT NULL THEN
+                        DELETE FROM dietmanage_mealitem WHERE meal_record_id = p_record_id;
+                        INSERT INTO dietmanage_mealitem (meal_record_id, food_id, quantity_in_grams)
+                        SELECT p_record_id, jt.food_id, jt.quantity_in_grams
+                        FROM JSON_TABLE(p_items, '$[*]' COLUMNS (
+                            food_id INT PATH '$.food',
+                            quantity_in_grams DOUBLE PATH '$.quantity_in_grams'
+                        )) AS jt;
+                    END IF;
+                    SET v_status = 0;
+                END IF;
+
+                IF v_status = 0 THEN COMMIT; ELSE ROLLBACK; END IF;
+                SELECT v_status AS status_code;
+                IF v_status = 0 THEN
+                    SELECT * FROM view_meal_record_full WHERE id = p_record_id;
+                    SELECT * FROM view_meal_item_full WHERE meal_record_id = p_record_id ORDER BY id;
+                END IF;
+            END;
+            """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DietManage", "0022_mealrecord_dietmanage__user_id_e48cce_idx"),
+        ("DataAnalysis", "0004_health_daily_rollup"),
+    ]
+
+    operations = [
+        # 1. Stored meal totals. view_meal_record_full used to compute them with
+        #    GROUP BY over every meal, which MySQL cannot merge into outer WHERE clauses.
+        migrations.AddField(
+            model_name="mealrecord",
+            name="total_calories",
+            field=models.FloatField(db_default=0, default=0),
+        ),
+        migrations.AddField(
+            model_name="mealrecord",
+            name="total_water",
+            field=models.FloatField(db_default=0, default=0),
+        ),
+
+        # 2. Recompute one record's totals from its items
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_refresh_meal_totals;
+            CREATE PROCEDURE sp_refresh_meal_totals(
+                IN p_record_id INT
+            )
+            BEGIN
+                UPDATE dietmanage_mealrecord mr
+                LEFT JOIN (
+                    SELECT meal_record_id,
+                           SUM(estimated_calories) AS calories,
+                           SUM(estimated_water) AS water
+                    FROM view_meal_item_full
+                    WHERE meal_record_id = p_record_id
+                    GROUP BY meal_record_id
+                ) t ON t.meal_record_id = mr.id
+                SET mr.total_calories = COALESCE(t.calories, 0),
+                    mr.total_water = COALESCE(t.water, 0)
+                WHERE mr.id = p_record_id;
+            END;
+            """,
+            reverse_sql="DROP PROCEDURE IF EXISTS sp_refresh_meal_totals;"
+        ),
+
+        # 3. Backfill
+        migrations.RunSQL(
+            sql="""
+            UPDATE dietmanage_mealrecord mr
+            LEFT JOIN (
+                SELECT meal_record_id,
+                       SUM(estimated_calories) AS calories,
+                       SUM(estimated_water) AS water
+                FROM view_meal_item_full
+                GROUP BY meal_record_id
+            ) t ON t.meal_record_id = mr.id
+            SET mr.total_calories = COALESCE(t.calories, 0),
+                mr.total_water = COALESCE(t.water, 0);
+            """,
+            reverse_sql=migrations.RunSQL.noop
+        ),
+
+        # 4. Item triggers keep the totals current for inserts and updates.
+        #    There is no delete trigger: items are deleted by tr_meal_record_cascade_delete
+        #    while the record itself is being deleted, and MySQL does not allow a trigger to
+        #    update the table of the statement that fired it. Procedures that delete items
+        #    of a surviving record call sp_refresh_meal_totals themselves.
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_item_totals_insert;
+            CREATE TRIGGER tr_meal_item_totals_insert
+            AFTER INSERT ON dietmanage_mealitem
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_meal_totals(NEW.meal_record_id);
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_meal_item_totals_insert;"
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_item_totals_update;
+            CREATE TRIGGER tr_meal_item_totals_update
+            AFTER UPDATE ON dietmanage_mealitem
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_meal_totals(NEW.meal_record_id);
+                IF NEW.meal_record_id != OLD.meal_record_id THEN
+                    CALL sp_refresh_meal_totals(OLD.meal_record_id);
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_meal_item_totals_update;"
+        ),
+
+        # 5. Nutrition data edits change the totals of every meal that uses the food
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_nutrition_food_totals_update;
+            CREATE TRIGGER tr_nutrition_food_totals_update
+            AFTER UPDATE ON dietmanage_nutritionfood
+            FOR EACH ROW
+            BEGIN
+                IF NOT (NEW.energy_kj <=> OLD.energy_kj AND NEW.water_content <=> OLD.water_content) THEN
+                    UPDATE dietmanage_mealrecord mr
+                    JOIN (
+                        SELECT vmi.meal_record_id,
+                               SUM(vmi.estimated_calories) AS calories,
+                               SUM(vmi.estimated_water) AS water
+                        FROM view_meal_item_full vmi
+                        WHERE vmi.meal_record_id IN (
+                            SELECT meal_record_id FROM dietmanage_mealitem WHERE food_id = NEW.id
+                        )
+                        GROUP BY vmi.meal_record_id
+                    ) t ON t.meal_record_id = mr.id
+                    SET mr.total_calories = COALESCE(t.calories, 0),
+                        mr.total_water = COALESCE(t.water, 0);
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP TRIGGER IF EXISTS tr_nutrition_food_totals_update;"
+        ),
+
+        # 6. Totals updates do not change the rollup (it reads items directly and already
+        #    refreshes from the item triggers), so only a moved record needs a refresh
+        migrations.RunSQL(
+            sql="""
+            DROP TRIGGER IF EXISTS tr_meal_record_rollup_update;
+            CREATE TRIGGER tr_meal_record_rollup_update
+            AFTER UPDATE ON dietmanage_mealrecord
+            FOR EACH ROW
+            BEGIN
+                IF NEW.user_id != OLD.user_id OR NEW.date != OLD.date THEN
+                    CALL sp_refresh_health_rollup(OLD.user_id, OLD.date);
+                    CALL sp_refresh_health_rollup(NEW.user_id, NEW.date);
+                END IF;
+            END;
+            """,
+            reverse_sql="""
+            DROP TRIGGER IF EXISTS tr_meal_record_rollup_update;
+            CREATE TRIGGER tr_meal_record_rollup_update
+            AFTER UPDATE ON dietmanage_mealrecord
+            FOR EACH ROW
+            BEGIN
+                CALL sp_refresh_health_rollup(OLD.user_id, OLD.date);
+                IF NEW.user_id != OLD.user_id OR NEW.date != OLD.date THEN
+                    CALL sp_refresh_health_rollup(NEW.user_id, NEW.date);
+                END IF;
+            END;
+            """
+        ),
+
+        # 7. Procedures that delete items of a record that stays
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_clear_meal_items_safe;
+            CREATE PROCEDURE sp_clear_meal_items_safe(
+                IN p_record_id INT,
+                IN p_user_id INT
+            )
+            BEGIN
+                DECLARE v_owner_id INT;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    SELECT 3 AS status_code;
+                END;
+
+                START TRANSACTION;
+                SELECT user_id INTO v_owner_id FROM dietmanage_mealrecord WHERE id = p_record_id FOR UPDATE;
+
+                IF v_owner_id IS NULL THEN
+                    SET v_status = 1;
+                ELSEIF v_owner_id != p_user_id THEN
+                    SET v_status = 2;
+                ELSE
+                    DELETE FROM dietmanage_mealitem WHERE meal_record_id = p_record_id;
+                    CALL sp_refresh_meal_totals(p_record_id);
+                    SET v_status = 0;
+                END IF;
+
+                IF v_status = 0 THEN COMMIT; ELSE ROLLBACK; END IF;
+                SELECT v_status AS status_code;
+            END;
+            """,
+            reverse_sql=PREVIOUS_CLEAR_ITEMS_SP,
+        ),
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_update_meal_record_with_items;
+            CREATE PROCEDURE sp_update_meal_record_with_items(
+                IN p_record_id INT,
+                IN p_user_id INT,
+                IN p_date DATE,
+                IN p_meal VARCHAR(10),
+                IN p_source VARCHAR(20),
+                IN p_items JSON
+            )
+            BEGIN
+                DECLARE v_owner_id INT;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    SELECT 3 AS status_code;
+                END;
+
+                START TRANSACTION;
+                SELECT user_id INTO v_owner_id FROM dietmanage_mealrecord WHERE id = p_record_id FOR UPDATE;
+
+                IF v_owner_id IS NULL THEN
+                    SET v_status = 1;
+                ELSEIF v_owner_id != p_user_id THEN
+                    SET v_status = 2;
+                ELSE
+                    UPDATE dietmanage_mealrecord
+                    SET date = COALESCE(p_date, date),
+                        meal = COALESCE(p_meal, meal),
+                        source = COALESCE(p_source, source)
+                    WHERE id = p_record_id;
+
+                    IF p_items IS NOT NULL THEN
+                        DELETE FROM dietmanage_mealitem WHERE meal_record_id = p_record_id;
+                        INSERT INTO dietmanage_mealitem (meal_record_id, food_id, quantity_in_grams)
+                        SELECT p_record_id, jt.food_id, jt.quantity_in_grams
+                        FROM JSON_TABLE(p_items, '$[*]' COLUMNS (
+                            food_id INT PATH '$.food',
+                            quantity_in_grams DOUBLE PATH '$.quantity_in_grams'
+                        )) AS jt;
+                        -- covers an empty item list, which fires no insert trigger
+                        CALL sp_refresh_meal_totals(p_record_id);
+                    END IF;
+                    SET v_status = 0;
+                END IF;
+
+                IF v_status = 0 THEN COMMIT; ELSE ROLLBACK; END IF;
+                SELECT v_status AS status_code;
+                IF v_status = 0 THEN
+                    SELECT * FROM view_meal_record_full WHERE id = p_record_id;
+                    SELECT * FROM view_meal_item_full WHERE meal_record_id = p_record_id ORDER BY id;
+                END IF;
+            END;
+            """,
+            reverse_sql=PREVIOUS_UPDATE_WITH_ITEMS_SP,
+        ),
+
+        # 8. Mergeable view: a plain projection of the base table, so WHERE user_id / id
+        #    reach the table's indexes
+        migrations.RunSQL(
+            sql="""
+            CREATE OR REPLACE ALGORITHM = MERGE VIEW view_meal_record_full AS
+            SELECT
+                mr.id,
+                mr.user_id,
+                mr.date,
+                mr.meal,
+                mr.source,
+                mr.created_at,
+                mr.total_calories,
+                mr.total_water
+            FROM dietmanage_mealrecord mr;
+            """,
+            reverse_sql="""
+            CREATE OR REPLACE VIEW view_meal_record_full AS
+            SELECT
+                mr.id,
+                mr.user_id,
+                mr.date,
+                mr.meal,
+                mr.source,
+                mr.created_at,
+                COALESCE(SUM(vmi.estimated_calories), 0) as total_calories,
+                COALESCE(SUM(vmi.estimated_water), 0) as total_water
+            FROM dietmanage_mealrecord mr
+            LEFT JOIN view_meal_item_full vmi ON mr.id = vmi.meal_record_id
+            GROUP BY mr.id;
+            """
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("DietManage", "0023_mealrecord_total_calories_total_water"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="mealrecord",
+            name="total_calories",
+            field=models.FloatField(db_default=0, default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="mealrecord",
+            name="total_water",
+            field=models.FloatField(db_default=0, default=0, editable=False),
+        ),
+    ]
@@ -14,11 +14,27 @@ class MealRecord(models.Model):
         default='manual'
     )
     created_at = models.DateTimeField(null=True, blank=True)
+    # 由餐食明细触发器与存储过程维护 (sp_refresh_meal_totals), 勿直接写入
+    total_calories = models.FloatField(default=0, db_default=0, editable=False)
+    total_water = models.FloatField(default=0, db_default=0, editable=False)
+
+    TOTAL_FIELDS = ('total_calories', 'total_water')
 
     class Meta:
         indexes = [
             models.Index(fields=['user', 'date']),
+            models.Index(fields=['user', 'date', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
         ]
 
+    def save(self, *args, **kwargs):
+        # 更新时不写回内存中的汇总值, 以免覆盖触发器维护的结果
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.TOTAL_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.user.username} 的 {self.get_meal_display()} ({self.date})"
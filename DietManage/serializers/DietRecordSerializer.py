@@ -2,6 +2,7 @@ from rest_framework import serializers
 from DietManage.models.MealItem import MealItem
 from DietManage.models.MealRecord import MealRecord
 from DietManage.models.NutritionFood import NutritionFood
+from DietManage import sql
 
 class MealItemSerializer(serializers.ModelSerializer):
     food = serializers.PrimaryKeyRelatedField(
@@ -19,7 +20,7 @@ class MealRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = MealRecord
         fields = '__all__'
-        read_only_fields = ['id', 'user']
+        read_only_fields = ['id', 'user', 'total_calories', 'total_water']
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
@@ -27,6 +28,8 @@ class MealRecordSerializer(serializers.ModelSerializer):
         for item_data in items_data:
             MealItem.objects.create(meal_record=meal_record, **item_data)
             print(item_data)
+        # 汇总由明细插入触发器写入数据库
+        meal_record.refresh_from_db(fields=list(MealRecord.TOTAL_FIELDS))
         return meal_record
     
     def update(self, instance, validated_data):
@@ -40,6 +43,9 @@ class MealRecordSerializer(serializers.ModelSerializer):
         for item_data in items_data:
             MealItem.objects.create(meal_record=instance, **item_data)
 
+        # 删除明细没有触发器, 按当前明细重新计算汇总
+        sql.refresh_meal_totals(instance.id)
+        instance.refresh_from_db(fields=list(MealRecord.TOTAL_FIELDS))
         return instance
 
 class NutritionFoodSerializer(serializers.ModelSerializer):
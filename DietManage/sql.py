@@ -1,4 +1,6 @@
 from django.db import connection
+import json
+from utils.pagination import keyset_condition
 
 def dictfetchall(cursor):
     "Return all rows from a cursor as a dict"
@@ -14,16 +16,36 @@ def get_meal_records(user_id, start_date=None, end_date=None):
     if start_date and end_date:
         sql += " AND date BETWEEN %s AND %s"
         params.extend([start_date, end_date])
-    sql += " ORDER BY date DESC, created_at DESC"
+    sql += " ORDER BY date DESC, id DESC"
     
     with connection.cursor() as cursor:
         cursor.execute(sql, params)
         records = dictfetchall(cursor)
         
-        # Fetch items for each record
-        for r in records:
-            r['items'] = get_meal_items(r['id'])
-        return records
+    return attach_meal_items(records)
+
+# Keyset order, must match the ORDER BY of get_meal_records.
+# created_at is nullable and cannot be part of a keyset predicate (created_at < NULL is never true)
+MEAL_KEYSET = ('date', 'id')
+
+def get_meal_records_page(user_id, start_date=None, end_date=None, limit=50, after=None):
+    sql = "SELECT * FROM view_meal_record_full WHERE user_id = %s"
+    params = [user_id]
+    if start_date and end_date:
+        sql += " AND date BETWEEN %s AND %s"
+        params.extend([start_date, end_date])
+    if after:
+        keyset_sql, keyset_params = keyset_condition(MEAL_KEYSET, after)
+        sql += " AND " + keyset_sql
+        params.extend(keyset_params)
+    sql += " ORDER BY date DESC, id DESC LIMIT %s"
+    params.append(limit)
+    
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        records = dictfetchall(cursor)
+        
+    return attach_meal_items(records)
 
 def get_meal_record_by_id(record_id):
     sql = "SELECT * FROM view_meal_record_full WHERE id = %s"
@@ -31,59 +53,81 @@ def get_meal_record_by_id(record_id):
         cursor.execute(sql, [record_id])
         rows = dictfetchall(cursor)
         if rows:
-            record = rows[0]
-            record['items'] = get_meal_items(record_id)
-            return record
+            return attach_meal_items(rows)[0]
         return None
 
 def get_meal_items(meal_record_id):
-    sql = "SELECT * FROM view_meal_item_full WHERE meal_record_id = %s"
+    return get_meal_items_batch([meal_record_id]).get(int(meal_record_id), [])
+
+def get_meal_items_batch(meal_record_ids):
+    """
+    Fetch the items of many meal records in one query.
+    Returns a dict of meal_record_id -> list of items (records without items are absent).
+    """
+    ids = list(dict.fromkeys(int(i) for i in meal_record_ids))
+    if not ids:
+        return {}
+
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = f"SELECT * FROM view_meal_item_full WHERE meal_record_id IN ({placeholders}) ORDER BY meal_record_id, id"
     with connection.cursor() as cursor:
-        cursor.execute(sql, [meal_record_id])
-        return dictfetchall(cursor)
+        cursor.execute(sql, ids)
+        items = dictfetchall(cursor)
+
+    items_by_record = {}
+    for item in items:
+        items_by_record.setdefault(item['meal_record_id'], []).append(item)
+    return items_by_record
+
+def attach_meal_items(records):
+    """Set record['items'] on every record using a single batched item query."""
+    items_by_record = get_meal_items_batch(r['id'] for r in records)
+    for r in records:
+        r['items'] = items_by_record.get(r['id'], [])
+    return records
+
+def _items_json(items):
+    if items is None:
+        return None
+    return json.dumps([
+        {'food': item.get('food'), 'quantity_in_grams': item.get('quantity_in_grams')}
+        for item in items
+    ])
+
+def _fetch_record_with_items(cursor):
+    """Read the (record, items) result sets returned after a successful write procedure."""
+    record = None
+    if cursor.nextset():
+        rows = dictfetchall(cursor)
+        record = rows[0] if rows else None
+    items = []
+    if cursor.nextset():
+        items = dictfetchall(cursor)
+    if record is not None:
+        record['items'] = items
+    return record
 
 def create_meal_record(user_id, date, meal, source, items=None):
     with connection.cursor() as cursor:
-        # 1. Create Record
-        cursor.callproc('sp_create_meal_record', [user_id, date, meal, source])
-        rows = dictfetchall(cursor)
-        if not rows:
+        # Record and all items are written by one procedure call in one transaction
+        cursor.callproc('sp_create_meal_record_with_items', [user_id, date, meal, source, _items_json(items or [])])
+        status_row = cursor.fetchone()
+        status_code = status_row[0] if status_row else 3
+        if status_code != 0:
             return None
-        record = rows[0]
-        
-        # 2. Add Items
-        if items:
-            for item in items:
-                # Clear result sets before next callproc if needed, 
-                # but here we use a new cursor or nextset.
-                # Actually, callproc might leave unread results.
-                while cursor.nextset(): pass 
-                cursor.callproc('sp_add_meal_item', [record['id'], item.get('food'), item.get('quantity_in_grams')])
-        
-        # Fetch full record with items
-        return get_meal_record_by_id(record['id'])
+        return _fetch_record_with_items(cursor)
 
 def update_meal_record_safe(record_id, user_id, date=None, meal=None, source=None, items=None):
     with connection.cursor() as cursor:
-        # 1. Update main record
-        cursor.callproc('sp_update_meal_record_safe', [record_id, user_id, date, meal, source])
+        # items=None keeps the existing items, a list (even empty) replaces them
+        cursor.callproc('sp_update_meal_record_with_items', [record_id, user_id, date, meal, source, _items_json(items)])
         status_row = cursor.fetchone()
         status_code = status_row[0] if status_row else 3
         
         if status_code != 0:
             return status_code, None
 
-        # 2. If items are provided, clear and re-add them
-        if items is not None:
-            while cursor.nextset(): pass
-            cursor.callproc('sp_clear_meal_items_safe', [record_id, user_id])
-            
-            for item in items:
-                while cursor.nextset(): pass
-                cursor.callproc('sp_add_meal_item', [record_id, item.get('food'), item.get('quantity_in_grams')])
-        
-        # 3. Return updated record
-        return 0, get_meal_record_by_id(record_id)
+        return 0, _fetch_record_with_items(cursor)
 
 def delete_meal_record_safe(record_id, user_id):
     with connection.cursor() as cursor:
@@ -121,3 +165,37 @@ def get_all_nutrition_foods():
     with connection.cursor() as cursor:
         cursor.execute(sql)
         return dictfetchall(cursor)
+
+def find_meal_total_mismatches(user_id=None, tolerance=0.01):
+    """
+    Meal records whose stored totals differ from the sum of their items
+    :return: [{'id', 'user_id', 'total_calories', 'total_water', 'expected_calories', 'expected_water'}]
+    """
+    sql = """
+        SELECT mr.id, mr.user_id, mr.total_calories, mr.total_water,
+               COALESCE(t.calories, 0) AS expected_calories,
+               COALESCE(t.water, 0) AS expected_water
+        FROM dietmanage_mealrecord mr
+        LEFT JOIN (
+            SELECT vmi.meal_record_id,
+                   SUM(vmi.estimated_calories) AS calories,
+                   SUM(vmi.estimated_water) AS water
+            FROM view_meal_item_full vmi
+            GROUP BY vmi.meal_record_id
+        ) t ON t.meal_record_id = mr.id
+        WHERE (ABS(mr.total_calories - COALESCE(t.calories, 0)) > %s
+               OR ABS(mr.total_water - COALESCE(t.water, 0)) > %s)
+    """
+    params = [tolerance, tolerance]
+    if user_id is not None:
+        sql += " AND mr.user_id = %s"
+        params.append(user_id)
+    sql += " ORDER BY mr.id"
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dictfetchall(cursor)
+
+def refresh_meal_totals(record_id):
+    with connection.cursor() as cursor:
+        cursor.callproc('sp_refresh_meal_totals', [record_id])
@@ -1,6 +1,6 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from DietManage.views.DietRecordView import MealRecordViewSet, food_list
+from DietManage.views.DietRecordView import MealRecordViewSet, food_list, food_search
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -9,4 +9,5 @@ router.register(r'records', MealRecordViewSet, basename='mealrecord')
 urlpatterns = [
     path('', include(router.urls)),
     path('list/', food_list),
+    path('search/', food_search),
 ]
\ No newline at end of file
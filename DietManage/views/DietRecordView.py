@@ -5,11 +5,16 @@ from rest_framework.permissions import IsAuthenticated
 from datetime import datetime, timedelta
 import numpy as np
 import random
-from DietManage import sql
+from DietManage import sql, food_catalogue
 from utils.api_utils import (
     success_api_response, failed_api_response, ErrorCode, parse_data
 )
-from utils.cache_utils import invalidate_health_cache, invalidate_friend_feed_cache
+from utils.cache_utils import invalidate_health_cache
+from UserManage import timeline
+from utils.pagination import (
+    wants_page, wants_stream, parse_page_params, make_page, iter_keyset_pages, streaming_api_response,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+)
 
 class MealRecordViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -18,6 +23,23 @@ class MealRecordViewSet(viewsets.ViewSet):
         user_id = request.user.id
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
+
+        def fetch_page(limit, after):
+            return sql.get_meal_records_page(user_id, start_date, end_date, limit, after)
+
+        # ?stream=1: serialise page by page instead of building the whole list
+        if wants_stream(request):
+            return streaming_api_response(iter_keyset_pages(fetch_page, sql.MEAL_KEYSET), message='获取成功')
+
+        # ?limit=&cursor=: keyset pagination
+        if wants_page(request):
+            try:
+                limit, after = parse_page_params(request)
+                page = make_page(fetch_page(limit + 1, after), limit, sql.MEAL_KEYSET)
+            except ValueError:
+                return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的分页参数"))
+            return Response(success_api_response(page, message='获取成功'))
+
         records = sql.get_meal_records(user_id, start_date, end_date)
         return Response(success_api_response(records, message='获取成功'))
 
@@ -43,9 +65,9 @@ class MealRecordViewSet(viewsets.ViewSet):
             data.get('items', [])
         )
         
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and push the new activity to the user's timeline
         invalidate_health_cache(user_id)
-        invalidate_friend_feed_cache(user_id)
+        timeline.record_activity(user_id, 'meal', new_record)
         
         return Response(success_api_response(new_record, message='创建成功'))
 
@@ -73,9 +95,9 @@ class MealRecordViewSet(viewsets.ViewSet):
         elif status_code == 3:
             return Response(failed_api_response(ErrorCode.SYSTEM_ERROR, "数据库执行错误"))
             
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and refresh the activity in the user's timeline
         invalidate_health_cache(request.user.id)
-        invalidate_friend_feed_cache(request.user.id)
+        timeline.record_activity(request.user.id, 'meal', updated_record)
             
         return Response(success_api_response(updated_record, message='更新成功'))
 
@@ -87,9 +109,9 @@ class MealRecordViewSet(viewsets.ViewSet):
         elif status_code == 2:
             return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权删除"))
             
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and drop the activity from the user's timeline
         invalidate_health_cache(request.user.id)
-        invalidate_friend_feed_cache(request.user.id)
+        timeline.remove_activity(request.user.id, 'meal', pk)
             
         return Response(success_api_response(None, message='删除成功'))
 
@@ -153,5 +175,35 @@ class MealRecordViewSet(viewsets.ViewSet):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def food_list(request):
-    foods = sql.get_all_nutrition_foods()
-    return Response(success_api_response(foods, message='获取成功'))
\ No newline at end of file
+    foods = food_catalogue.get_catalogue().foods
+    return Response(success_api_response(list(foods), message='获取成功'))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def food_search(request):
+    """
+    GET /api/diet/search/?q=鸡蛋&mode=prefix,substring,pinyin&limit=20&offset=0
+    mode defaults to all; pinyin matches name initials, e.g. q=jd finds 鸡蛋
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response(failed_api_response(ErrorCode.REQUIRED_ARG_IS_NULL_ERROR, "缺少搜索关键词"))
+
+    mode_param = request.query_params.get('mode')
+    modes = tuple(m for m in mode_param.split(',') if m) if mode_param else food_catalogue.MATCH_MODES
+    try:
+        limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+        offset = int(request.query_params.get('offset', 0))
+        if limit <= 0 or offset < 0 or not set(modes) <= set(food_catalogue.MATCH_MODES):
+            raise ValueError
+    except ValueError:
+        return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的搜索参数"))
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    matches = food_catalogue.get_catalogue().search(query, modes)
+    next_offset = offset + limit if offset + limit < len(matches) else None
+    return Response(success_api_response({
+        'results': matches[offset:offset + limit],
+        'total': len(matches),
+        'next_offset': next_offset
+    }, message='获取成功'))
\ No newline at end of file
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SleepManage", "0018_sleeprecord_sleepmanage_user_id_8e6324_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sleeprecord",
+            index=models.Index(
+                fields=["user", "created_at"], name="SleepManage_user_id_0108b7_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import migrations
+
+# Same scoring as the daily rollup's sleep_quality_score, per record
+QUALITY_SCORE_SQL = """
+    CASE
+        WHEN duration BETWEEN 7 AND 9 THEN 40
+        WHEN duration BETWEEN 6 AND 10 THEN 30
+        WHEN duration BETWEEN 5 AND 11 THEN 20
+        ELSE 10
+    END +
+    CASE
+        WHEN HOUR(sleep_time) BETWEEN 22 AND 23 THEN 30
+        WHEN HOUR(sleep_time) = 21 OR HOUR(sleep_time) = 0 THEN 20
+        WHEN HOUR(sleep_time) = 20 OR HOUR(sleep_time) = 1 THEN 15
+        ELSE 10
+    END +
+    CASE
+        WHEN HOUR(wake_time) BETWEEN 6 AND 8 THEN 30
+        WHEN HOUR(wake_time) = 5 OR HOUR(wake_time) = 9 THEN 20
+        WHEN HOUR(wake_time) = 4 OR HOUR(wake_time) = 10 THEN 15
+        ELSE 10
+    END
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SleepManage", "0019_sleeprecord_sleepmanage_user_id_0108b7_idx"),
+    ]
+
+    operations = [
+        # 1. Stored generated columns: MySQL computes them on every insert/update of
+        #    sleep_time/wake_time, whichever procedure or trigger writes the row, so the
+        #    view no longer evaluates CONCAT/CAST/TIMESTAMPDIFF per row on each read.
+        #    Duration only depends on the times of day (a wake time earlier than the sleep
+        #    time means the next day), which matches the old view expression.
+        migrations.RunSQL(
+            sql=f"""
+            ALTER TABLE sleepmanage_sleeprecord
+                ADD COLUMN duration DOUBLE GENERATED ALWAYS AS (
+                    (TIME_TO_SEC(wake_time) - TIME_TO_SEC(sleep_time)
+                     + IF(wake_time < sleep_time, 86400, 0)) / 3600.0
+                ) STORED,
+                ADD COLUMN quality_score SMALLINT GENERATED ALWAYS AS ({QUALITY_SCORE_SQL}) STORED;
+            """,
+            reverse_sql="""
+            ALTER TABLE sleepmanage_sleeprecord
+                DROP COLUMN quality_score,
+                DROP COLUMN duration;
+            """,
+        ),
+
+        # 2. Covers the per-user date-range aggregations (sleep analysis, daily rollup)
+        migrations.RunSQL(
+            sql="""
+            CREATE INDEX sleepmanage_user_date_duration_idx
+            ON sleepmanage_sleeprecord (user_id, date, duration, quality_score, sleep_time, wake_time);
+            """,
+            reverse_sql="DROP INDEX sleepmanage_user_date_duration_idx ON sleepmanage_sleeprecord;",
+        ),
+
+        # 3. The view exposes the stored columns
+        migrations.RunSQL(
+            sql="""
+            CREATE OR REPLACE ALGORITHM = MERGE VIEW view_sleep_record_full AS
+            SELECT
+                id, user_id, date, sleep_time, wake_time, created_at,
+                duration, quality_score
+            FROM sleepmanage_sleeprecord;
+            """,
+            reverse_sql="""
+            CREATE OR REPLACE VIEW view_sleep_record_full AS
+            SELECT 
+                id, user_id, date, sleep_time, wake_time, created_at,
+                CAST(
+                    (TIMESTAMPDIFF(SECOND, 
+                        CAST(CONCAT(date, ' ', sleep_time) AS DATETIME),
+                        IF(wake_time < sleep_time, 
+                           DATE_ADD(CAST(CONCAT(date, ' ', wake_time) AS DATETIME), INTERVAL 1 DAY),
+                           CAST(CONCAT(date, ' ', wake_time) AS DATETIME)
+                        )
+                    ) / 3600.0) 
+                AS DOUBLE) AS duration
+            FROM sleepmanage_sleeprecord;
+            """,
+        ),
+    ]
@@ -7,10 +7,13 @@ class SleepRecord(models.Model):
     sleep_time = models.TimeField()
     wake_time = models.TimeField()
     created_at = models.DateTimeField(null=True, blank=True)
+    # duration / quality_score 为数据库 STORED 生成列 (迁移 0020), 不在模型中声明, 通过 view_sleep_record_full 读取
 
     class Meta:
         indexes = [
             models.Index(fields=['user', 'date']),
+            models.Index(fields=['user', 'date', 'sleep_time']),
+            models.Index(fields=['user', 'created_at']),
         ]
 
     def __str__(self):
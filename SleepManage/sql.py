@@ -1,4 +1,5 @@
 from django.db import connection
+from utils.pagination import keyset_condition
 
 def dictfetchall(cursor):
     "Return all rows from a cursor as a dict"
@@ -16,7 +17,30 @@ def get_sleep_records(user_id, start_date=None, end_date=None):
         sql += " AND date BETWEEN %s AND %s"
         params.extend([start_date, end_date])
     
-    sql += " ORDER BY date DESC, sleep_time DESC"
+    sql += " ORDER BY date DESC, sleep_time DESC, id DESC"
+    
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dictfetchall(cursor)
+
+# Keyset order, must match the ORDER BY of get_sleep_records
+SLEEP_KEYSET = ('date', 'sleep_time', 'id')
+
+def get_sleep_records_page(user_id, start_date=None, end_date=None, limit=50, after=None):
+    sql = "SELECT * FROM view_sleep_record_full WHERE user_id = %s"
+    params = [user_id]
+    
+    if start_date and end_date:
+        sql += " AND date BETWEEN %s AND %s"
+        params.extend([start_date, end_date])
+
+    if after:
+        keyset_sql, keyset_params = keyset_condition(SLEEP_KEYSET, after)
+        sql += " AND " + keyset_sql
+        params.extend(keyset_params)
+    
+    sql += " ORDER BY date DESC, sleep_time DESC, id DESC LIMIT %s"
+    params.append(limit)
     
     with connection.cursor() as cursor:
         cursor.execute(sql, params)
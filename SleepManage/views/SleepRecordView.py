@@ -10,7 +10,11 @@ from SleepManage import sql
 from utils.api_utils import (
     success_api_response, failed_api_response, ErrorCode, parse_data
 )
-from utils.cache_utils import invalidate_health_cache, invalidate_friend_feed_cache
+from utils.cache_utils import invalidate_health_cache
+from UserManage import timeline
+from utils.pagination import (
+    wants_page, wants_stream, parse_page_params, make_page, iter_keyset_pages, streaming_api_response
+)
 
 class SleepRecordViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -19,6 +23,23 @@ class SleepRecordViewSet(viewsets.ViewSet):
         user_id = request.user.id
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
+
+        def fetch_page(limit, after):
+            return sql.get_sleep_records_page(user_id, start_date, end_date, limit, after)
+
+        # ?stream=1: serialise page by page instead of building the whole list
+        if wants_stream(request):
+            return streaming_api_response(iter_keyset_pages(fetch_page, sql.SLEEP_KEYSET), message='获取成功')
+
+        # ?limit=&cursor=: keyset pagination
+        if wants_page(request):
+            try:
+                limit, after = parse_page_params(request)
+                page = make_page(fetch_page(limit + 1, after), limit, sql.SLEEP_KEYSET)
+            except ValueError:
+                return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的分页参数"))
+            return Response(success_api_response(page, message='获取成功'))
+
         records = sql.get_sleep_records(user_id, start_date, end_date)
         return Response(success_api_response(records, message='获取成功'))
 
@@ -43,9 +64,9 @@ class SleepRecordViewSet(viewsets.ViewSet):
             data.get('wake_time')
         )
         
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and push the new activity to the user's timeline
         invalidate_health_cache(user_id)
-        invalidate_friend_feed_cache(user_id)
+        timeline.record_activity(user_id, 'sleep', new_record)
         
         return Response(success_api_response(new_record, message='创建成功'))
 
@@ -70,9 +91,9 @@ class SleepRecordViewSet(viewsets.ViewSet):
         elif status_code == 2:
             return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权修改"))
             
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and refresh the activity in the user's timeline
         invalidate_health_cache(request.user.id)
-        invalidate_friend_feed_cache(request.user.id)
+        timeline.record_activity(request.user.id, 'sleep', updated_record)
             
         return Response(success_api_response(updated_record, message='更新成功'))
 
@@ -84,9 +105,9 @@ class SleepRecordViewSet(viewsets.ViewSet):
         elif status_code == 2:
             return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权删除"))
             
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and drop the activity from the user's timeline
         invalidate_health_cache(request.user.id)
-        invalidate_friend_feed_cache(request.user.id)
+        timeline.remove_activity(request.user.id, 'sleep', pk)
             
         return Response(success_api_response(None, message='删除成功'))
 
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SportmanageConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "SportManage"
+
+    def ready(self):
+        # Parse met.json once per process instead of on every request
+        from SportManage import met_registry
+        met_registry.load()
@@ -0,0 +1,103 @@
+"""
+Process-wide MET catalogue.
+
+met.json is parsed once (at app ready) into an immutable MetCatalogue whose
+id -> MET and id -> name lookups are plain arrays indexed by sport id.
+The file's mtime is re-checked at most every RELOAD_CHECK_INTERVAL seconds
+and a new catalogue is swapped in when it changes.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+MET_PATH = os.path.join(os.path.dirname(__file__), 'met.json')
+DEFAULT_MET = 1.0
+RELOAD_CHECK_INTERVAL = 5.0
+
+
+class MetCatalogue:
+    __slots__ = ('sports', 'mets', 'names', 'etag', 'mtime', 'list_body')
+
+    def __init__(self, sports, mtime=None, etag=None):
+        self.sports = tuple(sports)
+        self.mets = array('d', (float(s['MET']) for s in self.sports))
+        self.names = tuple(s['name'] for s in self.sports)
+        self.mtime = mtime
+        self.etag = etag
+        # Pre-encoded body of the sport_list response
+        self.list_body = json.dumps(
+            {'code': 0, 'message': '获取成功', 'data': list(self.sports)},
+            ensure_ascii=False
+        ).encode('utf-8')
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError(f"MetCatalogue is immutable, cannot set {name}")
+        object.__setattr__(self, name, value)
+
+    def _index(self, sport_id):
+        try:
+            index = int(sport_id)
+        except (TypeError, ValueError):
+            return None
+        return index if 0 <= index < len(self.names) else None
+
+    def met(self, sport_id, default=DEFAULT_MET):
+        index = self._index(sport_id)
+        return self.mets[index] if index is not None else default
+
+    def name(self, sport_id, default=None):
+        index = self._index(sport_id)
+        return self.names[index] if index is not None else default
+
+
+_catalogue = MetCatalogue([])
+_last_check = 0.0
+_lock = threading.Lock()
+
+
+def load():
+    """(Re)load met.json and swap in a new catalogue. Keeps the previous one on failure."""
+    global _catalogue
+    try:
+        mtime = os.stat(MET_PATH).st_mtime
+        with open(MET_PATH, 'rb') as f:
+            raw = f.read()
+        sports = json.loads(raw.decode('utf-8'))
+        _catalogue = MetCatalogue(sports, mtime=mtime, etag='"%s"' % hashlib.md5(raw).hexdigest())
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"加载 MET 数据失败: {str(e)}")
+    return _catalogue
+
+
+def get_catalogue():
+    """Return the current catalogue, reloading it if met.json changed on disk."""
+    global _last_check
+    now = time.monotonic()
+    if now - _last_check < RELOAD_CHECK_INTERVAL:
+        return _catalogue
+
+    with _lock:
+        if now - _last_check >= RELOAD_CHECK_INTERVAL:
+            _last_check = now
+            try:
+                mtime = os.stat(MET_PATH).st_mtime
+            except OSError:
+                mtime = None
+            if mtime is not None and mtime != _catalogue.mtime:
+                load()
+    return _catalogue
+
+
+def get_met_value(sport_id):
+    return get_catalogue().met(sport_id)
+
+
+def get_sport_name(sport_id, default=None):
+    return get_catalogue().name(sport_id, default)
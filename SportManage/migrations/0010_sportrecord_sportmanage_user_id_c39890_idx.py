@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SportManage", "0009_sportrecord_sportmanage_user_id_5ef1ae_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sportrecord",
+            index=models.Index(
+                fields=["user", "date", "begin_time"], name="SportManage_user_id_c39890_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("SportManage", "0010_sportrecord_sportmanage_user_id_c39890_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="sportrecord",
+            index=models.Index(
+                fields=["user", "created_at"], name="SportManage_user_id_4de75a_idx"
+            ),
+        ),
+    ]
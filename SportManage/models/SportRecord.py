@@ -15,6 +15,8 @@ class SportRecord(models.Model):
         ordering = ['-date']
         indexes = [
             models.Index(fields=['user', 'date']),
+            models.Index(fields=['user', 'date', 'begin_time']),
+            models.Index(fields=['user', 'created_at']),
         ]
 
     def __str__(self):
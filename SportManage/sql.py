@@ -1,6 +1,6 @@
 from django.db import connection
-import json
-import os
+from utils.pagination import keyset_condition
+from SportManage import met_registry
 
 def dictfetchall(cursor):
     "Return all rows from a cursor as a dict"
@@ -11,13 +11,7 @@ def dictfetchall(cursor):
     ]
 
 def get_met_value(sport_id):
-    met_path = os.path.join(os.path.dirname(__file__), 'met.json')
-    try:
-        with open(met_path, 'r', encoding='utf-8') as f:
-            mets = json.load(f)
-        return mets[int(sport_id)]['MET']
-    except (IndexError, KeyError, ValueError, FileNotFoundError):
-        return 1.0
+    return met_registry.get_met_value(sport_id)
 
 def get_sport_records(user_id, start_date=None, end_date=None):
     sql = "SELECT * FROM view_sport_record_full WHERE user_id = %s"
@@ -27,7 +21,30 @@ def get_sport_records(user_id, start_date=None, end_date=None):
         sql += " AND date BETWEEN %s AND %s"
         params.extend([start_date, end_date])
     
-    sql += " ORDER BY date DESC, begin_time DESC"
+    sql += " ORDER BY date DESC, begin_time DESC, id DESC"
+    
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return dictfetchall(cursor)
+
+# Keyset order, must match the ORDER BY of get_sport_records
+SPORT_KEYSET = ('date', 'begin_time', 'id')
+
+def get_sport_records_page(user_id, start_date=None, end_date=None, limit=50, after=None):
+    sql = "SELECT * FROM view_sport_record_full WHERE user_id = %s"
+    params = [user_id]
+    
+    if start_date and end_date:
+        sql += " AND date BETWEEN %s AND %s"
+        params.extend([start_date, end_date])
+
+    if after:
+        keyset_sql, keyset_params = keyset_condition(SPORT_KEYSET, after)
+        sql += " AND " + keyset_sql
+        params.extend(keyset_params)
+    
+    sql += " ORDER BY date DESC, begin_time DESC, id DESC LIMIT %s"
+    params.append(limit)
     
     with connection.cursor() as cursor:
         cursor.execute(sql, params)
@@ -2,15 +2,19 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
 from datetime import datetime, timedelta
-import json
-import os
 import random
-from SportManage import sql
+from SportManage import sql, met_registry
 from utils.api_utils import (
     success_api_response, failed_api_response, ErrorCode, parse_data
 )
-from utils.cache_utils import invalidate_health_cache, invalidate_friend_feed_cache
+from utils.cache_utils import invalidate_health_cache
+from UserManage import timeline
+from utils.pagination import (
+    wants_page, wants_stream, parse_page_params, make_page, iter_keyset_pages, streaming_api_response
+)
 
 class SportRecordViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
@@ -19,6 +23,23 @@ class SportRecordViewSet(viewsets.ViewSet):
         user_id = request.user.id
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
+
+        def fetch_page(limit, after):
+            return sql.get_sport_records_page(user_id, start_date, end_date, limit, after)
+
+        # ?stream=1: serialise page by page instead of building the whole list
+        if wants_stream(request):
+            return streaming_api_response(iter_keyset_pages(fetch_page, sql.SPORT_KEYSET), message='获取成功')
+
+        # ?limit=&cursor=: keyset pagination
+        if wants_page(request):
+            try:
+                limit, after = parse_page_params(request)
+                page = make_page(fetch_page(limit + 1, after), limit, sql.SPORT_KEYSET)
+            except ValueError:
+                return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的分页参数"))
+            return Response(success_api_response(page, message='获取成功'))
+
         records = sql.get_sport_records(user_id, start_date, end_date)
         return Response(success_api_response(records, message='获取成功'))
 
@@ -44,9 +65,9 @@ class SportRecordViewSet(viewsets.ViewSet):
             data.get('end_time')
         )
         
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and push the new activity to the user's timeline
         invalidate_health_cache(user_id)
-        invalidate_friend_feed_cache(user_id)
+        timeline.record_activity(user_id, 'sport', new_record)
         
         return Response(success_api_response(new_record, message='创建成功'))
 
@@ -72,9 +93,9 @@ class SportRecordViewSet(viewsets.ViewSet):
         elif status_code == 2:
             return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权修改"))
             
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and refresh the activity in the user's timeline
         invalidate_health_cache(request.user.id)
-        invalidate_friend_feed_cache(request.user.id)
+        timeline.record_activity(request.user.id, 'sport', updated_record)
             
         return Response(success_api_response(updated_record, message='更新成功'))
 
@@ -86,9 +107,9 @@ class SportRecordViewSet(viewsets.ViewSet):
         elif status_code == 2:
             return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权删除"))
             
-        # Invalidate health and friend feed cache
+        # Invalidate health cache and drop the activity from the user's timeline
         invalidate_health_cache(request.user.id)
-        invalidate_friend_feed_cache(request.user.id)
+        timeline.remove_activity(request.user.id, 'sport', pk)
             
         return Response(success_api_response(None, message='删除成功'))
 
@@ -101,18 +122,15 @@ class SportRecordViewSet(viewsets.ViewSet):
         # Call the stored procedure for heavy lifting
         daily_raw, details_raw, monthly_data, metrics = sql.get_sport_analysis(user_id, start_date, end_date)
 
-        # Read sport names for mapping
-        met_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'met.json')
-        with open(met_path, 'r', encoding='utf-8') as f:
-            sports = json.load(f)
-        sport_id_to_name = {i: s['name'] for i, s in enumerate(sports)}
+        # Sport names for mapping
+        catalogue = met_registry.get_catalogue()
 
         # Map sport details
         daily_details = {}
         for d in details_raw:
             date_str = d['date'].strftime('%Y-%m-%d') if hasattr(d['date'], 'strftime') else str(d['date'])
             daily_details.setdefault(date_str, [])
-            sport_name = sport_id_to_name.get(d['sport'], f"Sport {d['sport']}")
+            sport_name = catalogue.name(d['sport'], f"Sport {d['sport']}")
             daily_details[date_str].append({"name": sport_name, "value": d['calories']})
 
         # Final daily data assembly
@@ -161,7 +179,13 @@ class SportRecordViewSet(viewsets.ViewSet):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def sport_list(request):
-    met_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'met.json')
-    with open(met_path, 'r', encoding='utf-8') as f:
-        sports = json.load(f)
-    return Response(success_api_response(sports, message='获取成功'))
\ No newline at end of file
+    catalogue = met_registry.get_catalogue()
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if catalogue.etag and (catalogue.etag in etags or '*' in etags):
+        response = HttpResponseNotModified()
+    else:
+        # Body is encoded once per catalogue load
+        response = HttpResponse(catalogue.list_body, content_type='application/json')
+    if catalogue.etag:
+        response['ETag'] = catalogue.etag
+    return response
@@ -1,5 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
+
+
+def _user_changed(sender, instance, **kwargs):
+    from utils.cache_utils import invalidate_user_cache
+    invalidate_user_cache(instance.pk if sender.__name__ == 'User' else instance.user_id)
 
 
 class UsermanageConfig(AppConfig):
     name = 'UserManage'
+
+    def ready(self):
+        # ORM writes (admin, createsuperuser, ...) refresh the cached user snapshot;
+        # profile writes through sp_update_user_profile invalidate it in ProfileView
+        from django.contrib.auth.models import User
+        UserProfile = self.get_model('UserProfile')
+        for model in (User, UserProfile):
+            post_save.connect(_user_changed, sender=model, dispatch_uid=f'{model.__name__}_snapshot_saved')
+            post_delete.connect(_user_changed, sender=model, dispatch_uid=f'{model.__name__}_snapshot_deleted')
@@ -0,0 +1,100 @@
+"""
+Per-user accepted-friend id set.
+
+Kept as a Redis set friend_ids:{user_id} so membership is a single SISMEMBER.
+The set is loaded from the database on first use and always contains the
+sentinel 0 (no user has id 0), so an existing key with no real members
+still means "loaded, no friends". Accept adds both directions, remove and
+cancel drop both; sets that are not loaded are left alone and load fresh
+on next use.
+
+Every change also bumps friend_ids:{user_id}:gen, and a load only stores
+its set when the generation is unchanged since before its database query.
+Otherwise a removal committed during the load (whose SREM found no set yet)
+would be undone by the load and keep granting access until the set expires.
+"""
+from django_redis import get_redis_connection
+from UserManage import sql
+
+FRIEND_SET_TTL = 24 * 3600
+_SENTINEL = 0
+
+# KEYS: set, gen  ARGV: member, ttl
+_ADD_IF_LOADED = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('SADD', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+# KEYS: set, gen  ARGV: member, ttl
+_REMOVE = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return redis.call('SREM', KEYS[1], ARGV[1])
+"""
+
+# KEYS: set, gen  ARGV: generation, ttl, members...
+_STORE_IF_UNCHANGED = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def _key(user_id):
+    return f'friend_ids:{user_id}'
+
+
+def _gen_key(user_id):
+    return f'friend_ids:{user_id}:gen'
+
+
+def _load(conn, user_id):
+    generation = conn.get(_gen_key(user_id))
+    generation = generation.decode() if generation is not None else '0'
+    friends = sql.get_friend_requests(user_id, direction='both', status='accepted')
+    ids = {f['to_user_id'] if f['from_user_id'] == int(user_id) else f['from_user_id'] for f in friends}
+    # Not stored when the friendship changed meanwhile; the next call loads again
+    conn.eval(_STORE_IF_UNCHANGED, 2, _key(user_id), _gen_key(user_id),
+              generation, FRIEND_SET_TTL, _SENTINEL, *ids)
+    return ids
+
+
+def get_friend_ids(user_id):
+    conn = get_redis_connection('default')
+    members = conn.smembers(_key(user_id))
+    if not members:
+        return _load(conn, user_id)
+    return {int(m) for m in members} - {_SENTINEL}
+
+
+def is_friend(user_id, other_id):
+    """True when other_id is an accepted friend of user_id (a user is not their own friend)"""
+    conn = get_redis_connection('default')
+    key = _key(user_id)
+    pipe = conn.pipeline(transaction=False)
+    pipe.exists(key)
+    pipe.sismember(key, other_id)
+    loaded, member = pipe.execute()
+    if not loaded:
+        return int(other_id) in _load(conn, user_id)
+    return bool(member) and int(other_id) != _SENTINEL
+
+
+def add_friendship(user_a, user_b):
+    conn = get_redis_connection('default')
+    conn.eval(_ADD_IF_LOADED, 2, _key(user_a), _gen_key(user_a), user_b, FRIEND_SET_TTL)
+    conn.eval(_ADD_IF_LOADED, 2, _key(user_b), _gen_key(user_b), user_a, FRIEND_SET_TTL)
+
+
+def remove_friendship(user_a, user_b):
+    conn = get_redis_connection('default')
+    conn.eval(_REMOVE, 2, _key(user_a), _gen_key(user_a), user_b, FRIEND_SET_TTL)
+    conn.eval(_REMOVE, 2, _key(user_b), _gen_key(user_b), user_a, FRIEND_SET_TTL)
@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with the iteration count taken from settings.PASSWORD_HASH_ITERATIONS.
+    Same algorithm name as Django's hasher: existing hashes keep verifying, and hashes
+    with a different count are upgraded on the next successful login.
+    """
+    iterations = getattr(settings, 'PASSWORD_HASH_ITERATIONS', PBKDF2PasswordHasher.iterations)
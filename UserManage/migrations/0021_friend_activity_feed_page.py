@@ -0,0 +1,106 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("UserManage", "0020_alter_friend_unique_together"),
+        ("SportManage", "0011_sportrecord_sportmanage_user_id_4de75a_idx"),
+        ("SleepManage", "0019_sleeprecord_sleepmanage_user_id_0108b7_idx"),
+        ("DietManage", "0022_mealrecord_dietmanage__user_id_e48cce_idx"),
+    ]
+
+    operations = [
+        # One page of a friend's activities, newest first.
+        #   Keyset order: created_at DESC, type DESC, id DESC
+        #   (p_before, p_before_type, p_before_id) is the last row of the previous page, NULL for the first page.
+        # The friendship check runs in its own short transaction, so the share lock is released
+        # before the feed is read. Each branch is range-scanned on (user_id, created_at) and limited
+        # on its own, so the cost depends on p_limit rather than on the friend's history.
+        # Result sets: status_code, then user info and activities when status_code = 0
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_get_friend_activities_page;
+            CREATE PROCEDURE sp_get_friend_activities_page(
+                IN p_user_id INT,
+                IN p_friend_id INT,
+                IN p_before DATETIME(6),
+                IN p_before_type VARCHAR(10),
+                IN p_before_id INT,
+                IN p_limit INT
+            )
+            BEGIN
+                DECLARE v_is_friend INT DEFAULT 0;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE v_before DATETIME(6);
+
+                START TRANSACTION;
+
+                IF p_user_id = p_friend_id THEN
+                    SET v_is_friend = 1;
+                ELSE
+                    SELECT COUNT(*) INTO v_is_friend FROM usermanage_friend
+                    WHERE ((from_user_id = p_user_id AND to_user_id = p_friend_id)
+                       OR (from_user_id = p_friend_id AND to_user_id = p_user_id))
+                    AND status = 'accepted'
+                    LOCK IN SHARE MODE;
+                END IF;
+
+                IF NOT EXISTS (SELECT 1 FROM auth_user WHERE id = p_friend_id) THEN
+                    SET v_status = 1;
+                ELSEIF v_is_friend = 0 THEN
+                    SET v_status = 2;
+                ELSE
+                    SET v_status = 0;
+                END IF;
+
+                COMMIT;
+
+                SELECT v_status AS status_code;
+
+                IF v_status = 0 THEN
+                    SELECT id, username FROM auth_user WHERE id = p_friend_id;
+
+                    SET v_before = COALESCE(p_before, '9999-12-31 23:59:59');
+
+                    SELECT * FROM (
+                        (SELECT id, 'sport' AS type, CAST(sport AS CHAR) AS detail, duration, created_at
+                         FROM view_sport_record_full
+                         WHERE user_id = p_friend_id AND created_at <= v_before
+                           AND (created_at < v_before
+                                OR 'sport' < p_before_type
+                                OR ('sport' = p_before_type AND id < p_before_id))
+                         ORDER BY created_at DESC, id DESC
+                         LIMIT p_limit)
+                        UNION ALL
+                        (SELECT id, 'sleep' AS type, NULL AS detail, duration, created_at
+                         FROM view_sleep_record_full
+                         WHERE user_id = p_friend_id AND created_at <= v_before
+                           AND (created_at < v_before
+                                OR 'sleep' < p_before_type
+                                OR ('sleep' = p_before_type AND id < p_before_id))
+                         ORDER BY created_at DESC, id DESC
+                         LIMIT p_limit)
+                        UNION ALL
+                        -- view_meal_record_full aggregates every record, so read the limited
+                        -- rows from the base table and total only their items
+                        (SELECT mr.id, 'meal' AS type, mr.meal AS detail,
+                                COALESCE((SELECT SUM(vmi.estimated_calories) FROM view_meal_item_full vmi
+                                          WHERE vmi.meal_record_id = mr.id), 0) AS duration,
+                                mr.created_at
+                         FROM dietmanage_mealrecord mr
+                         WHERE mr.user_id = p_friend_id AND mr.created_at <= v_before
+                           AND (mr.created_at < v_before
+                                OR 'meal' < p_before_type
+                                OR ('meal' = p_before_type AND mr.id < p_before_id))
+                         ORDER BY mr.created_at DESC, mr.id DESC
+                         LIMIT p_limit)
+                    ) AS feed
+                    ORDER BY created_at DESC, type DESC, id DESC
+                    LIMIT p_limit;
+                END IF;
+            END;
+            """,
+            reverse_sql="DROP PROCEDURE IF EXISTS sp_get_friend_activities_page;",
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("UserManage", "0022_friend_feed_stored_meal_totals"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        # 1. Normalized username for search: generated by MySQL, so every way of creating or
+        #    renaming a user keeps it current. (username_normalized, id) serves prefix matches
+        #    and the search keyset order.
+        migrations.RunSQL(
+            sql="""
+            ALTER TABLE auth_user
+                ADD COLUMN username_normalized VARCHAR(150)
+                    GENERATED ALWAYS AS (LOWER(TRIM(username))) STORED,
+                ADD INDEX auth_user_username_norm_idx (username_normalized, id);
+            """,
+            reverse_sql="""
+            ALTER TABLE auth_user
+                DROP INDEX auth_user_username_norm_idx,
+                DROP COLUMN username_normalized;
+            """,
+        ),
+
+        # 2. Substring matches: ngram full-text index (token size 2 by default), queried as a
+        #    phrase so only usernames containing the consecutive characters match
+        migrations.RunSQL(
+            sql="""
+            ALTER TABLE auth_user
+                ADD FULLTEXT INDEX auth_user_username_ngram_idx (username_normalized) WITH PARSER ngram;
+            """,
+            reverse_sql="ALTER TABLE auth_user DROP INDEX auth_user_username_ngram_idx;",
+        ),
+    ]
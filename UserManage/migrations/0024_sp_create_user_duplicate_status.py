@@ -0,0 +1,99 @@
+from django.db import migrations
+
+# 0018 definition, restored on reverse
+PREVIOUS_SP = """
+            DROP PROCEDURE IF EXISTS sp_create_user;
+            CREATE PROCEDURE sp_create_user(
+                IN p_username VARCHAR(150),
+                IN p_password VARCHAR(128),
+                IN p_height DOUBLE,
+                IN p_weight DOUBLE,
+                IN p_gender VARCHAR(10),
+                IN p_birthday DATE,
+                IN p_realName VARCHAR(50),
+                IN p_roles JSON,
+                IN p_daily_calories_burn_goal DOUBLE,
+                IN p_daily_calories_intake_goal DOUBLE,
+                IN p_daily_sleep_hours_goal DOUBLE
+            )
+            BEGIN
+                DECLARE v_user_id INT;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                END;
+                START TRANSACTION;
+                INSERT INTO auth_user (username, password, is_superuser, is_staff, is_active, date_joined)
+                VALUES (p_username, p_password, 0, 0, 1, NOW());
+                SET v_user_id = LAST_INSERT_ID();
+                INSERT INTO usermanage_userprofile (
+                    user_id, height, weight, gender, birthday, realName, roles,
+                    daily_calories_burn_goal, daily_calories_intake_goal, daily_sleep_hours_goal
+                ) VALUES (
+                    v_user_id, p_height, p_weight, p_gender, p_birthday, p_realName, p_roles,
+                    p_daily_calories_burn_goal, p_daily_calories_intake_goal, p_daily_sleep_hours_goal
+                );
+                COMMIT;
+                SELECT v_user_id;
+            END;
+            """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("UserManage", "0023_user_search_indexes"),
+    ]
+
+    operations = [
+        # Registration relies on the unique auth_user.username index instead of a pre-check query.
+        # Result set: status_code (0 created, 1 username taken, 3 other error), user_id
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_create_user;
+            CREATE PROCEDURE sp_create_user(
+                IN p_username VARCHAR(150),
+                IN p_password VARCHAR(128),
+                IN p_height DOUBLE,
+                IN p_weight DOUBLE,
+                IN p_gender VARCHAR(10),
+                IN p_birthday DATE,
+                IN p_realName VARCHAR(50),
+                IN p_roles JSON,
+                IN p_daily_calories_burn_goal DOUBLE,
+                IN p_daily_calories_intake_goal DOUBLE,
+                IN p_daily_sleep_hours_goal DOUBLE
+            )
+            BEGIN
+                DECLARE v_user_id INT;
+                -- ER_DUP_ENTRY: username already exists
+                DECLARE EXIT HANDLER FOR 1062
+                BEGIN
+                    ROLLBACK;
+                    SELECT 1 AS status_code, NULL AS user_id;
+                END;
+                DECLARE EXIT HANDLER FOR SQLEXCEPTION
+                BEGIN
+                    ROLLBACK;
+                    SELECT 3 AS status_code, NULL AS user_id;
+                END;
+
+                START TRANSACTION;
+                INSERT INTO auth_user (username, password, first_name, last_name, email,
+                                       is_superuser, is_staff, is_active, date_joined)
+                VALUES (p_username, p_password, '', '', '', 0, 0, 1, NOW());
+                SET v_user_id = LAST_INSERT_ID();
+                INSERT INTO usermanage_userprofile (
+                    user_id, height, weight, gender, birthday, realName, roles,
+                    daily_calories_burn_goal, daily_calories_intake_goal, daily_sleep_hours_goal
+                ) VALUES (
+                    v_user_id, p_height, p_weight, p_gender, p_birthday, p_realName, p_roles,
+                    p_daily_calories_burn_goal, p_daily_calories_intake_goal, p_daily_sleep_hours_goal
+                );
+                COMMIT;
+                SELECT 0 AS status_code, v_user_id AS user_id;
+            END;
+            """,
+            reverse_sql=PREVIOUS_SP,
+        ),
+    ]
@@ -0,0 +1,194 @@
+from django.db import migrations
+
+# 0022 definition, restored on reverse
+PREVIOUS_SP = """
+            DROP PROCEDURE IF EXISTS sp_get_friend_activities_page;
+            CREATE PROCEDURE sp_get_friend_activities_page(
+                IN p_user_id INT,
+                IN p_friend_id INT,
+                IN p_before DATETIME(6),
+                IN p_before_type VARCHAR(10),
+                IN p_before_id INT,
+                IN p_limit INT
+            )
+            BEGIN
+                DECLARE v_is_friend INT DEFAULT 0;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE v_before DATETIME(6);
+
+                START TRANSACTION;
+
+                IF p_user_id = p_friend_id THEN
+                    SET v_is_friend = 1;
+                ELSE
+                    SELECT COUNT(*) INTO v_is_friend FROM usermanage_friend
+                    WHERE ((from_user_id = p_user_id AND to_user_id = p_friend_id)
+                       OR (from_user_id = p_friend_id AND to_user_id = p_user_id))
+                    AND status = 'accepted'
+                    LOCK IN SHARE MODE;
+                END IF;
+
+                IF NOT EXISTS (SELECT 1 FROM auth_user WHERE id = p_friend_id) THEN
+                    SET v_status = 1;
+                ELSEIF v_is_friend = 0 THEN
+                    SET v_status = 2;
+                ELSE
+                    SET v_status = 0;
+                END IF;
+
+                COMMIT;
+
+                SELECT v_status AS status_code;
+
+                IF v_status = 0 THEN
+                    SELECT id, username FROM auth_user WHERE id = p_friend_id;
+
+                    SET v_before = COALESCE(p_before, '9999-12-31 23:59:59');
+
+                    SELECT * FROM (
+                        (SELECT id, 'sport' AS type, CAST(sport AS CHAR) AS detail, duration, created_at
+                         FROM view_sport_record_full
+                         WHERE user_id = p_friend_id AND created_at <= v_before
+                           AND (created_at < v_before
+                                OR 'sport' < p_before_type
+                                OR ('sport' = p_before_type AND id < p_before_id))
+                         ORDER BY created_at DESC, id DESC
+                         LIMIT p_limit)
+                        UNION ALL
+                        (SELECT id, 'sleep' AS type, NULL AS detail, duration, created_at
+                         FROM view_sleep_record_full
+                         WHERE user_id = p_friend_id AND created_at <= v_before
+                           AND (created_at < v_before
+                                OR 'sleep' < p_before_type
+                                OR ('sleep' = p_before_type AND id < p_before_id))
+                         ORDER BY created_at DESC, id DESC
+                         LIMIT p_limit)
+                        UNION ALL
+                        (SELECT mr.id, 'meal' AS type, mr.meal AS detail, mr.total_calories AS duration,
+                                mr.created_at
+                         FROM dietmanage_mealrecord mr
+                         WHERE mr.user_id = p_friend_id AND mr.created_at <= v_before
+                           AND (mr.created_at < v_before
+                                OR 'meal' < p_before_type
+                                OR ('meal' = p_before_type AND mr.id < p_before_id))
+                         ORDER BY mr.created_at DESC, mr.id DESC
+                         LIMIT p_limit)
+                    ) AS feed
+                    ORDER BY created_at DESC, type DESC, id DESC
+                    LIMIT p_limit;
+                END IF;
+            END;
+            """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("UserManage", "0024_sp_create_user_duplicate_status"),
+    ]
+
+    operations = [
+        # Activities without created_at used to be filtered out by created_at <= v_before.
+        # They now sort after every dated activity (as NULLs do in created_at DESC), ordered
+        # by type DESC, id DESC among themselves; a cursor row without created_at
+        # (p_before NULL, p_before_type set) continues inside that NULL tail.
+        migrations.RunSQL(
+            sql="""
+            DROP PROCEDURE IF EXISTS sp_get_friend_activities_page;
+            CREATE PROCEDURE sp_get_friend_activities_page(
+                IN p_user_id INT,
+                IN p_friend_id INT,
+                IN p_before DATETIME(6),
+                IN p_before_type VARCHAR(10),
+                IN p_before_id INT,
+                IN p_limit INT
+            )
+            BEGIN
+                DECLARE v_is_friend INT DEFAULT 0;
+                DECLARE v_status INT DEFAULT 0;
+                DECLARE v_before DATETIME(6);
+                DECLARE v_null_phase INT DEFAULT 0;
+
+                START TRANSACTION;
+
+                IF p_user_id = p_friend_id THEN
+                    SET v_is_friend = 1;
+                ELSE
+                    SELECT COUNT(*) INTO v_is_friend FROM usermanage_friend
+                    WHERE ((from_user_id = p_user_id AND to_user_id = p_friend_id)
+                       OR (from_user_id = p_friend_id AND to_user_id = p_user_id))
+                    AND status = 'accepted'
+                    LOCK IN SHARE MODE;
+                END IF;
+
+                IF NOT EXISTS (SELECT 1 FROM auth_user WHERE id = p_friend_id) THEN
+                    SET v_status = 1;
+                ELSEIF v_is_friend = 0 THEN
+                    SET v_status = 2;
+                ELSE
+                    SET v_status = 0;
+                END IF;
+
+                COMMIT;
+
+                SELECT v_status AS status_code;
+
+                IF v_status = 0 THEN
+                    SELECT id, username FROM auth_user WHERE id = p_friend_id;
+
+                    SET v_before = COALESCE(p_before, '9999-12-31 23:59:59');
+                    -- a cursor without created_at points into the NULL rows, which sort last
+                    SET v_null_phase = (p_before IS NULL AND p_before_type IS NOT NULL);
+
+                    SELECT * FROM (
+                        (SELECT id, 'sport' AS type, CAST(sport AS CHAR) AS detail, duration, created_at
+                         FROM view_sport_record_full
+                         WHERE user_id = p_friend_id AND (
+                               (NOT v_null_phase AND created_at <= v_before
+                                AND (created_at < v_before
+                                     OR 'sport' < p_before_type
+                                     OR ('sport' = p_before_type AND id < p_before_id)))
+                               OR (created_at IS NULL
+                                   AND (NOT v_null_phase
+                                        OR 'sport' < p_before_type
+                                        OR ('sport' = p_before_type AND id < p_before_id))))
+                         ORDER BY created_at DESC, id DESC
+                         LIMIT p_limit)
+                        UNION ALL
+                        (SELECT id, 'sleep' AS type, NULL AS detail, duration, created_at
+                         FROM view_sleep_record_full
+                         WHERE user_id = p_friend_id AND (
+                               (NOT v_null_phase AND created_at <= v_before
+                                AND (created_at < v_before
+                                     OR 'sleep' < p_before_type
+                                     OR ('sleep' = p_before_type AND id < p_before_id)))
+                               OR (created_at IS NULL
+                                   AND (NOT v_null_phase
+                                        OR 'sleep' < p_before_type
+                                        OR ('sleep' = p_before_type AND id < p_before_id))))
+                         ORDER BY created_at DESC, id DESC
+                         LIMIT p_limit)
+                        UNION ALL
+                        (SELECT mr.id, 'meal' AS type, mr.meal AS detail, mr.total_calories AS duration,
+                                mr.created_at
+                         FROM dietmanage_mealrecord mr
+                         WHERE mr.user_id = p_friend_id AND (
+                               (NOT v_null_phase AND mr.created_at <= v_before
+                                AND (mr.created_at < v_before
+                                     OR 'meal' < p_before_type
+                                     OR ('meal' = p_before_type AND mr.id < p_before_id)))
+                               OR (mr.created_at IS NULL
+                                   AND (NOT v_null_phase
+                                        OR 'meal' < p_before_type
+                                        OR ('meal' = p_before_type AND mr.id < p_before_id))))
+                         ORDER BY mr.created_at DESC, mr.id DESC
+                         LIMIT p_limit)
+                    ) AS feed
+                    ORDER BY created_at DESC, type DESC, id DESC
+                    LIMIT p_limit;
+                END IF;
+            END;
+            """,
+            reverse_sql=PREVIOUS_SP,
+        ),
+    ]
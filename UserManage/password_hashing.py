@@ -0,0 +1,60 @@
+"""
+Password hashing off the request thread.
+
+make_password is deliberately slow (PBKDF2), so a registration burst would
+otherwise tie up every request worker hashing. Hashes run on a small bounded
+thread pool per process (hashlib releases the GIL while it hashes), and at most
+PASSWORD_HASH_QUEUE hashes may be running or waiting at once; beyond that, or
+after PASSWORD_HASH_TIMEOUT seconds, hash_password raises HashingBusy and the
+caller answers right away instead of queueing more work.
+
+The hash cost itself is set by PASSWORD_HASH_ITERATIONS (UserManage.hashers).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+MAX_WORKERS = getattr(settings, 'PASSWORD_HASH_WORKERS', 2)
+MAX_PENDING = getattr(settings, 'PASSWORD_HASH_QUEUE', 16)
+HASH_TIMEOUT = getattr(settings, 'PASSWORD_HASH_TIMEOUT', 10)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+
+
+class HashingBusy(Exception):
+    """The hashing pool is full or did not finish in time"""
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='password-hash')
+    return _executor
+
+
+def _hash(password):
+    try:
+        return make_password(password)
+    finally:
+        _slots.release()
+
+
+def hash_password(password):
+    """make_password on the hashing pool; raises HashingBusy instead of waiting without bound"""
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy('password hashing queue is full')
+    try:
+        future = _get_executor().submit(_hash, password)
+    except RuntimeError:
+        _slots.release()
+        raise
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except FutureTimeoutError:
+        # The slot is released when the hash finishes, so the queue stays bounded
+        raise HashingBusy('password hashing timed out')
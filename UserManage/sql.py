@@ -2,6 +2,7 @@ from django.db import connection
 from django.utils import timezone
 import datetime
 import json
+from utils.pagination import keyset_condition
 
 def dictfetchall(cursor):
     "Return all rows from a cursor as a dict"
@@ -23,7 +24,31 @@ def get_user_by_id(user_id):
         row = dictfetchall(cursor)
         return row[0] if row else None
 
+PROFILE_FIELDS = [
+    'height', 'weight', 'gender', 'birthday', 'realName', 'roles',
+    'daily_calories_burn_goal', 'daily_calories_intake_goal', 'daily_sleep_hours_goal'
+]
+
+def get_user_snapshot_row(user_id):
+    """auth_user flags needed for authentication plus the profile, in one primary-key lookup"""
+    sql = """
+        SELECT u.id, u.username, u.is_active, u.is_staff, u.is_superuser,
+               p.height, p.weight, p.gender, p.birthday, p.`realName`, p.roles,
+               p.daily_calories_burn_goal, p.daily_calories_intake_goal, p.daily_sleep_hours_goal
+        FROM auth_user u
+        LEFT JOIN `usermanage_userprofile` p ON u.id = p.user_id
+        WHERE u.id = %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id])
+        row = dictfetchall(cursor)
+        return row[0] if row else None
+
 def create_user(username, password, profile_data):
+    """
+    Insert auth_user and profile in one transaction; uniqueness is enforced by the username index
+    :return: (status_code, user_id), status 0 created, 1 username taken, 3 database error
+    """
     # Prepare roles data: ensure it is a valid JSON string
     roles_data = profile_data.get('roles', [])
     if not isinstance(roles_data, str):
@@ -43,9 +68,8 @@ def create_user(username, password, profile_data):
             profile_data.get('daily_calories_intake_goal', 2000),
             profile_data.get('daily_sleep_hours_goal', 8)
         ])
-        # Fetch the result of the SELECT new_user_id;
         row = cursor.fetchone()
-        return row[0] if row else None
+        return (row[0], row[1]) if row else (3, None)
 
 def update_user_profile(user_id, profile_data):
     # Prepare roles data: ensure it is a valid JSON string if provided
@@ -68,42 +92,53 @@ def update_user_profile(user_id, profile_data):
         ])
         return True
 
-def search_users(username_query=None):
+USER_SEARCH_KEYSET = ('username_normalized', 'id')
+USER_SEARCH_MODES = ('prefix', 'substring')
+# Shorter substring queries have no ngram to look up and are matched with a plain
+# LIKE '%q%' scan, bounded by the keyset order and limit
+NGRAM_TOKEN_SIZE = 2
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def normalize_username(value):
+    """Same normalization as the auth_user.username_normalized generated column"""
+    return (value or '').strip().lower()
+
+def search_users(query=None, mode='prefix', limit=20, after=None):
     """
-    Search users by username (exact match if provided, otherwise list all).
-    Returns a list of users with their profiles nested.
+    Users whose normalized username starts with (prefix) or contains (substring) query,
+    ordered by (username_normalized, id). No query pages through all users.
+    :param after: keyset values (username_normalized, id) of the last row of the previous page
+    :return: rows {'id', 'username', 'username_normalized'}, at most limit
     """
-    sql_query = "SELECT * FROM view_user_full"
+    query = normalize_username(query)
+    sql_query = "SELECT id, username, username_normalized FROM auth_user WHERE is_active = 1"
     params = []
-    if username_query:
-        sql_query += " WHERE username = %s"
-        params.append(username_query)
-    
-    sql_query += " ORDER BY id"
+
+    if query:
+        if mode == 'substring':
+            if len(query) >= NGRAM_TOKEN_SIZE:
+                # The full-text phrase narrows the candidates, LIKE keeps only exact substrings
+                sql_query += " AND MATCH(username_normalized) AGAINST (%s IN BOOLEAN MODE)"
+                params.append('"' + query.replace('"', ' ') + '"')
+            sql_query += " AND username_normalized LIKE %s"
+            params.append('%' + _like_escape(query) + '%')
+        else:
+            sql_query += " AND username_normalized LIKE %s"
+            params.append(_like_escape(query) + '%')
+
+    if after:
+        keyset_sql, keyset_params = keyset_condition(USER_SEARCH_KEYSET, after, descending=False)
+        sql_query += f" AND {keyset_sql}"
+        params.extend(keyset_params)
+
+    sql_query += " ORDER BY username_normalized, id LIMIT %s"
+    params.append(limit)
 
     with connection.cursor() as cursor:
         cursor.execute(sql_query, params)
-        rows = dictfetchall(cursor)
-    
-    # Format results to match UserSerializer structure
-    results = []
-    profile_fields = [
-        'height', 'weight', 'gender', 'birthday', 'realName', 'roles',
-        'daily_calories_burn_goal', 'daily_calories_intake_goal', 'daily_sleep_hours_goal'
-    ]
-    
-    for row in rows:
-        user_dict = {
-            'id': row['id'],
-            'username': row['username'],
-            'profile': {}
-        }
-        for field in profile_fields:
-            if field in row:
-                user_dict['profile'][field] = row[field]
-        results.append(user_dict)
-        
-    return results
+        return dictfetchall(cursor)
 
 def get_friend_requests(user_id, direction='received', status='pending'):
     """
@@ -183,30 +218,95 @@ def remove_friend_relationship_safe(request_id, user_id):
         row = cursor.fetchone()
         return row[0] if row else 1
 
-def get_friend_activities_safe(user_id, friend_id):
+FEED_KEYSET = ('created_at', 'type', 'id')
+
+def get_friend_activities_page(user_id, friend_id, limit, before=None):
+    """
+    One page of a friend's activities, newest first
+    :param before: keyset values (created_at, type, id) of the last row of the previous page
+    """
+    before_at, before_type, before_id = before if before else (None, None, None)
     with connection.cursor() as cursor:
-        # Use v2 for concurrency control
-        cursor.callproc('sp_get_friend_activities_safe_v2', [user_id, friend_id])
-        
+        cursor.callproc('sp_get_friend_activities_page', [
+            user_id, friend_id, before_at, before_type, before_id, limit
+        ])
+
         # Result Set 1: Status
         status_row = cursor.fetchone()
         status_code = status_row[0] if status_row else 1
-        
+
         user_info = None
         activities = []
-        
+
         if status_code == 0:
             # Result Set 2: User Info
             if cursor.nextset():
                 user_rows = dictfetchall(cursor)
                 user_info = user_rows[0] if user_rows else None
-            
+
             # Result Set 3: Activities
             if cursor.nextset():
                 activities = dictfetchall(cursor)
-                
+
         return status_code, user_info, activities
 
+# One query per activity type across all of the given users; every row carries user_id
+FEED_SOURCES = {
+    'sport': """
+        SELECT r.id, r.user_id, 'sport' AS type, CAST(r.sport AS CHAR) AS detail, r.duration, r.created_at
+        FROM view_sport_record_full r
+    """,
+    'sleep': """
+        SELECT r.id, r.user_id, 'sleep' AS type, NULL AS detail, r.duration, r.created_at
+        FROM view_sleep_record_full r
+    """,
+    'meal': """
+        SELECT r.id, r.user_id, 'meal' AS type, r.meal AS detail, r.total_calories AS duration, r.created_at
+        FROM view_meal_record_full r
+    """,
+}
+
+def get_feed_activities_by_type(act_type, user_ids, limit, before=None):
+    """
+    Newest activities of one type across user_ids, ordered like the feed keyset
+    (created_at DESC, type DESC, id DESC), activities without created_at last
+    :param before: keyset values (created_at, type, id) of the last row of the previous page
+    """
+    if not user_ids:
+        return []
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    sql_query = FEED_SOURCES[act_type] + f" WHERE r.user_id IN ({placeholders})"
+    params = list(user_ids)
+
+    # Rows without created_at come last (as NULLs do in created_at DESC), like sp_get_friend_activities_page.
+    # type is constant within one source, so the keyset predicate reduces to one of three forms
+    if before:
+        before_at, before_type, before_id = before
+        if before_at is None:
+            # The cursor is inside the NULL tail, ordered by (type, id)
+            if act_type > before_type:
+                return []
+            sql_query += " AND r.created_at IS NULL"
+            if act_type == before_type:
+                sql_query += " AND r.id < %s"
+                params.append(before_id)
+        elif act_type < before_type:
+            sql_query += " AND (r.created_at IS NULL OR r.created_at <= %s)"
+            params.append(before_at)
+        elif act_type == before_type:
+            sql_query += " AND (r.created_at IS NULL OR (r.created_at <= %s AND (r.created_at < %s OR r.id < %s)))"
+            params += [before_at, before_at, before_id]
+        else:
+            sql_query += " AND (r.created_at IS NULL OR r.created_at < %s)"
+            params.append(before_at)
+
+    sql_query += " ORDER BY r.created_at DESC, r.id DESC LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql_query, params)
+        return dictfetchall(cursor)
+
 def get_user_friends_all(user_id):
     with connection.cursor() as cursor:
         cursor.callproc('sp_get_user_friends_all', [user_id])
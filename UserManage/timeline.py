@@ -0,0 +1,225 @@
+"""
+Per-user activity timeline (fan-out on write).
+
+Each user's most recent TIMELINE_SIZE activities are kept in Redis as
+preformatted entries {'id', 'type', 'content', 'timestamp'}:
+  timeline:v2:{user_id}:z     sorted set, member "type:0000000id", score = created_at in microseconds
+  timeline:v2:{user_id}:h     hash, member -> entry json
+  timeline:v2:{user_id}:meta  hash, username and whether older history was trimmed
+  timeline:v2:{user_id}:gen   write counter, bumped by every upsert/remove
+Members are zero-padded so that ties on score order like the database keyset
+(created_at, type, id) DESC. Sport/sleep/meal writes upsert or remove their
+entry; the friend feed reads a slice. A timeline that does not exist yet (or
+expired) is rebuilt from the database on the next read, and writes in the
+meantime are skipped. The rebuild is only stored when no write happened since
+the generation was read before the database query, otherwise a write landing
+between the query and the store would be lost until the timeline expires.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from django_redis import get_redis_connection
+from SportManage import met_registry
+
+TIMELINE_SIZE = 200
+TIMELINE_TTL = 7 * 24 * 3600
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+MEAL_NAMES = {'breakfast': '早餐', 'lunch': '午餐', 'dinner': '晚餐', 'extra': '加餐'}
+
+# KEYS: zset, hash, meta, gen  ARGV: member, score, entry, cap, ttl
+_UPSERT_SCRIPT = """
+redis.call('INCR', KEYS[4])
+redis.call('EXPIRE', KEYS[4], ARGV[5])
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+local extra = redis.call('ZCARD', KEYS[1]) - tonumber(ARGV[4])
+if extra > 0 then
+    local old = redis.call('ZRANGE', KEYS[1], 0, extra - 1)
+    redis.call('ZREMRANGEBYRANK', KEYS[1], 0, extra - 1)
+    redis.call('HDEL', KEYS[2], unpack(old))
+    redis.call('HSET', KEYS[3], 'truncated', 1)
+end
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], ARGV[5])
+end
+return 1
+"""
+
+# KEYS: zset, hash, meta, gen  ARGV: member, ttl
+_REMOVE_SCRIPT = """
+redis.call('INCR', KEYS[4])
+redis.call('EXPIRE', KEYS[4], ARGV[2])
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS: zset, hash, meta, gen  ARGV: generation, ttl, username, truncated, then member, score, entry per row
+_REBUILD_SCRIPT = """
+if (redis.call('GET', KEYS[4]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+for i = 5, #ARGV, 3 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 2])
+end
+redis.call('HSET', KEYS[3], 'username', ARGV[3], 'truncated', ARGV[4])
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+end
+return 1
+"""
+
+
+def _keys(user_id):
+    prefix = f'timeline:v2:{user_id}'
+    return [f'{prefix}:z', f'{prefix}:h', f'{prefix}:meta', f'{prefix}:gen']
+
+
+def _member(act_type, act_id):
+    return f'{act_type}:{int(act_id):010d}'
+
+
+def _score(created_at):
+    # Integer microseconds stay exact in a double; activities without created_at
+    # sort after all others, as in the database feed
+    if not hasattr(created_at, 'timestamp'):
+        return 0
+    if created_at.tzinfo is None:
+        return int(created_at.timestamp() * 1_000_000)
+    return (created_at - _EPOCH) // timedelta(microseconds=1)
+
+
+def format_activity(record, catalogue=None):
+    """Raw feed row (id, type, detail, duration, created_at) -> {'id', 'type', 'content', 'timestamp'}"""
+    catalogue = catalogue or met_registry.get_catalogue()
+    act_type = record['type']
+    created_at = record['created_at']
+    if hasattr(created_at, 'isoformat'):
+        timestamp = created_at.isoformat()
+    else:
+        timestamp = str(created_at) if created_at is not None else None
+
+    content = ""
+    if act_type == 'sport':
+        sport_name = catalogue.name(record['detail'], "未知运动")
+        duration_min = round(float(record['duration'] or 0) * 60)
+        content = f"进行了{sport_name}，持续{duration_min}分钟"
+    elif act_type == 'sleep':
+        duration_hours = round(float(record['duration'] or 0), 1)
+        content = f"睡眠了{duration_hours}小时"
+    elif act_type == 'meal':
+        meal_name = MEAL_NAMES.get(record['detail'], record['detail'])
+        calories = round(float(record['duration'] or 0))
+        content = f"记录了{meal_name}，摄入约{calories}卡路里"
+
+    return {
+        'id': record['id'],
+        'type': act_type,
+        'content': content,
+        'timestamp': timestamp
+    }
+
+
+def feed_row(act_type, record):
+    """Record as returned by the sport/sleep/meal procedures -> raw feed row"""
+    if act_type == 'sport':
+        detail, amount = record.get('sport'), record.get('duration')
+    elif act_type == 'meal':
+        detail, amount = record.get('meal'), record.get('total_calories')
+    else:
+        detail, amount = None, record.get('duration')
+    return {
+        'id': record['id'],
+        'type': act_type,
+        'detail': detail,
+        'duration': amount,
+        'created_at': record.get('created_at')
+    }
+
+
+def record_activity(user_id, act_type, record):
+    """Upsert the entry for a created or updated record into its owner's timeline"""
+    if not record:
+        return
+    row = feed_row(act_type, record)
+    conn = get_redis_connection('default')
+    conn.eval(
+        _UPSERT_SCRIPT, 4, *_keys(user_id),
+        _member(act_type, row['id']), _score(row['created_at']),
+        json.dumps(format_activity(row), ensure_ascii=False), TIMELINE_SIZE, TIMELINE_TTL
+    )
+
+
+def remove_activity(user_id, act_type, act_id):
+    conn = get_redis_connection('default')
+    conn.eval(_REMOVE_SCRIPT, 4, *_keys(user_id), _member(act_type, act_id), TIMELINE_TTL)
+
+
+def generation(user_id):
+    """Write counter of a user's timeline; read it before querying the rows passed to rebuild"""
+    value = get_redis_connection('default').get(_keys(user_id)[3])
+    return value.decode() if value is not None else '0'
+
+
+def rebuild(user_id, username, rows, truncated, generation):
+    """
+    Replace a user's timeline with raw feed rows read from the database (newest first)
+    :param generation: generation(user_id) read before the rows were queried
+    :return: False when a write happened in between and nothing was stored
+    """
+    catalogue = met_registry.get_catalogue()
+    args = [generation, TIMELINE_TTL, username, int(truncated)]
+    for r in rows:
+        args += [
+            _member(r['type'], r['id']), _score(r['created_at']),
+            json.dumps(format_activity(r, catalogue), ensure_ascii=False)
+        ]
+    conn = get_redis_connection('default')
+    return bool(conn.eval(_REBUILD_SCRIPT, 4, *_keys(user_id), *args))
+
+
+def get_page(user_id, limit, before=None):
+    """
+    :param before: cursor values (timestamp, type, id) of the last entry of the previous page
+    :return: (username, entries, next cursor values or None), or None when the page
+             has to come from the database (timeline missing, cursor not in it, or
+             the page reaches past trimmed history)
+    """
+    zkey, hkey, mkey, _ = _keys(user_id)
+    conn = get_redis_connection('default')
+    meta = conn.hgetall(mkey)
+    if not meta:
+        return None
+
+    start = 0
+    if before:
+        try:
+            member = _member(before[1], before[2])
+        except (TypeError, ValueError):
+            return None
+        rank = conn.zrevrank(zkey, member)
+        if rank is None:
+            return None
+        start = rank + 1
+
+    members = conn.zrevrange(zkey, start, start + limit)
+    if meta.get(b'truncated') == b'1' and len(members) <= limit:
+        return None
+
+    has_more = len(members) > limit
+    members = members[:limit]
+    entries = [json.loads(v) for v in conn.hmget(hkey, members) if v is not None] if members else []
+    next_before = None
+    if has_more and entries:
+        last = entries[-1]
+        next_before = [last['timestamp'], last['type'], last['id']]
+    return meta[b'username'].decode(), entries, next_before
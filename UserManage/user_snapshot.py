@@ -0,0 +1,55 @@
+"""
+Compact cached view of a user: identity, auth flags and profile.
+
+Built from one auth_user + profile lookup and cached under the user's
+generational 'user' scope, so CachedJWTAuthentication can resolve
+request.user, and views can read the profile and goals, without querying
+the database. Profile writes call invalidate_user_cache.
+"""
+from django.contrib.auth.models import User
+from UserManage import sql
+from utils.cache_utils import get_or_compute, versioned_key, USER_SCOPE
+
+SNAPSHOT_TIMEOUT = 3600
+
+
+def load_snapshot(user_id):
+    row = sql.get_user_snapshot_row(user_id)
+    if row is None:
+        return None
+    return {
+        'id': row['id'],
+        'username': row['username'],
+        'is_active': bool(row['is_active']),
+        'is_staff': bool(row['is_staff']),
+        'is_superuser': bool(row['is_superuser']),
+        'profile': {k: row[k] for k in sql.PROFILE_FIELDS},
+    }
+
+
+def get_snapshot(user_id):
+    """:return: snapshot dict, or None when the user does not exist (cached as a negative result)"""
+    key = versioned_key(USER_SCOPE, user_id, f'user_snapshot_{user_id}')
+    snapshot, _ = get_or_compute(key, lambda: load_snapshot(user_id), timeout=SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def for_user(user):
+    """Snapshot attached by CachedJWTAuthentication, or read through the cache for other users"""
+    snapshot = getattr(user, 'snapshot', None)
+    return snapshot if snapshot is not None else get_snapshot(user.id)
+
+
+def to_user(snapshot):
+    """User instance backed by the snapshot (no password; not meant to be saved)"""
+    user = User(
+        id=snapshot['id'],
+        username=snapshot['username'],
+        is_active=snapshot['is_active'],
+        is_staff=snapshot['is_staff'],
+        is_superuser=snapshot['is_superuser'],
+    )
+    user._state.adding = False
+    user._state.db = 'default'
+    user.snapshot = snapshot
+    return user
@@ -1,155 +1,190 @@
+import heapq
+from itertools import islice
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils.timezone import localtime
-from django.core.cache import cache
-import os
-import json
 from utils.api_utils import (
     success_api_response, failed_api_response, ErrorCode, parse_data
 )
 from UserManage import sql
-from utils.cache_utils import invalidate_friend_cache, invalidate_friend_feed_cache
+from UserManage import timeline
+from UserManage import friend_index
+from utils.cache_utils import invalidate_friend_cache, versioned_key, get_or_compute, FRIEND_SCOPE
+from utils.pagination import make_page, encode_cursor, decode_cursor
+
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 100
+
+def parse_feed_page(request):
+    """
+    ?limit=20&before=<next_before of the previous page>
+    :return: (limit, keyset values or None)
+    :raise ValueError: malformed parameters
+    """
+    limit = min(int(request.query_params.get('limit', FEED_PAGE_SIZE)), FEED_MAX_PAGE_SIZE)
+    token = request.query_params.get('before')
+    before = decode_cursor(token) if token else None
+    if limit <= 0 or (before is not None and len(before) != len(sql.FEED_KEYSET)):
+        raise ValueError('invalid page')
+    return limit, before
+
+def _feed_key(record):
+    # created_at DESC with activities without created_at last, as in the database keyset
+    created_at = record['created_at']
+    return created_at is not None, created_at or 0, record['type'], record['id']
 
 class FriendViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def list(self, request):
         user_id = request.user.id
-        cache_key = f'friend_list_all_{user_id}'
+        cache_key = versioned_key(FRIEND_SCOPE, user_id, f'friend_list_all_{user_id}')
         
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(success_api_response(cached_data, message='获取好友数据成功 (from cache)'))
-            
-        friends_data = sql.get_user_friends_all(user_id)
-        cache.set(cache_key, friends_data, timeout=3600)
+        friends_data, from_cache = get_or_compute(cache_key, lambda: sql.get_user_friends_all(user_id), timeout=3600)
+        if from_cache:
+            return Response(success_api_response(friends_data, message='获取好友数据成功 (from cache)'))
         
         return Response(success_api_response(friends_data, message='获取好友数据成功'))
 
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """Merged activity feed of all accepted friends, newest first"""
+        user_id = request.user.id
+        try:
+            limit, before = parse_feed_page(request)
+        except ValueError:
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的分页参数"))
+
+        # Accepted friend set, shared with list()
+        cache_key = versioned_key(FRIEND_SCOPE, user_id, f'friend_list_all_{user_id}')
+        relations, _ = get_or_compute(cache_key, lambda: sql.get_user_friends_all(user_id), timeout=3600)
+
+        friend_names = {}
+        for rel in relations:
+            if rel['status'] != 'accepted':
+                continue
+            if rel['from_user_id'] == user_id:
+                friend_names[rel['to_user_id']] = rel['to_username']
+            else:
+                friend_names[rel['from_user_id']] = rel['from_username']
+
+        # One bounded query per activity type; each comes back sorted, so a k-way merge
+        # of the first limit + 1 rows gives the page plus the has-next marker
+        friend_ids = sorted(friend_names)
+        sources = [
+            sql.get_feed_activities_by_type(act_type, friend_ids, limit + 1, before)
+            for act_type in sql.FEED_SOURCES
+        ] if friend_ids else []
+        merged = list(islice(heapq.merge(*sources, key=_feed_key, reverse=True), limit + 1))
+        page = make_page(merged, limit, sql.FEED_KEYSET)
+
+        activities = []
+        for record in page['results']:
+            entry = timeline.format_activity(record)
+            entry['userId'] = record['user_id']
+            entry['username'] = friend_names.get(record['user_id'])
+            activities.append(entry)
+
+        return Response(success_api_response({
+            'activities': activities,
+            'next_before': page['next_cursor']
+        }, message='获取好友动态成功'))
+
     def retrieve(self, request, pk=None):
         # pk is friend_id (User ID of the friend)
         friend_id = pk
         user_id = request.user.id
         
         # 1. Security Check: Are they friends? 
-        # We can use the cached friend list for this to avoid DB hit
-        friend_list_cache_key = f'friend_list_{user_id}'
-        friends = cache.get(friend_list_cache_key)
-        if friends is None:
-            friends = sql.get_friend_requests(user_id, direction='both', status='accepted')
-            cache.set(friend_list_cache_key, friends, timeout=3600)
-        
-        is_friend = any(str(f['from_user_id']) == str(friend_id) or str(f['to_user_id']) == str(friend_id) for f in friends)
+        # Single set-membership lookup on the cached friend id set
+        try:
+            friend_id = int(friend_id)
+        except (TypeError, ValueError):
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的用户ID"))
         
-        if not is_friend and str(user_id) != str(friend_id):
+        if friend_id != user_id and not friend_index.is_friend(user_id, friend_id):
             return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权查看该用户动态"))
 
-        # 2. Cache Check for activities
-        cache_key = f'friend_activities_feed_{friend_id}'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(success_api_response(cached_data, message='获取好友详情成功 (from cache)'))
-
-        # 3. DB Fetch (if cache miss)
-        status_code, friend_user, raw_activities = sql.get_friend_activities_safe(user_id, friend_id)
-        
-        if status_code == 1:
-            return Response(failed_api_response(ErrorCode.NOT_FOUND_ERROR, "用户不存在"))
-        elif status_code == 2:
-            return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权查看该用户动态"))
+        # 2. Page parameters
+        try:
+            limit, before = parse_feed_page(request)
+        except ValueError:
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的分页参数"))
 
-        # Process activities (mapping sport names, etc.)
-        activities = []
+        # 3. Serve from the friend's ready-made timeline
+        page = timeline.get_page(friend_id, limit, before)
+        if page is None and before is None:
+            # Timeline not built yet: read the most recent TIMELINE_SIZE activities once and store them.
+            # A write between the query and the store aborts the rebuild, the page then comes from the database
+            generation = timeline.generation(friend_id)
+            status_code, friend_user, raw_activities = sql.get_friend_activities_page(
+                user_id, friend_id, timeline.TIMELINE_SIZE + 1
+            )
+            if status_code == 0 and timeline.rebuild(
+                friend_id, friend_user['username'], raw_activities[:timeline.TIMELINE_SIZE],
+                truncated=len(raw_activities) > timeline.TIMELINE_SIZE, generation=generation
+            ):
+                page = timeline.get_page(friend_id, limit)
         
-        # Load MET data for sport mapping
-        met_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'SportManage', 'met.json')
-        try:
-            with open(met_path, 'r', encoding='utf-8') as f:
-                mets = json.load(f)
-        except Exception:
-            mets = {}
+        if page is not None:
+            friend_name, activities, next_before = page
+            next_before = encode_cursor(next_before) if next_before else None
+        else:
+            # 4. Older than the timeline keeps: page through the database
+            status_code, friend_user, raw_activities = sql.get_friend_activities_page(user_id, friend_id, limit + 1, before)
             
-        for record in raw_activities:
-            act_type = record['type']
-            timestamp = record['created_at'].isoformat() if hasattr(record['created_at'], 'isoformat') else str(record['created_at'])
+            if status_code == 1:
+                return Response(failed_api_response(ErrorCode.NOT_FOUND_ERROR, "用户不存在"))
+            elif status_code == 2:
+                return Response(failed_api_response(ErrorCode.REFUSE_ACCESS_ERROR, "无权查看该用户动态"))
             
-            content = ""
-            if act_type == 'sport':
-                sport_key = str(record['detail'])
-                sport_info = mets[int(sport_key)] if sport_key.isdigit() else None
-                sport_name = sport_info['name'] if sport_info else "未知运动"
-                duration_min = round(float(record['duration'] or 0) * 60)
-                content = f"进行了{sport_name}，持续{duration_min}分钟"
-            elif act_type == 'sleep':
-                duration_hours = round(float(record['duration'] or 0), 1)
-                content = f"睡眠了{duration_hours}小时"
-            elif act_type == 'meal':
-                meal_names = {'breakfast': '早餐', 'lunch': '午餐', 'dinner': '晚餐', 'extra': '加餐'}
-                meal_name = meal_names.get(record['detail'], record['detail'])
-                calories = round(float(record['duration'] or 0))
-                content = f"记录了{meal_name}，摄入约{calories}卡路里"
-                
-            activities.append({
-                'id': record['id'],
-                'type': act_type,
-                'content': content,
-                'timestamp': timestamp
-            })
+            db_page = make_page(raw_activities, limit, sql.FEED_KEYSET)
+            friend_name = friend_user['username']
+            activities = [timeline.format_activity(record) for record in db_page['results']]
+            next_before = db_page['next_cursor']
         
         response_data = {
             'friendId': friend_id,
-            'friendName': friend_user['username'],
-            'activities': activities
+            'friendName': friend_name,
+            'activities': activities,
+            'next_before': next_before
         }
         
-        # Cache for 10 minutes
-        cache.set(cache_key, response_data, timeout=600)
-        
         return Response(success_api_response(response_data, message='获取好友详情成功'))
 
     @action(detail=False, methods=['get'])
     def friends(self, request):
         # Accepted friends
         user_id = request.user.id
-        cache_key = f'friend_list_{user_id}'
+        cache_key = versioned_key(FRIEND_SCOPE, user_id, f'friend_list_{user_id}')
         
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(success_api_response(cached_data, message='获取好友列表成功 (from cache)'))
-            
-        friends = sql.get_friend_requests(user_id, direction='both', status='accepted')
-        cache.set(cache_key, friends, timeout=3600)
+        friends, from_cache = get_or_compute(cache_key, lambda: sql.get_friend_requests(user_id, direction='both', status='accepted'), timeout=3600)
+        if from_cache:
+            return Response(success_api_response(friends, message='获取好友列表成功 (from cache)'))
         
         return Response(success_api_response(friends, message='获取好友列表成功'))
 
     @action(detail=False, methods=['get'])
     def received_requests(self, request):
         user_id = request.user.id
-        cache_key = f'friend_requests_received_{user_id}'
+        cache_key = versioned_key(FRIEND_SCOPE, user_id, f'friend_requests_received_{user_id}')
         
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(success_api_response(cached_data, message='获取收到的好友请求成功 (from cache)'))
-            
-        requests = sql.get_friend_requests_v2(user_id, direction='received')
-        cache.set(cache_key, requests, timeout=3600)
+        requests, from_cache = get_or_compute(cache_key, lambda: sql.get_friend_requests_v2(user_id, direction='received'), timeout=3600)
+        if from_cache:
+            return Response(success_api_response(requests, message='获取收到的好友请求成功 (from cache)'))
         
         return Response(success_api_response(requests, message='获取收到的好友请求成功'))
 
     @action(detail=False, methods=['get'])
     def sent_requests(self, request):
         user_id = request.user.id
-        cache_key = f'friend_requests_sent_{user_id}'
+        cache_key = versioned_key(FRIEND_SCOPE, user_id, f'friend_requests_sent_{user_id}')
         
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(success_api_response(cached_data, message='获取发送的好友请求成功 (from cache)'))
-            
-        requests = sql.get_friend_requests_v2(user_id, direction='sent')
-        cache.set(cache_key, requests, timeout=3600)
+        requests, from_cache = get_or_compute(cache_key, lambda: sql.get_friend_requests_v2(user_id, direction='sent'), timeout=3600)
+        if from_cache:
+            return Response(success_api_response(requests, message='获取发送的好友请求成功 (from cache)'))
         
         return Response(success_api_response(requests, message='获取发送的好友请求成功'))
 
@@ -165,13 +200,8 @@ class FriendViewSet(viewsets.ViewSet):
         # Invalidate cache for both users
         friend_rel = sql.get_friend_relationship(pk)
         if friend_rel:
-            invalidate_friend_cache(friend_rel['from_user_id'])
-            invalidate_friend_cache(friend_rel['to_user_id'])
-            cache.delete(f'friend_list_all_{friend_rel["from_user_id"]}')
-            cache.delete(f'friend_list_all_{friend_rel["to_user_id"]}')
-            # Also invalidate feed cache just in case
-            invalidate_friend_feed_cache(friend_rel['from_user_id'])
-            invalidate_friend_feed_cache(friend_rel['to_user_id'])
+            invalidate_friend_cache(friend_rel['from_user_id'], friend_rel['to_user_id'])
+            friend_index.add_friendship(friend_rel['from_user_id'], friend_rel['to_user_id'])
 
         return Response(success_api_response(None, message='接受好友请求成功'))
 
@@ -187,8 +217,7 @@ class FriendViewSet(viewsets.ViewSet):
         # Invalidate cache
         friend_rel = sql.get_friend_relationship(pk)
         if friend_rel:
-            invalidate_friend_cache(friend_rel['from_user_id'])
-            invalidate_friend_cache(friend_rel['to_user_id'])
+            invalidate_friend_cache(friend_rel['from_user_id'], friend_rel['to_user_id'])
 
         return Response(success_api_response(None, message='拒绝好友请求成功'))
 
@@ -207,8 +236,7 @@ class FriendViewSet(viewsets.ViewSet):
             return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, '已存在好友关系或请求'))
 
         # Invalidate cache
-        invalidate_friend_cache(request.user.id)
-        invalidate_friend_cache(to_user_id)
+        invalidate_friend_cache(request.user.id, to_user_id)
 
         return Response(success_api_response(new_request, message='好友请求已发送'))
 
@@ -228,8 +256,8 @@ class FriendViewSet(viewsets.ViewSet):
 
         # Invalidate cache
         if friend_rel:
-            invalidate_friend_cache(friend_rel['from_user_id'])
-            invalidate_friend_cache(friend_rel['to_user_id'])
+            invalidate_friend_cache(friend_rel['from_user_id'], friend_rel['to_user_id'])
+            friend_index.remove_friendship(friend_rel['from_user_id'], friend_rel['to_user_id'])
 
         return Response(success_api_response(None, message='取消好友请求成功'))
 
@@ -247,12 +275,7 @@ class FriendViewSet(viewsets.ViewSet):
 
         # Invalidate cache
         if friend_rel:
-            invalidate_friend_cache(friend_rel['from_user_id'])
-            invalidate_friend_cache(friend_rel['to_user_id'])
-            cache.delete(f'friend_list_all_{friend_rel["from_user_id"]}')
-            cache.delete(f'friend_list_all_{friend_rel["to_user_id"]}')
-            # Also invalidate feed cache
-            invalidate_friend_feed_cache(friend_rel['from_user_id'])
-            invalidate_friend_feed_cache(friend_rel['to_user_id'])
+            invalidate_friend_cache(friend_rel['from_user_id'], friend_rel['to_user_id'])
+            friend_index.remove_friendship(friend_rel['from_user_id'], friend_rel['to_user_id'])
 
         return Response(success_api_response(None, message='删除好友请求成功'))
\ No newline at end of file
@@ -1,14 +1,19 @@
-from django.contrib.auth.hashers import make_password
 from rest_framework import permissions, viewsets
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework.response import Response
-from django.core.cache import cache
 
 from utils.api_utils import (
     success_api_response, failed_api_response, ErrorCode, parse_data, response_wrapper
 )
 from UserManage import sql
+from UserManage import user_snapshot
+from UserManage import password_hashing
+from utils.cache_utils import invalidate_user_cache
+from utils.pagination import make_page, decode_cursor
+
+USER_SEARCH_PAGE_SIZE = 20
+USER_SEARCH_MAX_PAGE_SIZE = 50
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
@@ -33,48 +38,38 @@ class RegisterView(APIView):
         if not username or not password:
             return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "Username and password required"))
 
-        if sql.get_user_by_username(username):
-            return Response(failed_api_response(ErrorCode.DUPLICATED_ERROR, "Username already exists"))
-
-
-        hashed_password = make_password(password)
+        # Hashed on the bounded pool; no pre-check query, sp_create_user reports a taken username
+        try:
+            hashed_password = password_hashing.hash_password(password)
+        except password_hashing.HashingBusy:
+            return Response(failed_api_response(ErrorCode.SERVER_ERROR, "注册繁忙, 请稍后重试"))
 
         try:
-            user_id = sql.create_user(username, hashed_password, profile_data)
-            return_data = {
-                'username': username,
-                'profile': profile_data
-            }
-            return Response(success_api_response(return_data, message='注册成功'))
+            status_code, user_id = sql.create_user(username, hashed_password, profile_data)
         except Exception as e:
             return Response(failed_api_response(ErrorCode.SERVER_ERROR, str(e)))
 
+        if status_code == 1:
+            return Response(failed_api_response(ErrorCode.DUPLICATED_ERROR, "Username already exists"))
+        elif status_code != 0:
+            return Response(failed_api_response(ErrorCode.SERVER_ERROR, "注册失败"))
+
+        return_data = {
+            'username': username,
+            'profile': profile_data
+        }
+        return Response(success_api_response(return_data, message='注册成功'))
+
 class ProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        user_id = request.user.id
-        cache_key = f'user_profile_{user_id}'
-        
-        # Try to get from cache
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(success_api_response(cached_data, message='获取成功 (from cache)'))
-
-        user_data = sql.get_user_by_id(user_id)
-        if not user_data:
+        # Served from the user snapshot the authentication class already loaded
+        snapshot = user_snapshot.for_user(request.user)
+        if snapshot is None:
             return Response(failed_api_response(ErrorCode.NOT_FOUND_ERROR, "User not found"))
 
-        profile_fields = [
-            'height', 'weight', 'gender', 'birthday', 'realName', 'roles',
-            'daily_calories_burn_goal', 'daily_calories_intake_goal', 'daily_sleep_hours_goal'
-        ]
-        response_data = {k: user_data[k] for k in profile_fields if k in user_data}
-        
-        # Set to cache
-        cache.set(cache_key, response_data, timeout=3600)
-        
-        return Response(success_api_response(response_data, message='获取成功'))
+        return Response(success_api_response(snapshot['profile'], message='获取成功'))
 
     def put(self, request):
         return self.update_profile(request)
@@ -92,14 +87,10 @@ class ProfileView(APIView):
             sql.update_user_profile(user_id, data)
             
             # Invalidate cache
-            cache.delete(f'user_profile_{user_id}')
+            invalidate_user_cache(user_id)
             
-            user_data = sql.get_user_by_id(user_id)
-            profile_fields = [
-                'height', 'weight', 'gender', 'birthday', 'realName', 'roles',
-                'daily_calories_burn_goal', 'daily_calories_intake_goal', 'daily_sleep_hours_goal'
-            ]
-            response_data = {k: user_data[k] for k in profile_fields if k in user_data}
+            snapshot = user_snapshot.load_snapshot(user_id)
+            response_data = snapshot['profile'] if snapshot else {}
             return Response(success_api_response(response_data, message='更新成功'))
         except Exception as e:
             return Response(failed_api_response(ErrorCode.SERVER_ERROR, str(e)))
@@ -118,26 +109,41 @@ class UserViewSet(viewsets.ViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def list(self, request):
-        search_query = request.query_params.get('search')
+        """
+        ?q=<username>&mode=prefix|substring&limit=20&cursor=<next_cursor>
+        (search= is accepted as an alias of q)
+        """
+        query = request.query_params.get('q', request.query_params.get('search'))
+        mode = request.query_params.get('mode', 'prefix')
+        if mode not in sql.USER_SEARCH_MODES:
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的匹配方式"))
+        try:
+            limit = min(int(request.query_params.get('limit', USER_SEARCH_PAGE_SIZE)), USER_SEARCH_MAX_PAGE_SIZE)
+            token = request.query_params.get('cursor')
+            after = decode_cursor(token) if token else None
+            if limit <= 0 or (after is not None and len(after) != len(sql.USER_SEARCH_KEYSET)):
+                raise ValueError('invalid page')
+        except ValueError:
+            return Response(failed_api_response(ErrorCode.INVALID_REQUEST_ARGS, "无效的分页参数"))
         
         try:
-            users_data = sql.search_users(search_query)
+            rows = sql.search_users(query, mode, limit + 1, after)
+            page = make_page(rows, limit, sql.USER_SEARCH_KEYSET)
+            users_data = {
+                'results': [{'id': row['id'], 'username': row['username']} for row in page['results']],
+                'next_cursor': page['next_cursor']
+            }
             return Response(success_api_response(users_data, message="获取成功"))
         except Exception as e:
             return Response(failed_api_response(ErrorCode.SERVER_ERROR, str(e)))
 
     def retrieve(self, request, pk=None):
-        user = request.user
-        user_data = sql.get_user_by_id(user.id)
-        if user_data:
-            profile_fields = [
-                'height', 'weight', 'gender', 'birthday', 'realName', 'roles',
-                'daily_calories_burn_goal', 'daily_calories_intake_goal', 'daily_sleep_hours_goal'
-            ]
+        snapshot = user_snapshot.for_user(request.user)
+        if snapshot:
             nested_data = {
-                'id': user_data['id'],
-                'username': user_data['username'],
-                'profile': {k: user_data[k] for k in profile_fields if k in user_data}
+                'id': snapshot['id'],
+                'username': snapshot['username'],
+                'profile': snapshot['profile']
             }
             return Response(success_api_response(nested_data, message='获取成功'))
             
@@ -58,7 +58,8 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # SimpleJWT with the user resolved from the cached user snapshot
+        'UserManage.authentication.CachedJWTAuthentication',
     ),
 }
 
@@ -134,6 +135,15 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# First entry hashes new passwords; the others only verify existing hashes
+PASSWORD_HASHERS = [
+    'UserManage.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -155,11 +165,28 @@ STATIC_URL = '/static/'
 
 CACHES = {
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        "BACKEND": "utils.tiered_cache.TieredRedisCache",
         "LOCATION": "redis://{}/{}".format(_YAML_CONFIG["RedisAddress"], _YAML_CONFIG["RedisDatabase"]),
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
             "PASSWORD": _YAML_CONFIG["RedisPassword"]
+        },
+        # Per-process tier in front of Redis, invalidated over pub/sub
+        "LOCAL_TIER": {
+            "MAX_ENTRIES": 2000,    # entries kept per process (LRU)
+            "TTL": 60,              # seconds, while the invalidation channel is subscribed
+            "FALLBACK_TTL": 2,      # seconds, while it is not
+            # never cached locally, writes not published (locks and counters)
+            "BYPASS_PREFIXES": ["lock_", "analysis_result_cache_"],
         }
     }
-}
\ No newline at end of file
+}
+# Asynchronous analysis jobs (DataAnalysis.services.AnalysisJobQueue)
+ANALYSIS_JOB_WORKERS = 2        # max concurrently running analyses per process
+ANALYSIS_JOB_TIMEOUT = 600      # seconds before an in-flight job is considered dead
+
+# Registration password hashing (UserManage.password_hashing, UserManage.hashers)
+PASSWORD_HASH_ITERATIONS = 1_000_000    # PBKDF2 cost of new hashes
+PASSWORD_HASH_WORKERS = 2               # concurrent hashes per process
+PASSWORD_HASH_QUEUE = 16                # running + waiting hashes before registration is refused
+PASSWORD_HASH_TIMEOUT = 10              # seconds a request waits for its hash
@@ -1,20 +1,159 @@
+import math
+import random
+import time
 from django.core.cache import cache
+from django_redis import get_redis_connection
+
+# Generational keys: every derived cache entry of an owner embeds the owner's
+# version for its scope, so bumping the version retires all of them at once
+# without knowing their names. Entries left behind simply expire.
+HEALTH_SCOPE = 'health'    # health_summary_*, stored AnalysisResult reuse
+FRIEND_SCOPE = 'friend'    # friend_list_*, friend_list_all_*, friend_requests_*
+USER_SCOPE = 'user'        # user_snapshot_* (identity and profile)
+COMMENT_SCOPE = 'comment'  # comments_*, comment_summary_*; owner is '{activity_type}_{activity_id}'
+
+# KEYS: version keys  ARGV: clock seed, invalidation channel ('' for none)
+_BUMP_SCRIPT = """
+for i = 1, #KEYS do
+    if redis.call('EXISTS', KEYS[i]) == 0 then
+        redis.call('SET', KEYS[i], ARGV[1])
+    end
+    redis.call('INCR', KEYS[i])
+end
+if ARGV[2] ~= '' then
+    redis.call('PUBLISH', ARGV[2], table.concat(KEYS, '\\n'))
+end
+return #KEYS
+"""
+
+def _clock():
+    return int(time.time() * 1000)
+
+def _version_key(scope, owner_id):
+    return f'cache_version_{scope}_{owner_id}'
+
+def get_cache_version(scope, owner_id):
+    """
+    Current version of an owner's cache scope.
+    Seeded from the clock, so a counter lost to eviction never comes back with an old value.
+    """
+    return cache.get_or_set(_version_key(scope, owner_id), _clock(), timeout=None)
+
+def get_cache_versions(scope, owner_ids):
+    """get_cache_version for many owners, one round trip when all counters exist"""
+    keys = {owner_id: _version_key(scope, owner_id) for owner_id in owner_ids}
+    found = cache.get_many(list(keys.values()))
+    return {
+        owner_id: found[key] if key in found else get_cache_version(scope, owner_id)
+        for owner_id, key in keys.items()
+    }
+
+def versioned_key(scope, owner_id, name):
+    """Cache key for name under the owner's current scope version"""
+    return f'{name}_v{get_cache_version(scope, owner_id)}'
+
+def bump_cache_version(scope, *owner_ids):
+    """Retire every entry in scope for the given owners, one round trip in total"""
+    if not owner_ids:
+        return
+    keys = [cache.make_key(_version_key(scope, owner_id)) for owner_id in set(owner_ids)]
+    # Other processes drop their local copy of the counters from the script's
+    # PUBLISH; this one drops its copy right away
+    channel = getattr(cache, 'invalidation_channel', '')
+    get_redis_connection('default').eval(_BUMP_SCRIPT, len(keys), *keys, _clock(), channel)
+    if channel:
+        cache.invalidate_local(*keys, publish=False)
+
+# Entries written by get_or_compute are envelopes that carry their own logical
+# expiry. Redis keeps them STALE_GRACE seconds longer, so while one request
+# recomputes under a short lock the others are answered from the stale copy.
+STALE_GRACE = 300
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 0.05
+# Empty and not-found results are cached too (the envelope tells them apart from
+# an absent key), but for a shorter time
+NEGATIVE_TIMEOUT = 60
+
+def is_empty(value):
+    """Default negative-result test: None or an empty collection"""
+    return value is None or (isinstance(value, (list, tuple, dict, set)) and not value)
+
+def _lock_key(key):
+    return f'lock_{key}'
+
+def _fresh(entry, beta):
+    # Probabilistic early expiration (XFetch): the closer to expiry and the slower
+    # the computation, the likelier a request refreshes ahead of time
+    early = entry['delta'] * beta * -math.log(1.0 - random.random())
+    return time.time() + early < entry['expires']
+
+def _store(key, value, timeout, delta):
+    entry = {'value': value, 'delta': delta, 'expires': time.time() + timeout}
+    cache.set(key, entry, timeout=timeout + STALE_GRACE)
+
+def get_or_compute(key, compute, timeout, negative_timeout=NEGATIVE_TIMEOUT, is_negative=is_empty, beta=1.0):
+    """
+    Read-through cache with single-flight recomputation.
+    Only the request holding lock_{key} calls compute(); the others get the stale
+    value, or wait up to LOCK_TIMEOUT seconds for the first value of a cold key.
+    A waiter that finds the lock released with nothing stored takes it over.
+    Results for which is_negative(value) holds are kept for negative_timeout instead.
+    :return: (value, from_cache)
+    """
+    entry = cache.get(key)
+    if not isinstance(entry, dict) or 'expires' not in entry:
+        # Absent, or a plain value written before entries became envelopes
+        entry = None
+    if entry is not None and _fresh(entry, beta):
+        return entry['value'], True
+
+    lock_key = _lock_key(key)
+    locked = cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry['value'], True
+        deadline = time.time() + LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(LOCK_WAIT)
+            entry = cache.get(key)
+            if isinstance(entry, dict) and 'expires' in entry:
+                return entry['value'], True
+            # Lock released without a stored value (compute() raised): take over
+            # right away instead of waiting out LOCK_TIMEOUT
+            locked = cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+            if locked:
+                break
+        # Otherwise the lock holder died or is too slow: compute without the lock
+
+    try:
+        started = time.time()
+        value = compute()
+        _store(key, value, negative_timeout if is_negative(value) else timeout, time.time() - started)
+        return value, False
+    finally:
+        if locked:
+            cache.delete(lock_key)
+
+def get_health_data_version(user_id):
+    """Per-user counter that moves whenever the user's sleep/sport/meal data changes."""
+    return get_cache_version(HEALTH_SCOPE, user_id)
 
 def invalidate_health_cache(user_id):
     """Invalidate health summary and analysis cache for a user."""
-    # Invalidate health summary for different time ranges
-    for range_str in ['7d', '30d', '90d']:
-        cache.delete(f'health_summary_{user_id}_{range_str}')
-    
-    # Invalidate analysis results if we decide to cache them later
-    # cache.delete(f'analysis_results_{user_id}')
-
-def invalidate_friend_cache(user_id):
-    """Invalidate friend-related cache for a user."""
-    cache.delete(f'friend_list_{user_id}')
-    cache.delete(f'friend_requests_received_{user_id}')
-    cache.delete(f'friend_requests_sent_{user_id}')
-
-def invalidate_friend_feed_cache(user_id):
-    """Invalidate friend activities feed cache for a user."""
-    cache.delete(f'friend_activities_feed_{user_id}')
+    bump_cache_version(HEALTH_SCOPE, user_id)
+
+def invalidate_user_cache(user_id):
+    """Invalidate the cached user snapshot (identity and profile)."""
+    bump_cache_version(USER_SCOPE, user_id)
+
+def invalidate_friend_cache(*user_ids):
+    """Invalidate friend-related cache for the given users."""
+    bump_cache_version(FRIEND_SCOPE, *user_ids)
+
+
+FOOD_CATALOGUE_VERSION_KEY = 'nutrition_food_catalogue_version'
+
+def invalidate_food_catalogue_cache():
+    """Bump the nutrition food catalogue version so every process reloads its copy."""
+    cache.add(FOOD_CATALOGUE_VERSION_KEY, 1, timeout=None)
+    cache.incr(FOOD_CATALOGUE_VERSION_KEY)
@@ -0,0 +1,125 @@
+"""
+utils for keyset (cursor) pagination and streaming list responses
+"""
+import base64
+import json
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from utils.api_utils import ErrorCode
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 500
+
+
+def encode_cursor(values):
+    """
+    encode the keyset values of the last row into an opaque url-safe token
+    :param values: column values in keyset order, e.g. (date, time, id); None is kept as null
+    :return: cursor token string
+    """
+    raw = json.dumps([v if v is None or isinstance(v, int) else str(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    decode a cursor token generated by encode_cursor
+    :raise ValueError: token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('invalid cursor') from e
+    if not isinstance(values, list) or not values:
+        raise ValueError('invalid cursor')
+    # only scalars (or null for a nullable column) may reach the SQL params
+    if any(v is not None and (isinstance(v, bool) or not isinstance(v, (str, int, float))) for v in values):
+        raise ValueError('invalid cursor')
+    return values
+
+
+def keyset_condition(columns, values, descending=True):
+    """
+    build the "row comes after the cursor" predicate for a DESC (or ASC) ordering on columns.
+    (a, b, c) < (x, y, z) is expanded to a < x OR (a = x AND (b < y OR (b = y AND c < z)))
+    so MySQL can range scan on the leading column.
+    :return: (sql fragment, params)
+    """
+    if len(columns) != len(values):
+        raise ValueError('invalid cursor')
+    op = '<' if descending else '>'
+    column, value = columns[0], values[0]
+    if len(columns) == 1:
+        return f"{column} {op} %s", [value]
+    rest_sql, rest_params = keyset_condition(columns[1:], values[1:], descending)
+    return f"({column} {op} %s OR ({column} = %s AND {rest_sql}))", [value, value] + rest_params
+
+
+def wants_page(request):
+    return 'limit' in request.query_params or 'cursor' in request.query_params
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') in ('1', 'true')
+
+
+def parse_page_params(request):
+    """
+    :return: (limit, cursor values or None)
+    :raise ValueError: limit or cursor is malformed
+    """
+    limit = int(request.query_params.get('limit', DEFAULT_PAGE_SIZE))
+    if limit <= 0:
+        raise ValueError('invalid limit')
+    limit = min(limit, MAX_PAGE_SIZE)
+    token = request.query_params.get('cursor')
+    return limit, decode_cursor(token) if token else None
+
+
+def make_page(rows, limit, key_fields):
+    """
+    rows must be fetched with LIMIT limit + 1; the extra row only tells whether a next page exists
+    :return: {'results': [...], 'next_cursor': token or None}
+    """
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor([rows[-1][f] for f in key_fields])
+    return {'results': rows, 'next_cursor': next_cursor}
+
+
+def iter_keyset_pages(fetch_page, key_fields, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    walk a whole keyset-ordered result one bounded page at a time
+    :param fetch_page: callable(limit, after) -> list of rows
+    """
+    after = None
+    while True:
+        rows = fetch_page(chunk_size, after)
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = [rows[-1][f] for f in key_fields]
+
+
+def streaming_api_response(pages, message='成功'):
+    """
+    stream {'code': 0, 'message': ..., 'data': [...]} while pages are being read,
+    so the full list is never held in memory
+    """
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    def _generate():
+        yield '{"code": %d, "message": %s, "data": [' % (ErrorCode.SUCCESS.value, encoder.encode(message))
+        first = True
+        for rows in pages:
+            chunk = ','.join(encoder.encode(row) for row in rows)
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']}'
+
+    return StreamingHttpResponse(_generate(), content_type='application/json')
@@ -0,0 +1,317 @@
+"""
+Two-tier cache backend: a bounded per-process LRU in front of django_redis.
+
+Reads are served from process memory when possible and fall through to Redis
+otherwise. Every write through this backend publishes the affected keys on a
+Redis pub/sub channel, and each process drops them from its local tier when the
+message arrives. While the subscription is down (Redis restart, network blip)
+local entries only live for FALLBACK_TTL seconds, and the local tier is cleared
+on reconnect since messages may have been missed. Every eviction advances the
+tier's epoch, and a value fetched from Redis is only kept locally when no
+eviction arrived while it was being fetched, so a read racing a write in
+another process cannot pin the old value.
+
+Keys starting with one of BYPASS_PREFIXES (single-flight locks, hit/miss
+counters) are written on every request and never worth keeping locally: they
+always go straight to Redis and their writes are not published.
+
+Values held locally are shared between requests of the process: treat objects
+returned by cache.get as read-only.
+
+Per key-prefix local hit/miss counters are kept in memory and periodically
+added to the Redis hash LOCAL_STATS_KEY, so local_stats() covers every worker.
+
+settings.CACHES['default']:
+    "BACKEND": "utils.tiered_cache.TieredRedisCache",
+    "LOCAL_TIER": {"MAX_ENTRIES": 2000, "TTL": 60, "FALLBACK_TTL": 2,
+                   "BYPASS_PREFIXES": ["lock_", "analysis_result_cache_"]}
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from django_redis.cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'cache_invalidation'
+LOCAL_STATS_KEY = 'local_cache_stats'
+CLEAR_ALL = '*'
+BYPASS_PREFIXES = ('lock_', 'analysis_result_cache_')
+
+_MISSING = object()
+# health_summary_12_30d_v... -> health_summary
+_PREFIX_RE = re.compile(r'^(.*?)(?:_\d|$)')
+
+
+def key_prefix(key):
+    """Stats bucket of a cache key: the name up to the first numeric segment"""
+    return _PREFIX_RE.match(key).group(1) or key
+
+
+class LocalTier:
+    """Thread-safe LRU of full cache key -> (expires_at, value)"""
+
+    def __init__(self, max_entries, ttl, fallback_ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.fallback_ttl = fallback_ttl
+        self.subscribed = False
+        # Advanced by every evict/clear; read before a remote fetch and passed to put
+        self.epoch = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            if item[0] <= now:
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return item[1]
+
+    def put(self, key, value, epoch):
+        """Store value unless an eviction happened since epoch was read (the value may be outdated)"""
+        ttl = self.ttl if self.subscribed else self.fallback_ttl
+        with self._lock:
+            if epoch != self.epoch:
+                return
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def evict(self, keys):
+        with self._lock:
+            self.epoch += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredRedisCache(RedisCache):
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        options = params.get('LOCAL_TIER', {})
+        self._local = LocalTier(
+            max_entries=options.get('MAX_ENTRIES', 2000),
+            ttl=options.get('TTL', 60),
+            fallback_ttl=options.get('FALLBACK_TTL', 2),
+        )
+        self.invalidation_channel = options.get('CHANNEL', INVALIDATION_CHANNEL)
+        self._bypass_prefixes = tuple(options.get('BYPASS_PREFIXES', BYPASS_PREFIXES))
+        self._stats_interval = options.get('STATS_INTERVAL', 30)
+        self._counts = defaultdict(lambda: [0, 0])
+        self._counts_lock = threading.Lock()
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    # -- invalidation ----------------------------------------------------
+
+    def _ensure_listener(self):
+        # Started lazily and per pid, so forked workers each get their own subscriber
+        if self._listener_pid == os.getpid():
+            return
+        with self._listener_lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._local.subscribed = False
+            self._local.clear()
+            self._listener_pid = os.getpid()
+            threading.Thread(target=self._listen, name='cache-invalidation', daemon=True).start()
+
+    def _listen(self):
+        last_flush = time.monotonic()
+        while True:
+            pubsub = None
+            try:
+                pubsub = self.client.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.invalidation_channel)
+                self._local.clear()
+                self._local.subscribed = True
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message['type'] == 'message':
+                        self._on_message(message['data'])
+                    if time.monotonic() - last_flush >= self._stats_interval:
+                        self._flush_stats()
+                        last_flush = time.monotonic()
+            except Exception as e:
+                logger.warning(f"cache invalidation subscription lost: {str(e)}")
+            finally:
+                self._local.subscribed = False
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            time.sleep(1)
+
+    def _on_message(self, data):
+        keys = data.decode().split('\n')
+        if CLEAR_ALL in keys:
+            self._local.clear()
+        else:
+            self._local.evict(keys)
+
+    def invalidate_local(self, *full_keys, publish=True):
+        """
+        Drop full (already prefixed) keys from the local tier of this process and,
+        with publish, of every other process. Pass publish=False when the change was
+        already announced on the channel, e.g. by a Lua script.
+        """
+        full_keys = [str(k) for k in full_keys]
+        if CLEAR_ALL in full_keys:
+            self._local.clear()
+        else:
+            self._local.evict(full_keys)
+        if not publish:
+            return
+        try:
+            self.client.get_client(write=True).publish(self.invalidation_channel, '\n'.join(full_keys))
+        except Exception as e:
+            logger.warning(f"cache invalidation publish failed: {str(e)}")
+
+    def _is_local(self, key):
+        return not str(key).startswith(self._bypass_prefixes)
+
+    def _invalidate(self, keys, version=None):
+        keys = [key for key in keys if self._is_local(key)]
+        if keys:
+            self.invalidate_local(*(self.make_key(key, version=version) for key in keys))
+
+    # -- stats -----------------------------------------------------------
+
+    def _count(self, key, hit):
+        with self._counts_lock:
+            self._counts[key_prefix(key)][0 if hit else 1] += 1
+
+    def _flush_stats(self):
+        with self._counts_lock:
+            counts, self._counts = self._counts, defaultdict(lambda: [0, 0])
+        if not counts:
+            return
+        pipe = self.client.get_client(write=True).pipeline(transaction=False)
+        for prefix, (hits, misses) in counts.items():
+            pipe.hincrby(LOCAL_STATS_KEY, f'{prefix}:hits', hits)
+            pipe.hincrby(LOCAL_STATS_KEY, f'{prefix}:misses', misses)
+        pipe.execute()
+
+    def local_stats(self):
+        """Local-tier hit rates per key prefix across all workers (last STATS_INTERVAL not yet included)"""
+        raw = self.client.get_client(write=False).hgetall(LOCAL_STATS_KEY)
+        prefixes = defaultdict(lambda: {'hits': 0, 'misses': 0})
+        for field, value in raw.items():
+            prefix, kind = field.decode().rsplit(':', 1)
+            prefixes[prefix][kind] = int(value)
+        for counts in prefixes.values():
+            total = counts['hits'] + counts['misses']
+            counts['hit_rate'] = round(counts['hits'] / total, 4) if total else 0.0
+        return {
+            'prefixes': dict(prefixes),
+            'process': {'pid': os.getpid(), 'entries': len(self._local), 'subscribed': self._local.subscribed},
+        }
+
+    # -- reads -----------------------------------------------------------
+
+    def get(self, key, default=None, version=None, client=None):
+        if not self._is_local(key):
+            return super().get(key, default, version=version, client=client)
+        self._ensure_listener()
+        full_key = self.make_key(key, version=version)
+        value = self._local.get(full_key)
+        if value is not _MISSING:
+            self._count(key, True)
+            return value
+        self._count(key, False)
+        epoch = self._local.epoch
+        value = super().get(key, _MISSING, version=version, client=client)
+        if value is _MISSING:
+            return default
+        self._local.put(full_key, value, epoch)
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        self._ensure_listener()
+        found, remote = {}, []
+        for key in keys:
+            if not self._is_local(key):
+                remote.append(key)
+                continue
+            value = self._local.get(self.make_key(key, version=version))
+            self._count(key, value is not _MISSING)
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            epoch = self._local.epoch
+            fetched = super().get_many(remote, version=version, client=client)
+            for key, value in fetched.items():
+                if self._is_local(key):
+                    self._local.put(self.make_key(key, version=version), value, epoch)
+            found.update(fetched)
+        return found
+
+    # -- writes ----------------------------------------------------------
+
+    def set(self, key, value, *args, version=None, **kwargs):
+        result = super().set(key, value, *args, version=version, **kwargs)
+        self._invalidate([key], version)
+        return result
+
+    def add(self, key, value, *args, version=None, **kwargs):
+        result = super().add(key, value, *args, version=version, **kwargs)
+        if result:
+            self._invalidate([key], version)
+        return result
+
+    def set_many(self, data, *args, version=None, **kwargs):
+        result = super().set_many(data, *args, version=version, **kwargs)
+        self._invalidate(list(data), version)
+        return result
+
+    def delete(self, key, *args, version=None, **kwargs):
+        result = super().delete(key, *args, version=version, **kwargs)
+        self._invalidate([key], version)
+        return result
+
+    def delete_many(self, keys, *args, version=None, **kwargs):
+        keys = list(keys)
+        result = super().delete_many(keys, *args, version=version, **kwargs)
+        self._invalidate(keys, version)
+        return result
+
+    def incr(self, key, *args, version=None, **kwargs):
+        result = super().incr(key, *args, version=version, **kwargs)
+        self._invalidate([key], version)
+        return result
+
+    def decr(self, key, *args, version=None, **kwargs):
+        result = super().decr(key, *args, version=version, **kwargs)
+        self._invalidate([key], version)
+        return result
+
+    def delete_pattern(self, *args, **kwargs):
+        result = super().delete_pattern(*args, **kwargs)
+        self.invalidate_local(CLEAR_ALL)
+        return result
+
+    def clear(self, *args, **kwargs):
+        result = super().clear(*args, **kwargs)
+        self.invalidate_local(CLEAR_ALL)
+        return result